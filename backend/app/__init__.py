@@ -3,64 +3,92 @@
 from __future__ import annotations
 
 import logging
-import os
-from functools import lru_cache
+from contextlib import asynccontextmanager
 from pathlib import Path
+from typing import AsyncIterator
 
-from fastapi import Depends, FastAPI, Request
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse, RedirectResponse
 from fastapi.staticfiles import StaticFiles
 
-from .config import BackendConfig, MissingEnvironmentVariableError, load_config
-from .database import init_models, verify_database_connection
+from .admission import AdmissionControlMiddleware
+from .config import BackendConfig
+from .database import (
+    dispose_engines,
+    get_engine_registry,
+    init_models,
+    verify_database_connection,
+)
+from .dependencies import SettingsDep
+from .inventory import start_stock_reservations, stop_stock_reservations
+from .jobs import start_job_workers, stop_job_workers
+from .profiling import ProfilingMiddleware
+from .querybudget import QueryBudgetMiddleware
+from .settings import current_settings, install_reload_handler, remove_reload_handler
 
 logger = logging.getLogger(__name__)
 
 
-@lru_cache()
-def _load_settings() -> BackendConfig:
-    """Load configuration, falling back to sensible defaults when needed."""
+def get_settings() -> BackendConfig:
+    """Return the active settings snapshot."""
 
-    try:
-        return load_config()
-    except MissingEnvironmentVariableError as exc:  # pragma: no cover - defensive
-        logger.warning(
-            "Missing required configuration values: %s. Falling back to defaults.",
-            exc,
-        )
-        # Railway provides the HTTP port via the PORT variable. Use that value when
-        # available so the service binds correctly in hosted environments.
-        port = int(os.environ.get("PORT", os.environ.get("BACKEND_PORT", "8000")))
-        return load_config(
-            {
-                **os.environ,
-                "BACKEND_PORT": str(port),
-                "BACKEND_DEBUG": os.environ.get("BACKEND_DEBUG", "false"),
-                "DATABASE_URL": os.environ.get(
-                    "DATABASE_URL", "sqlite:///./exporthub.db"
-                ),
-                "BACKEND_SECRET_KEY": os.environ.get(
-                    "BACKEND_SECRET_KEY", "exporthub-development-secret"
-                ),
-                "BACKEND_STORAGE_BUCKET": os.environ.get(
-                    "BACKEND_STORAGE_BUCKET", "exporthub-local"
-                ),
-            },
-            allow_defaults=True,
-        )
+    return current_settings()
 
 
-def get_settings() -> BackendConfig:
-    """Expose cached settings for FastAPI dependency injection."""
+@asynccontextmanager
+async def _lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Start database pools and background workers, and tear them down again."""
 
-    return _load_settings()
+    settings = get_settings()
+    logger.info(
+        "ExportHub backend starting on port %s (debug=%s)",
+        settings.port,
+        settings.debug,
+    )
+    await verify_database_connection(settings)
+    await init_models(settings)
+    logger.info("Database connection verified")
+    warmed = await get_engine_registry().warm_up(
+        settings.database_url, settings.database_pool_warmup
+    )
+    if warmed:
+        logger.info("Opened %s pooled database connections", warmed)
+    await start_job_workers(settings)
+    await start_stock_reservations(settings)
+
+    # Imported lazily so ``python -m app.archive`` does not load it twice.
+    from .archive import start_order_archiver, stop_order_archiver
+
+    await start_order_archiver(settings)
+    if install_reload_handler():
+        logger.info("Send SIGHUP to reload tunable settings")
+    try:
+        yield
+    finally:
+        remove_reload_handler()
+        await stop_order_archiver()
+        await stop_stock_reservations()
+        await stop_job_workers()
+        # Last, so workers can finish their transactions first.
+        await dispose_engines()
 
 
 def create_app() -> FastAPI:
     """Create and configure the FastAPI application instance."""
 
-    app = FastAPI(title="ExportHub Backend", version="0.1.0")
+    app = FastAPI(title="ExportHub Backend", version="0.1.0", lifespan=_lifespan)
+    settings = get_settings()
+
+    if settings.debug or settings.query_budget_enforce:
+        app.add_middleware(QueryBudgetMiddleware, enforce=settings.query_budget_enforce)
+
+    if settings.profiling_enabled:
+        app.add_middleware(ProfilingMiddleware, settings=settings)
+
+    # Inside CORS so that shed requests still carry CORS headers.
+    if settings.admission_control_enabled:
+        app.add_middleware(AdmissionControlMiddleware, settings=settings)
 
     app.add_middleware(
         CORSMiddleware,
@@ -80,9 +108,7 @@ def create_app() -> FastAPI:
         return "text/html" in accept.lower()
 
     @app.get("/", tags=["system"], include_in_schema=not static_available)
-    async def read_root(
-        request: Request, settings: BackendConfig = Depends(get_settings)
-    ) -> dict[str, str]:
+    async def read_root(request: Request, settings: SettingsDep) -> dict[str, str]:
         """Provide a simple landing route for uptime checks."""
 
         if static_available and _wants_html(request):
@@ -94,7 +120,7 @@ def create_app() -> FastAPI:
         }
 
     @app.get("/healthz", tags=["system"])
-    async def healthcheck(settings: BackendConfig = Depends(get_settings)) -> dict[str, str]:
+    async def healthcheck(settings: SettingsDep) -> dict[str, str]:
         """Return a health payload that indicates configuration readiness."""
 
         database_status = "unconfigured"
@@ -112,25 +138,17 @@ def create_app() -> FastAPI:
             "database": database_status,
         }
 
-    @app.on_event("startup")
-    async def log_startup() -> None:
-        """Log the resolved configuration when the service boots."""
-
-        settings = get_settings()
-        logger.info(
-            "ExportHub backend starting on port %s (debug=%s)",
-            settings.port,
-            settings.debug,
-        )
-        await verify_database_connection(settings)
-        await init_models(settings)
-        logger.info("Database connection verified")
-
-    from .routes import auth, orders, products
+    from . import tasks  # noqa: F401 - registers background job handlers
+    from .routes import admin, auth, batch, jobs, orders, products, profiles
 
     app.include_router(auth.router)
     app.include_router(products.router)
     app.include_router(orders.router)
+    app.include_router(jobs.router)
+    app.include_router(batch.router)
+    app.include_router(admin.router)
+    if settings.profiling_enabled:
+        app.include_router(profiles.router)
 
     if static_available:
         app.mount("/app", StaticFiles(directory=static_dir, html=True), name="frontend")
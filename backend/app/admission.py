@@ -0,0 +1,320 @@
+"""Admission control: per-class concurrency limits, load shedding and deadlines.
+
+Requests are split into three classes that contend for different resources:
+``auth`` (login and signup, which spend most of their time hashing passwords),
+``reads`` (``GET``, ``HEAD`` and ``OPTIONS``) and ``writes`` (everything else).
+Each class admits a fixed number of requests at once and queues the rest in
+arrival order.
+
+A request that would wait longer than ``BACKEND_ADMISSION_MAX_QUEUE_MS`` is
+turned away straight away with ``503`` and a ``Retry-After`` header. The wait is
+estimated from the queue length and the recent service time of the class.
+Queued requests that run out of time are shed too, so overload shows up as fast
+rejections rather than ever-growing latency for everyone.
+
+Every admitted request may hold a database connection, so by default the read
+and write limits split the connection pool (size plus overflow) left over after
+the auth slots. Admitted requests then never queue on pool checkout, where the
+wait would be invisible to the shedding estimate.
+
+Admitted requests run under a deadline of ``BACKEND_REQUEST_TIMEOUT_SECONDS``
+from arrival, and are cancelled as soon as the client disconnects. Cancelling
+the handler also cancels its pending database calls. It cannot stop a password
+hash already running in the thread pool, though: that hash keeps burning CPU
+after its auth slot has been released.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import math
+import time
+from collections import deque
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import BackendConfig
+from .settings import current_settings
+
+logger = logging.getLogger(__name__)
+
+AUTH_PATHS = frozenset({"/auth/login", "/auth/signup"})
+READ_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+# Health checks must answer even when the API is saturated.
+EXEMPT_PATHS = frozenset({"/healthz"})
+
+# Weight of the latest request in the moving average of service times.
+_SERVICE_TIME_SMOOTHING = 0.2
+
+
+class Overloaded(Exception):
+    """Raised when a request cannot be admitted in time."""
+
+    def __init__(self, retry_after: float) -> None:
+        super().__init__("retry after {:.3f}s".format(retry_after))
+        self.retry_after = retry_after
+
+
+class ConcurrencyLimiter:
+    """First-in, first-out slots for one class of requests."""
+
+    def __init__(
+        self,
+        name: str,
+        limit: int,
+        *,
+        max_queue_seconds: float,
+    ) -> None:
+        self.name = name
+        self.limit = max(1, limit)
+        self.max_queue_seconds = max_queue_seconds
+        self._active = 0
+        self._waiters: deque[asyncio.Future[None]] = deque()
+        self._service_time: float | None = None
+        self.shed = 0
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def configure(self, limit: int, *, max_queue_seconds: float) -> None:
+        """Apply reloaded limits; a lower limit takes effect as requests finish."""
+
+        self.limit = max(1, limit)
+        self.max_queue_seconds = max_queue_seconds
+        while self._active < self.limit and self._waiters:
+            self._active += 1
+            self._wake_next()
+
+    def estimated_wait(self) -> float:
+        """Seconds a request arriving now would likely spend queued."""
+
+        if self._active < self.limit and not self._waiters:
+            return 0.0
+        if self._service_time is None:
+            # No history yet: assume a full queue budget.
+            return self.max_queue_seconds
+        return (len(self._waiters) + 1) * self._service_time / self.limit
+
+    async def acquire(self, timeout: float | None = None) -> None:
+        """Take a slot, waiting at most ``timeout`` (or the queue budget)."""
+
+        if self._active < self.limit and not self._waiters:
+            self._active += 1
+            return
+
+        budget = self.max_queue_seconds
+        if timeout is not None:
+            budget = min(budget, timeout)
+        estimate = self.estimated_wait()
+        if self._service_time is not None and estimate > budget:
+            self.shed += 1
+            raise Overloaded(estimate)
+
+        waiter: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait((waiter,), timeout=budget)
+        except BaseException:
+            self._abandon(waiter)
+            raise
+        if not waiter.done():
+            self._abandon(waiter)
+            self.shed += 1
+            raise Overloaded(max(estimate, budget))
+
+    def _abandon(self, waiter: asyncio.Future[None]) -> None:
+        if waiter.done():
+            # The slot was handed over just as we gave up; pass it on.
+            self.release()
+            return
+        waiter.cancel()
+        self._waiters.remove(waiter)
+
+    def release(self, service_time: float | None = None) -> None:
+        """Free a slot, recording how long the request held it."""
+
+        if service_time is not None:
+            if self._service_time is None:
+                self._service_time = service_time
+            else:
+                self._service_time += _SERVICE_TIME_SMOOTHING * (
+                    service_time - self._service_time
+                )
+        if self._active > self.limit:
+            # The limit was lowered; retire the slot instead of handing it on.
+            self._active -= 1
+            return
+        self._wake_next()
+
+    def _wake_next(self) -> None:
+        # Hand a slot already counted in ``_active`` to the next live waiter.
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+
+def class_limits(settings: BackendConfig) -> dict[str, int]:
+    """Return the concurrency limit of each class, deriving unset ones from the pool."""
+
+    auth = max(1, settings.admission_auth_concurrency)
+    pool = settings.database_pool_size + settings.database_max_overflow
+    available = max(2, pool - auth)
+    writes = settings.admission_write_concurrency
+    if writes <= 0:
+        writes = max(1, available // 3)
+    reads = settings.admission_read_concurrency
+    if reads <= 0:
+        reads = max(1, available - writes)
+    return {"auth": auth, "reads": reads, "writes": writes}
+
+
+def request_class(scope: Scope) -> str:
+    """Return ``auth``, ``reads`` or ``writes`` for an HTTP request scope."""
+
+    path = scope["path"].rstrip("/") or "/"
+    if path in AUTH_PATHS:
+        return "auth"
+    if scope["method"] in READ_METHODS:
+        return "reads"
+    return "writes"
+
+
+def _json_response(
+    status: int, detail: str, headers: list[tuple[bytes, bytes]]
+) -> tuple[Message, Message]:
+    body = json.dumps({"detail": detail}).encode("utf-8")
+    start: Message = {
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("ascii")),
+            *headers,
+        ],
+    }
+    return start, {"type": "http.response.body", "body": body}
+
+
+class AdmissionControlMiddleware:
+    """Limit concurrent requests per class and enforce request deadlines."""
+
+    def __init__(self, app: ASGIApp, *, settings: BackendConfig) -> None:
+        self.app = app
+        self.limiters = {
+            name: ConcurrencyLimiter(name, 1, max_queue_seconds=0.0)
+            for name in ("auth", "reads", "writes")
+        }
+        self._configure(settings)
+
+    def _configure(self, settings: BackendConfig) -> None:
+        self._settings = settings
+        self.timeout = settings.request_timeout_seconds
+        max_queue_seconds = settings.admission_max_queue_ms / 1000.0
+        for name, limit in class_limits(settings).items():
+            self.limiters[name].configure(limit, max_queue_seconds=max_queue_seconds)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        settings = current_settings()
+        if settings is not self._settings:
+            self._configure(settings)
+
+        arrived = time.monotonic()
+        deadline = arrived + self.timeout if self.timeout > 0 else None
+        limiter = self.limiters[request_class(scope)]
+        try:
+            await limiter.acquire(None if deadline is None else self.timeout)
+        except Overloaded as exc:
+            logger.debug("Shedding %s %s: %s", scope["method"], scope["path"], exc)
+            seconds = max(1, math.ceil(exc.retry_after))
+            for message in _json_response(
+                503,
+                "The server is busy. Please try again later.",
+                [(b"retry-after", str(seconds).encode("ascii"))],
+            ):
+                await send(message)
+            return
+
+        started = time.monotonic()
+        try:
+            await self._run(scope, receive, send, deadline)
+        finally:
+            limiter.release(time.monotonic() - started)
+
+    async def _run(
+        self, scope: Scope, receive: Receive, send: Send, deadline: float | None
+    ) -> None:
+        # The client's messages are pumped into a queue so a disconnect is seen
+        # even while the handler is busy and not reading the request.
+        messages: asyncio.Queue[Message] = asyncio.Queue()
+        response_started = False
+
+        async def receive_from_queue() -> Message:
+            return await messages.get()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        handler = asyncio.create_task(self.app(scope, receive_from_queue, send_wrapper))
+
+        async def pump() -> None:
+            while True:
+                message = await receive()
+                await messages.put(message)
+                if message["type"] == "http.disconnect":
+                    handler.cancel()
+                    return
+
+        listener = asyncio.create_task(pump())
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        timed_out = False
+        try:
+            await asyncio.wait((handler,), timeout=timeout)
+        finally:
+            listener.cancel()
+            if not handler.done():
+                timed_out = True
+                handler.cancel()
+                await asyncio.gather(handler, return_exceptions=True)
+
+        if not timed_out:
+            if handler.cancelled():
+                # The client went away; nobody is left to answer.
+                return
+            handler.result()
+            return
+
+        logger.warning(
+            "%s %s exceeded its %.1fs deadline",
+            scope["method"],
+            scope["path"],
+            self.timeout,
+        )
+        if not response_started:
+            for message in _json_response(504, "Request deadline exceeded.", []):
+                await send(message)
+
+
+__all__ = [
+    "AdmissionControlMiddleware",
+    "ConcurrencyLimiter",
+    "Overloaded",
+    "class_limits",
+    "request_class",
+]
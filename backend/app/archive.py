@@ -0,0 +1,236 @@
+"""Move aged orders from the hot ``orders`` table into ``orders_archive``.
+
+Orders older than ``order_archive_after_days`` are copied and deleted in small
+batches, each in its own short transaction, so the hot table keeps a working set
+sized by recency rather than by total history. On PostgreSQL the archive is
+partitioned by month and missing partitions are created before each batch.
+
+Run a pass manually (or from cron) from the ``backend`` directory::
+
+    python -m app.archive
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, insert, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import BackendConfig
+from .database import get_sessionmaker
+from .models import ArchivedOrder, Order
+
+logger = logging.getLogger(__name__)
+
+ARCHIVED_ORDER_COLUMNS = (
+    "id",
+    "product_id",
+    "user_id",
+    "buyer_name",
+    "quantity",
+    "total_price",
+    "created_at",
+)
+
+
+def archive_cutoff(settings: BackendConfig) -> datetime:
+    """Return the timestamp before which orders belong in the archive."""
+
+    return datetime.now(timezone.utc) - timedelta(
+        days=settings.order_archive_after_days
+    )
+
+
+def _month_start(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).replace(
+        day=1, hour=0, minute=0, second=0, microsecond=0
+    )
+
+
+def _next_month(value: datetime) -> datetime:
+    if value.month == 12:
+        return value.replace(year=value.year + 1, month=1)
+    return value.replace(month=value.month + 1)
+
+
+async def _ensure_partitions(
+    session: AsyncSession, oldest: datetime, newest: datetime
+) -> None:
+    """Create the monthly archive partitions covering ``oldest``..``newest``."""
+
+    month = _month_start(oldest)
+    last = _month_start(newest)
+    while month <= last:
+        upper = _next_month(month)
+        await session.execute(
+            text(
+                "CREATE TABLE IF NOT EXISTS orders_archive_y{:04d}m{:02d} "
+                "PARTITION OF orders_archive FOR VALUES FROM ('{}') TO ('{}')".format(
+                    month.year, month.month, month.isoformat(), upper.isoformat()
+                )
+            )
+        )
+        month = upper
+
+
+async def archive_order_batch(
+    session: AsyncSession, cutoff: datetime, batch_size: int
+) -> int:
+    """Move up to ``batch_size`` orders created before ``cutoff``; return the count.
+
+    The caller owns the transaction and should commit after each batch.
+    """
+
+    result = await session.execute(
+        select(Order.id, Order.created_at)
+        .where(Order.created_at < cutoff)
+        .order_by(Order.created_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    rows = result.all()
+    if not rows:
+        return 0
+
+    if session.bind is not None and session.bind.dialect.name == "postgresql":
+        await _ensure_partitions(session, rows[0].created_at, rows[-1].created_at)
+
+    ids = [row.id for row in rows]
+    order_columns = [getattr(Order, name) for name in ARCHIVED_ORDER_COLUMNS]
+    await session.execute(
+        insert(ArchivedOrder).from_select(
+            list(ARCHIVED_ORDER_COLUMNS),
+            select(*order_columns).where(Order.id.in_(ids)),
+        )
+    )
+    await session.execute(
+        delete(Order)
+        .where(Order.id.in_(ids))
+        .execution_options(synchronize_session=False)
+    )
+    return len(ids)
+
+
+async def archive_orders(
+    settings: BackendConfig, *, max_batches: int | None = None
+) -> int:
+    """Archive every eligible order in batches and return how many moved."""
+
+    session_factory = get_sessionmaker(settings.database_url)
+    cutoff = archive_cutoff(settings)
+    moved = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        async with session_factory() as session:
+            count = await archive_order_batch(
+                session, cutoff, settings.order_archive_batch_size
+            )
+            await session.commit()
+        if count == 0:
+            break
+        moved += count
+        batches += 1
+        # Yield between batches so request handlers sharing the loop stay responsive.
+        await asyncio.sleep(0)
+    if moved:
+        logger.info("Archived %s orders created before %s", moved, cutoff.isoformat())
+    return moved
+
+
+class OrderArchiver:
+    """Periodically run :func:`archive_orders` inside the application process."""
+
+    def __init__(self, settings: BackendConfig) -> None:
+        self._settings = settings
+        self._task: asyncio.Task[None] | None = None
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run(), name="order-archiver")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        interval = self._settings.order_archive_interval_minutes * 60
+        while True:
+            try:
+                await archive_orders(self._settings)
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # pragma: no cover - retry on the next tick
+                logger.exception("Order archival pass failed")
+            await asyncio.sleep(interval)
+
+
+_archiver: OrderArchiver | None = None
+
+
+async def start_order_archiver(settings: BackendConfig) -> None:
+    """Start periodic archival when an interval is configured."""
+
+    global _archiver
+
+    if settings.order_archive_interval_minutes <= 0:
+        return
+    _archiver = OrderArchiver(settings)
+    await _archiver.start()
+
+
+async def stop_order_archiver() -> None:
+    """Stop the periodic archival task if it is running."""
+
+    global _archiver
+
+    archiver, _archiver = _archiver, None
+    if archiver is not None:
+        await archiver.stop()
+
+
+def main(argv: list[str] | None = None) -> None:
+    from . import get_settings
+    from .database import dispose_engines, init_models
+
+    parser = argparse.ArgumentParser(description="Archive aged orders.")
+    parser.add_argument(
+        "--max-batches",
+        type=int,
+        default=None,
+        help="Stop after this many batches instead of draining every eligible order.",
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    settings = get_settings()
+
+    async def _run() -> int:
+        try:
+            await init_models(settings)
+            return await archive_orders(settings, max_batches=args.max_batches)
+        finally:
+            await dispose_engines()
+
+    print("Archived {} orders".format(asyncio.run(_run())))
+
+
+__all__ = [
+    "ARCHIVED_ORDER_COLUMNS",
+    "OrderArchiver",
+    "archive_cutoff",
+    "archive_order_batch",
+    "archive_orders",
+    "start_order_archiver",
+    "stop_order_archiver",
+]
+
+
+if __name__ == "__main__":  # pragma: no cover - manual execution helper
+    main()
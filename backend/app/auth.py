@@ -5,15 +5,51 @@ from __future__ import annotations
 import base64
 import hashlib
 import hmac
+import json
 import secrets
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 
+from .config import BackendConfig
 from .models import SessionToken, User
 
 PASSWORD_SALT_BYTES = 16
 PBKDF2_ITERATIONS = 390_000
+SCRYPT_N = 2**14
+SCRYPT_R = 8
+SCRYPT_P = 1
 TOKEN_TTL_HOURS = 12
 
+SIGNED_TOKEN_VERSION = "v1"
+
+PBKDF2_ALGORITHM = "pbkdf2_sha256"
+SCRYPT_ALGORITHM = "scrypt"
+PASSWORD_HASH_ALGORITHMS = (PBKDF2_ALGORITHM, SCRYPT_ALGORITHM)
+
+
+@dataclass(frozen=True)
+class PasswordHashParams:
+    """Algorithm and cost used when deriving new password hashes."""
+
+    algorithm: str = PBKDF2_ALGORITHM
+    iterations: int = PBKDF2_ITERATIONS
+    scrypt_n: int = SCRYPT_N
+    scrypt_r: int = SCRYPT_R
+    scrypt_p: int = SCRYPT_P
+
+    @classmethod
+    def from_settings(cls, settings: BackendConfig) -> "PasswordHashParams":
+        """Build the target parameters from the backend configuration."""
+
+        return cls(
+            algorithm=settings.password_hash_algorithm,
+            iterations=settings.password_hash_iterations,
+            scrypt_n=settings.password_hash_scrypt_n,
+        )
+
+
+DEFAULT_HASH_PARAMS = PasswordHashParams()
+
 
 def _now() -> datetime:
     """Return the current UTC timestamp."""
@@ -27,40 +63,143 @@ def normalize_email(value: str) -> str:
     return value.strip().lower()
 
 
-def hash_password(password: str, *, salt: bytes | None = None) -> str:
-    """Derive a secure password hash using PBKDF2."""
+def _b64encode(value: bytes) -> str:
+    return base64.b64encode(value).decode("ascii")
+
+
+def _b64decode(value: str) -> bytes:
+    return base64.b64decode(value.encode("ascii"), validate=True)
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(
+        password.encode("utf-8"),
+        salt=salt,
+        n=n,
+        r=r,
+        p=p,
+        # OpenSSL needs exactly this much: the V array plus p blocks and scratch.
+        maxmem=128 * r * (n + p + 2),
+        dklen=32,
+    )
+
+
+def hash_password(
+    password: str,
+    *,
+    salt: bytes | None = None,
+    params: PasswordHashParams = DEFAULT_HASH_PARAMS,
+) -> str:
+    """Derive a password hash that records its algorithm and cost.
+
+    PBKDF2 hashes are encoded as ``pbkdf2_sha256$<iterations>$<salt>$<hash>`` and
+    scrypt hashes as ``scrypt$<n>$<r>$<p>$<salt>$<hash>``.
+    """
 
     if salt is None:
         salt = secrets.token_bytes(PASSWORD_SALT_BYTES)
-    derived = hashlib.pbkdf2_hmac(
-        "sha256", password.encode("utf-8"), salt, PBKDF2_ITERATIONS
-    )
-    return base64.b64encode(salt + derived).decode("utf-8")
+    if params.algorithm == SCRYPT_ALGORITHM:
+        derived = _scrypt(
+            password, salt, params.scrypt_n, params.scrypt_r, params.scrypt_p
+        )
+        return "$".join(
+            [
+                SCRYPT_ALGORITHM,
+                str(params.scrypt_n),
+                str(params.scrypt_r),
+                str(params.scrypt_p),
+                _b64encode(salt),
+                _b64encode(derived),
+            ]
+        )
+    if params.algorithm == PBKDF2_ALGORITHM:
+        derived = hashlib.pbkdf2_hmac(
+            "sha256", password.encode("utf-8"), salt, params.iterations
+        )
+        return "$".join(
+            [
+                PBKDF2_ALGORITHM,
+                str(params.iterations),
+                _b64encode(salt),
+                _b64encode(derived),
+            ]
+        )
+    raise ValueError("Unsupported password hash algorithm: {}".format(params.algorithm))
+
+
+def _parse_hash(encoded: str) -> tuple[PasswordHashParams, bytes, bytes]:
+    """Split an encoded hash into its parameters, salt and digest."""
+
+    parts = encoded.split("$")
+    if len(parts) == 1:
+        # Hashes written before the versioned format: base64(salt + digest) with
+        # the historical PBKDF2 iteration count.
+        decoded = _b64decode(encoded)
+        params = PasswordHashParams(PBKDF2_ALGORITHM, PBKDF2_ITERATIONS)
+        return params, decoded[:PASSWORD_SALT_BYTES], decoded[PASSWORD_SALT_BYTES:]
+    if parts[0] == PBKDF2_ALGORITHM and len(parts) == 4:
+        params = PasswordHashParams(PBKDF2_ALGORITHM, iterations=int(parts[1]))
+        return params, _b64decode(parts[2]), _b64decode(parts[3])
+    if parts[0] == SCRYPT_ALGORITHM and len(parts) == 6:
+        params = PasswordHashParams(
+            SCRYPT_ALGORITHM,
+            scrypt_n=int(parts[1]),
+            scrypt_r=int(parts[2]),
+            scrypt_p=int(parts[3]),
+        )
+        return params, _b64decode(parts[4]), _b64decode(parts[5])
+    raise ValueError("Unrecognised password hash format")
 
 
 def verify_password(password: str, encoded: str) -> bool:
     """Compare a plain text password against a stored hash."""
 
     try:
-        decoded = base64.b64decode(encoded.encode("utf-8"))
+        params, salt, expected = _parse_hash(encoded)
     except Exception:  # pragma: no cover - defensive decoding guard
         return False
 
-    salt = decoded[:PASSWORD_SALT_BYTES]
-    expected = decoded[PASSWORD_SALT_BYTES:]
-    candidate = hashlib.pbkdf2_hmac(
-        "sha256", password.encode("utf-8"), salt, PBKDF2_ITERATIONS
-    )
+    if params.algorithm == SCRYPT_ALGORITHM:
+        candidate = _scrypt(
+            password, salt, params.scrypt_n, params.scrypt_r, params.scrypt_p
+        )
+    else:
+        candidate = hashlib.pbkdf2_hmac(
+            "sha256", password.encode("utf-8"), salt, params.iterations
+        )
     return hmac.compare_digest(expected, candidate)
 
 
+def needs_rehash(
+    encoded: str, params: PasswordHashParams = DEFAULT_HASH_PARAMS
+) -> bool:
+    """Return whether a stored hash was derived with different parameters."""
+
+    try:
+        current, _, _ = _parse_hash(encoded)
+    except Exception:  # pragma: no cover - defensive decoding guard
+        return True
+
+    if "$" not in encoded or current.algorithm != params.algorithm:
+        return True
+    if params.algorithm == SCRYPT_ALGORITHM:
+        return (current.scrypt_n, current.scrypt_r, current.scrypt_p) != (
+            params.scrypt_n,
+            params.scrypt_r,
+            params.scrypt_p,
+        )
+    return current.iterations != params.iterations
+
+
 def hash_token(token: str) -> str:
     """Return a SHA-256 digest of the session token."""
 
     return hashlib.sha256(token.encode("utf-8")).hexdigest()
 
 
-def build_session_token(user: User, *, hours: int = TOKEN_TTL_HOURS) -> tuple[str, SessionToken]:
+def build_session_token(
+    user: User, *, hours: int = TOKEN_TTL_HOURS
+) -> tuple[str, SessionToken]:
     """Generate a session token and the corresponding database record."""
 
     token = secrets.token_urlsafe(32)
@@ -72,13 +211,99 @@ def build_session_token(user: User, *, hours: int = TOKEN_TTL_HOURS) -> tuple[st
     return token, token_record
 
 
+@dataclass(frozen=True)
+class SignedTokenClaims:
+    """Identity carried inside a stateless signed session token."""
+
+    user_id: int
+    role: str
+    expires_at: datetime
+    token_id: str
+
+
+def _b64url_encode(value: bytes) -> str:
+    return base64.urlsafe_b64encode(value).rstrip(b"=").decode("ascii")
+
+
+def _b64url_decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+
+
+def _sign(message: str, secret_key: str) -> str:
+    digest = hmac.new(
+        secret_key.encode("utf-8"), message.encode("ascii"), hashlib.sha256
+    ).digest()
+    return _b64url_encode(digest)
+
+
+def is_signed_token(token: str) -> bool:
+    """Return whether the token uses the stateless signed format."""
+
+    return token.startswith(SIGNED_TOKEN_VERSION + ".")
+
+
+def build_signed_token(
+    user: User, secret_key: str, *, hours: int = TOKEN_TTL_HOURS
+) -> tuple[str, SignedTokenClaims]:
+    """Issue an HMAC-signed token that can be verified without a database."""
+
+    claims = SignedTokenClaims(
+        user_id=user.id,
+        role=user.role,
+        expires_at=(_now() + timedelta(hours=hours)).replace(microsecond=0),
+        token_id=secrets.token_urlsafe(16),
+    )
+    payload = json.dumps(
+        {
+            "sub": claims.user_id,
+            "role": claims.role,
+            "exp": int(claims.expires_at.timestamp()),
+            "jti": claims.token_id,
+        },
+        separators=(",", ":"),
+    )
+    message = SIGNED_TOKEN_VERSION + "." + _b64url_encode(payload.encode("utf-8"))
+    return message + "." + _sign(message, secret_key), claims
+
+
+def decode_signed_token(token: str, secret_key: str) -> SignedTokenClaims | None:
+    """Return the claims of a correctly signed token, or ``None``.
+
+    Expiry is reported through the claims and left for the caller to enforce.
+    """
+
+    message, _, signature = token.rpartition(".")
+    if not is_signed_token(message):
+        return None
+    if not hmac.compare_digest(signature, _sign(message, secret_key)):
+        return None
+    try:
+        data = json.loads(_b64url_decode(message.split(".", 1)[1]))
+        return SignedTokenClaims(
+            user_id=int(data["sub"]),
+            role=str(data["role"]),
+            expires_at=datetime.fromtimestamp(int(data["exp"]), timezone.utc),
+            token_id=str(data["jti"]),
+        )
+    except (ValueError, KeyError, TypeError):  # pragma: no cover - signed garbage
+        return None
+
+
 __all__ = [
+    "DEFAULT_HASH_PARAMS",
+    "PASSWORD_HASH_ALGORITHMS",
     "PBKDF2_ITERATIONS",
     "PASSWORD_SALT_BYTES",
+    "PasswordHashParams",
+    "SignedTokenClaims",
     "TOKEN_TTL_HOURS",
     "build_session_token",
+    "build_signed_token",
+    "decode_signed_token",
     "hash_password",
     "hash_token",
+    "is_signed_token",
+    "needs_rehash",
     "normalize_email",
     "verify_password",
 ]
@@ -0,0 +1,97 @@
+"""Pick password hashing cost parameters that hit a target latency on this host.
+
+Run from the ``backend`` directory::
+
+    python -m app.calibrate --target-ms 250
+    python -m app.calibrate --algorithm scrypt --target-ms 150
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+from .auth import (
+    PBKDF2_ALGORITHM,
+    PASSWORD_HASH_ALGORITHMS,
+    SCRYPT_ALGORITHM,
+    PasswordHashParams,
+    hash_password,
+)
+from .config import SCRYPT_N_MAX
+
+_MIN_PBKDF2_ITERATIONS = 100_000
+_MIN_SCRYPT_N = 2**14
+
+
+def _measure(params: PasswordHashParams, *, rounds: int) -> float:
+    """Return the fastest observed hashing time in seconds."""
+
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        hash_password("calibration-password", params=params)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def calibrate_pbkdf2(target_seconds: float, *, rounds: int = 3) -> PasswordHashParams:
+    """Scale the PBKDF2 iteration count linearly to the target latency."""
+
+    probe = PasswordHashParams(PBKDF2_ALGORITHM, iterations=_MIN_PBKDF2_ITERATIONS)
+    elapsed = _measure(probe, rounds=rounds)
+    iterations = int(_MIN_PBKDF2_ITERATIONS * target_seconds / elapsed)
+    # Round down to a readable value and never go below the safe floor.
+    iterations = max(_MIN_PBKDF2_ITERATIONS, iterations // 10_000 * 10_000)
+    return PasswordHashParams(PBKDF2_ALGORITHM, iterations=iterations)
+
+
+def calibrate_scrypt(target_seconds: float, *, rounds: int = 3) -> PasswordHashParams:
+    """Double the scrypt work factor until the next step would exceed the target."""
+
+    params = PasswordHashParams(SCRYPT_ALGORITHM, scrypt_n=_MIN_SCRYPT_N)
+    while params.scrypt_n < SCRYPT_N_MAX:
+        candidate = PasswordHashParams(SCRYPT_ALGORITHM, scrypt_n=params.scrypt_n * 2)
+        if _measure(candidate, rounds=rounds) > target_seconds:
+            break
+        params = candidate
+    return params
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--algorithm", choices=PASSWORD_HASH_ALGORITHMS, default=PBKDF2_ALGORITHM
+    )
+    parser.add_argument(
+        "--target-ms",
+        type=float,
+        default=250.0,
+        help="Desired hashing latency per login in milliseconds.",
+    )
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    target_seconds = args.target_ms / 1000.0
+    if args.algorithm == SCRYPT_ALGORITHM:
+        params = calibrate_scrypt(target_seconds, rounds=args.rounds)
+        settings_lines = ["BACKEND_PASSWORD_HASH_SCRYPT_N={}".format(params.scrypt_n)]
+    else:
+        params = calibrate_pbkdf2(target_seconds, rounds=args.rounds)
+        settings_lines = [
+            "BACKEND_PASSWORD_HASH_ITERATIONS={}".format(params.iterations)
+        ]
+
+    measured = _measure(params, rounds=args.rounds) * 1000.0
+    print(
+        "# measured {:.1f} ms per hash (target {:.1f} ms)".format(
+            measured, args.target_ms
+        )
+    )
+    print("BACKEND_PASSWORD_HASH_ALGORITHM={}".format(params.algorithm))
+    for line in settings_lines:
+        print(line)
+
+
+if __name__ == "__main__":  # pragma: no cover - manual execution helper
+    main()
@@ -5,6 +5,12 @@ from dataclasses import dataclass
 from typing import Mapping, MutableMapping, Optional, cast
 from urllib.parse import quote_plus
 
+# Fallback used when ``BACKEND_SECRET_KEY`` is unset in development.
+DEVELOPMENT_SECRET_KEY = "exporthub-development-secret"
+
+# scrypt with r=8 needs about 1 KiB per unit of N; hashlib refuses 2 GiB or more.
+SCRYPT_N_MAX = 2**20
+
 
 class MissingEnvironmentVariableError(RuntimeError):
     """Raised when a required environment variable has not been provided."""
@@ -49,9 +55,7 @@ def _bool(name: str, default: bool, source: Mapping[str, str]) -> bool:
     if lowered in {"0", "false", "f", "no", "n"}:
         return False
     raise ValueError(
-        "Environment variable {} must be a boolean value, got {!r}".format(
-            name, value
-        )
+        "Environment variable {} must be a boolean value, got {!r}".format(name, value)
     )
 
 
@@ -63,12 +67,37 @@ def _int(name: str, default: int, source: Mapping[str, str]) -> int:
         return int(value)
     except ValueError as exc:
         raise ValueError(
-            "Environment variable {} must be an integer, got {!r}".format(
-                name, value
-            )
+            "Environment variable {} must be an integer, got {!r}".format(name, value)
+        ) from exc
+
+
+def _float(name: str, default: float, source: Mapping[str, str]) -> float:
+    value = source.get(name)
+    if value is None:
+        return default
+    try:
+        return float(value)
+    except ValueError as exc:
+        raise ValueError(
+            "Environment variable {} must be a number, got {!r}".format(name, value)
         ) from exc
 
 
+def _choice(
+    name: str, default: str, choices: tuple[str, ...], source: Mapping[str, str]
+) -> str:
+    value = source.get(name)
+    if value is None or value == "":
+        return default
+    if value not in choices:
+        raise ValueError(
+            "Environment variable {} must be one of {}, got {!r}".format(
+                name, ", ".join(choices), value
+            )
+        )
+    return value
+
+
 @dataclass(frozen=True)
 class BackendConfig:
     """Immutable configuration for the backend service."""
@@ -78,11 +107,52 @@ class BackendConfig:
     database_url: str
     secret_key: str
     storage_bucket: str
+    database_pool_size: int = 5
+    database_max_overflow: int = 10
+    database_pool_warmup: int = 2
+    auth_rate_limit_enabled: bool = True
+    auth_rate_limit_ip_burst: int = 20
+    auth_rate_limit_ip_per_minute: int = 10
+    auth_rate_limit_email_burst: int = 5
+    auth_rate_limit_email_per_minute: int = 5
+    auth_rate_limit_max_keys: int = 10_000
+    auth_rate_limit_backend: str = ""
+    auth_rate_limit_proxy_hops: int = 0
+    password_hash_algorithm: str = "pbkdf2_sha256"
+    password_hash_iterations: int = 390_000
+    password_hash_scrypt_n: int = 2**14
+    session_token_mode: str = "database"
+    session_revocation_refresh_seconds: int = 30
+    job_workers: int = 2
+    job_poll_interval_ms: int = 1000
+    job_max_attempts: int = 5
+    job_retry_base_seconds: int = 5
+    job_lease_seconds: int = 300
+    order_archive_after_days: int = 180
+    order_archive_batch_size: int = 1000
+    order_archive_interval_minutes: int = 0
+    query_budget_enforce: bool = False
+    inventory_reservation_chunk: int = 0
+    inventory_reservation_ttl_seconds: int = 2
+    batch_max_items: int = 20
+    batch_read_concurrency: int = 4
+    profiling_enabled: bool = False
+    profiling_sample_rate: float = 0.0
+    profiling_interval_ms: int = 5
+    profiling_directory: str = "profiles"
+    profiling_max_profiles: int = 200
+    product_cache_size: int = 1024
+    product_cache_ttl_seconds: float = 5.0
+    product_cache_backend: str = ""
+    admission_control_enabled: bool = True
+    admission_auth_concurrency: int = 4
+    admission_read_concurrency: int = 0
+    admission_write_concurrency: int = 0
+    admission_max_queue_ms: int = 1000
+    request_timeout_seconds: float = 30.0
 
 
-def _build_database_url(
-    source: Mapping[str, str], *, allow_default: bool
-) -> str:
+def _build_database_url(source: Mapping[str, str], *, allow_default: bool) -> str:
     """Resolve the database URL from common environment variable layouts."""
 
     value = source.get("DATABASE_URL")
@@ -111,7 +181,9 @@ def _build_database_url(
     if allow_default:
         return "sqlite:///./exporthub.db"
 
-    raise MissingEnvironmentVariableError("Missing required environment variable: DATABASE_URL")
+    raise MissingEnvironmentVariableError(
+        "Missing required environment variable: DATABASE_URL"
+    )
 
 
 def load_config(
@@ -125,17 +197,120 @@ def load_config(
     """
 
     source = _get_source(env)
-    return BackendConfig(
+    config = BackendConfig(
         port=_int("BACKEND_PORT", 8000, source),
         debug=_bool("BACKEND_DEBUG", False, source),
         database_url=_build_database_url(source, allow_default=allow_defaults),
         secret_key=_string(
-            "BACKEND_SECRET_KEY", "exporthub-development-secret", source, allow_defaults
+            "BACKEND_SECRET_KEY", DEVELOPMENT_SECRET_KEY, source, allow_defaults
         ),
         storage_bucket=_string(
             "BACKEND_STORAGE_BUCKET", "exporthub-local", source, allow_defaults
         ),
+        database_pool_size=_int("BACKEND_DATABASE_POOL_SIZE", 5, source),
+        database_max_overflow=_int("BACKEND_DATABASE_MAX_OVERFLOW", 10, source),
+        database_pool_warmup=_int("BACKEND_DATABASE_POOL_WARMUP", 2, source),
+        auth_rate_limit_enabled=_bool("BACKEND_AUTH_RATE_LIMIT_ENABLED", True, source),
+        auth_rate_limit_ip_burst=_int("BACKEND_AUTH_RATE_LIMIT_IP_BURST", 20, source),
+        auth_rate_limit_ip_per_minute=_int(
+            "BACKEND_AUTH_RATE_LIMIT_IP_PER_MINUTE", 10, source
+        ),
+        auth_rate_limit_email_burst=_int(
+            "BACKEND_AUTH_RATE_LIMIT_EMAIL_BURST", 5, source
+        ),
+        auth_rate_limit_email_per_minute=_int(
+            "BACKEND_AUTH_RATE_LIMIT_EMAIL_PER_MINUTE", 5, source
+        ),
+        auth_rate_limit_max_keys=_int(
+            "BACKEND_AUTH_RATE_LIMIT_MAX_KEYS", 10_000, source
+        ),
+        auth_rate_limit_backend=source.get("BACKEND_AUTH_RATE_LIMIT_BACKEND", ""),
+        auth_rate_limit_proxy_hops=_int(
+            "BACKEND_AUTH_RATE_LIMIT_PROXY_HOPS", 0, source
+        ),
+        password_hash_algorithm=_choice(
+            "BACKEND_PASSWORD_HASH_ALGORITHM",
+            "pbkdf2_sha256",
+            ("pbkdf2_sha256", "scrypt"),
+            source,
+        ),
+        password_hash_iterations=_int(
+            "BACKEND_PASSWORD_HASH_ITERATIONS", 390_000, source
+        ),
+        password_hash_scrypt_n=_int("BACKEND_PASSWORD_HASH_SCRYPT_N", 2**14, source),
+        session_token_mode=_choice(
+            "BACKEND_SESSION_TOKEN_MODE", "database", ("database", "signed"), source
+        ),
+        session_revocation_refresh_seconds=_int(
+            "BACKEND_SESSION_REVOCATION_REFRESH_SECONDS", 30, source
+        ),
+        job_workers=_int("BACKEND_JOB_WORKERS", 2, source),
+        job_poll_interval_ms=_int("BACKEND_JOB_POLL_INTERVAL_MS", 1000, source),
+        job_max_attempts=_int("BACKEND_JOB_MAX_ATTEMPTS", 5, source),
+        job_retry_base_seconds=_int("BACKEND_JOB_RETRY_BASE_SECONDS", 5, source),
+        job_lease_seconds=_int("BACKEND_JOB_LEASE_SECONDS", 300, source),
+        order_archive_after_days=_int("BACKEND_ORDER_ARCHIVE_AFTER_DAYS", 180, source),
+        order_archive_batch_size=_int("BACKEND_ORDER_ARCHIVE_BATCH_SIZE", 1000, source),
+        order_archive_interval_minutes=_int(
+            "BACKEND_ORDER_ARCHIVE_INTERVAL_MINUTES", 0, source
+        ),
+        query_budget_enforce=_bool("BACKEND_QUERY_BUDGET_ENFORCE", False, source),
+        inventory_reservation_chunk=_int(
+            "BACKEND_INVENTORY_RESERVATION_CHUNK", 0, source
+        ),
+        inventory_reservation_ttl_seconds=_int(
+            "BACKEND_INVENTORY_RESERVATION_TTL_SECONDS", 2, source
+        ),
+        batch_max_items=_int("BACKEND_BATCH_MAX_ITEMS", 20, source),
+        batch_read_concurrency=_int("BACKEND_BATCH_READ_CONCURRENCY", 4, source),
+        profiling_enabled=_bool("BACKEND_PROFILING_ENABLED", False, source),
+        profiling_sample_rate=_float("BACKEND_PROFILING_SAMPLE_RATE", 0.0, source),
+        profiling_interval_ms=_int("BACKEND_PROFILING_INTERVAL_MS", 5, source),
+        profiling_directory=_string(
+            "BACKEND_PROFILING_DIRECTORY", "profiles", source, True
+        ),
+        profiling_max_profiles=_int("BACKEND_PROFILING_MAX_PROFILES", 200, source),
+        product_cache_size=_int("BACKEND_PRODUCT_CACHE_SIZE", 1024, source),
+        product_cache_ttl_seconds=_float(
+            "BACKEND_PRODUCT_CACHE_TTL_SECONDS", 5.0, source
+        ),
+        product_cache_backend=source.get("BACKEND_PRODUCT_CACHE_BACKEND", ""),
+        admission_control_enabled=_bool(
+            "BACKEND_ADMISSION_CONTROL_ENABLED", True, source
+        ),
+        admission_auth_concurrency=_int(
+            "BACKEND_ADMISSION_AUTH_CONCURRENCY", 4, source
+        ),
+        admission_read_concurrency=_int(
+            "BACKEND_ADMISSION_READ_CONCURRENCY", 0, source
+        ),
+        admission_write_concurrency=_int(
+            "BACKEND_ADMISSION_WRITE_CONCURRENCY", 0, source
+        ),
+        admission_max_queue_ms=_int("BACKEND_ADMISSION_MAX_QUEUE_MS", 1000, source),
+        request_timeout_seconds=_float("BACKEND_REQUEST_TIMEOUT_SECONDS", 30.0, source),
     )
+    scrypt_n = config.password_hash_scrypt_n
+    if scrypt_n < 2 or scrypt_n & (scrypt_n - 1) or scrypt_n > SCRYPT_N_MAX:
+        raise ValueError(
+            "BACKEND_PASSWORD_HASH_SCRYPT_N must be a power of two between 2 and "
+            "{}".format(SCRYPT_N_MAX)
+        )
+    if config.password_hash_iterations < 1:
+        raise ValueError("BACKEND_PASSWORD_HASH_ITERATIONS must be at least 1")
+    weak_key = config.secret_key in ("", DEVELOPMENT_SECRET_KEY)
+    if config.session_token_mode == "signed" and weak_key:
+        # Anyone who knows the default key could mint tokens for any user.
+        raise ValueError(
+            "BACKEND_SESSION_TOKEN_MODE=signed requires a private BACKEND_SECRET_KEY"
+        )
+    return config
 
 
-__all__ = ["BackendConfig", "MissingEnvironmentVariableError", "load_config"]
+__all__ = [
+    "DEVELOPMENT_SECRET_KEY",
+    "BackendConfig",
+    "MissingEnvironmentVariableError",
+    "SCRYPT_N_MAX",
+    "load_config",
+]
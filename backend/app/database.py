@@ -2,19 +2,25 @@
 
 from __future__ import annotations
 
+import asyncio
+import os
 from contextlib import asynccontextmanager
-from functools import lru_cache
-from typing import AsyncIterator
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Sequence
 
+from sqlalchemy import URL, Connection, Insert, event, insert, inspect, make_url
 from sqlalchemy.ext.asyncio import (
     AsyncEngine,
     AsyncSession,
     async_sessionmaker,
     create_async_engine,
 )
+from sqlalchemy.schema import CreateColumn
 from sqlalchemy.sql import text
 
 from .config import BackendConfig
+from .settings import current_settings
 
 
 def _coerce_async_driver(database_url: str) -> str:
@@ -33,32 +39,190 @@ def _coerce_async_driver(database_url: str) -> str:
     return database_url
 
 
-@lru_cache()
-def _get_engine(database_url: str) -> AsyncEngine:
-    """Create (or return a cached) async SQLAlchemy engine."""
+def _enable_sqlite_foreign_keys(dbapi_connection: Any, connection_record: Any) -> None:
+    # SQLite ignores ON DELETE CASCADE unless foreign keys are switched on per
+    # connection; the models rely on it instead of loading child rows.
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
 
-    return create_async_engine(_coerce_async_driver(database_url), future=True)
 
+# SQLite serialises writers; bursts can queue for the lock longer than the
+# driver's default of five seconds.
+_SQLITE_BUSY_TIMEOUT_SECONDS = 30
 
-@lru_cache()
-def _get_sessionmaker(database_url: str) -> async_sessionmaker[AsyncSession]:
-    """Create a session factory tied to the configured database URL."""
 
-    engine = _get_engine(database_url)
-    return async_sessionmaker(engine, expire_on_commit=False)
+def _engine_options(url: URL, settings: BackendConfig) -> dict[str, Any]:
+    if url.get_backend_name() == "sqlite":
+        # aiosqlite opens a connection per checkout (or shares one in memory), so
+        # there is no sized pool to configure.
+        return {"connect_args": {"timeout": _SQLITE_BUSY_TIMEOUT_SECONDS}}
+    return {
+        "pool_size": max(1, settings.database_pool_size),
+        "max_overflow": max(0, settings.database_max_overflow),
+    }
+
+
+@dataclass
+class _Registered:
+    engine: AsyncEngine
+    sessionmaker: async_sessionmaker[AsyncSession]
+    created_at: datetime
+
+
+class EngineRegistry:
+    """Async engines and session factories, one per database URL.
+
+    Engines are created on first use and live until :meth:`dispose`. A forked
+    child drops the connections it inherited and opens its own.
+    """
+
+    def __init__(self) -> None:
+        self._entries: dict[str, _Registered] = {}
+        self._pid = os.getpid()
+        self.forks = 0
+
+    def _entry(self, database_url: str) -> _Registered:
+        entry = self._entries.get(database_url)
+        if entry is not None:
+            return entry
+        url = make_url(_coerce_async_driver(database_url))
+        engine = create_async_engine(
+            url, future=True, **_engine_options(url, current_settings())
+        )
+        if engine.dialect.name == "sqlite":
+            event.listen(engine.sync_engine, "connect", _enable_sqlite_foreign_keys)
+        entry = self._entries[database_url] = _Registered(
+            engine=engine,
+            sessionmaker=async_sessionmaker(engine, expire_on_commit=False),
+            created_at=datetime.now(timezone.utc),
+        )
+        return entry
+
+    def engine(self, database_url: str) -> AsyncEngine:
+        """Return the engine for ``database_url``, creating it on first use."""
+
+        return self._entry(database_url).engine
+
+    def sessionmaker(self, database_url: str) -> async_sessionmaker[AsyncSession]:
+        """Return the session factory bound to the engine for ``database_url``."""
+
+        return self._entry(database_url).sessionmaker
+
+    async def warm_up(self, database_url: str, connections: int) -> int:
+        """Open up to ``connections`` pooled connections and return how many opened.
+
+        Connecting concurrently fills the pool before the first requests arrive,
+        so they do not pay connection setup. Overflow connections would be closed
+        again on check-in, so the count is capped at the pool size, and pools that
+        keep no connections are left alone.
+        """
+
+        engine = self.engine(database_url)
+        size = getattr(engine.pool, "size", None)
+        if not callable(size):
+            return 0
+        connections = min(connections, size())
+        if connections <= 0:
+            return 0
+
+        async def _connect() -> None:
+            async with engine.connect() as connection:
+                await connection.execute(text("SELECT 1"))
+
+        await asyncio.gather(*(_connect() for _ in range(connections)))
+        return connections
+
+    async def dispose(self, database_url: str | None = None) -> None:
+        """Close pooled connections and forget one engine, or all of them."""
+
+        if database_url is None:
+            urls = list(self._entries)
+        else:
+            urls = [database_url] if database_url in self._entries else []
+        for url in urls:
+            await self._entries.pop(url).engine.dispose()
+
+    def _after_fork(self) -> None:
+        # Connections belong to the parent, so the child must neither use nor
+        # close them. ``close=False`` swaps in empty pools and leaves the
+        # sockets to the parent; engines and session factories stay valid.
+        for entry in self._entries.values():
+            entry.engine.sync_engine.dispose(close=False)
+        self._pid = os.getpid()
+        self.forks += 1
+
+    def stats(self) -> list[dict[str, Any]]:
+        """Describe each engine and its pool, with passwords hidden."""
+
+        described = []
+        for entry in self._entries.values():
+            pool = entry.engine.pool
+            info: dict[str, Any] = {
+                "url": entry.engine.url.render_as_string(hide_password=True),
+                "dialect": entry.engine.dialect.name,
+                "pool": type(pool).__name__,
+                "created_at": entry.created_at,
+                "pid": self._pid,
+            }
+            for name in ("size", "checkedin", "checkedout", "overflow"):
+                method = getattr(pool, name, None)
+                info[name] = method() if callable(method) else None
+            described.append(info)
+        return described
+
+
+_registry = EngineRegistry()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_registry._after_fork)
+
+
+def get_engine_registry() -> EngineRegistry:
+    """Return the process-wide engine registry."""
+
+    return _registry
 
 
 def get_sessionmaker(database_url: str) -> async_sessionmaker[AsyncSession]:
-    """Expose the cached session factory for dependency wiring."""
+    """Expose the session factory for ``database_url`` for dependency wiring."""
+
+    return _registry.sessionmaker(database_url)
+
+
+async def dispose_engines() -> None:
+    """Close every pooled connection; engines are recreated on next use."""
+
+    await _registry.dispose()
+
 
-    return _get_sessionmaker(database_url)
+def insert_ignoring_conflicts(
+    session: AsyncSession, model: Any, index_elements: Sequence[str]
+) -> Insert:
+    """Build an ``INSERT`` that skips rows violating the given unique columns.
+
+    PostgreSQL and SQLite get ``ON CONFLICT DO NOTHING``; other dialects receive a
+    plain insert, so callers should still treat ``IntegrityError`` as a conflict.
+    """
+
+    dialect = session.bind.dialect.name if session.bind is not None else ""
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+        return pg_insert(model).on_conflict_do_nothing(index_elements=index_elements)
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+        return sqlite_insert(model).on_conflict_do_nothing(
+            index_elements=index_elements
+        )
+    return insert(model)
 
 
 @asynccontextmanager
 async def lifespan_session(settings: BackendConfig) -> AsyncIterator[AsyncSession]:
     """Provide an async session scoped to a FastAPI lifespan event."""
 
-    session_factory = _get_sessionmaker(settings.database_url)
+    session_factory = _registry.sessionmaker(settings.database_url)
     session = session_factory()
     try:
         yield session
@@ -73,22 +237,49 @@ async def lifespan_session(settings: BackendConfig) -> AsyncIterator[AsyncSessio
 async def verify_database_connection(settings: BackendConfig) -> None:
     """Execute a lightweight query to ensure the database is reachable."""
 
-    engine = _get_engine(settings.database_url)
+    engine = _registry.engine(settings.database_url)
     async with engine.connect() as connection:
         await connection.execute(text("SELECT 1"))
 
 
-async def init_models(settings: BackendConfig) -> None:
-    """Create database tables when they are missing."""
-
+def _create_schema(connection: Connection) -> None:
     from .models import Base
 
-    engine = _get_engine(settings.database_url)
+    Base.metadata.create_all(connection)
+    # ``create_all`` skips tables that already exist, so columns and indexes
+    # added to an existing model later on would never be created without these
+    # passes. Only nullable columns can be added this way.
+    inspector = inspect(connection)
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            connection.execute(
+                text(
+                    "ALTER TABLE {} ADD COLUMN {}".format(
+                        connection.dialect.identifier_preparer.format_table(table),
+                        CreateColumn(column).compile(dialect=connection.dialect),
+                    )
+                )
+            )
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+
+async def init_models(settings: BackendConfig) -> None:
+    """Create database tables and indexes when they are missing."""
+
+    engine = _registry.engine(settings.database_url)
     async with engine.begin() as connection:
-        await connection.run_sync(Base.metadata.create_all)
+        await connection.run_sync(_create_schema)
 
 
 __all__ = [
+    "EngineRegistry",
+    "dispose_engines",
+    "get_engine_registry",
+    "insert_ignoring_conflicts",
     "lifespan_session",
     "get_sessionmaker",
     "init_models",
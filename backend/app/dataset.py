@@ -0,0 +1,657 @@
+"""Generate, bulk-load, dump and restore benchmark datasets.
+
+Seeding through the API costs a request (and, for users, a password hash) per
+row. This module writes rows straight into the tables instead: PostgreSQL loads
+them with ``COPY FROM STDIN`` and SQLite with batched ``executemany`` calls,
+both in a single transaction that replaces users, products, session tokens and
+orders (``orders_archive`` is emptied as well).
+
+Rows travel in PostgreSQL's ``COPY`` text format throughout. A snapshot is a
+gzip stream holding, for each table, a JSON header line, the rows and the
+``\\.`` end-of-data marker, so PostgreSQL can load it without re-encoding.
+
+Run from the ``backend`` directory::
+
+    python -m app.dataset generate --orders 1000000 --output orders-1m.snapshot.gz
+    python -m app.dataset restore orders-1m.snapshot.gz
+    python -m app.dataset dump current.snapshot.gz
+
+``generate`` without ``--output`` loads the rows into the configured database.
+Every generated user shares one password (``--password``), hashed once.
+Generated session tokens only authenticate in the ``database`` token mode; write
+them out with ``--tokens-file``. Run ``python -m app.archive`` after restoring a
+dataset that spans more than ``BACKEND_ORDER_ARCHIVE_AFTER_DAYS``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import bisect
+import gzip
+import itertools
+import json
+import logging
+import random
+import re
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import IO, Any, AsyncIterator, Awaitable, Callable, Iterable, Iterator
+
+from sqlalchemy import DateTime, Numeric, Table, text
+
+from .auth import PasswordHashParams, hash_password, hash_token
+from .config import BackendConfig
+from .database import dispose_engines, get_sessionmaker, init_models
+from .models import ArchivedOrder, Order, Product, SessionToken, User
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = "exporthub-snapshot"
+SNAPSHOT_VERSION = 1
+
+# Loaded in this order so foreign keys always point at existing rows.
+SNAPSHOT_TABLES: tuple[Table, ...] = (
+    User.__table__,
+    Product.__table__,
+    SessionToken.__table__,
+    Order.__table__,
+)
+_CLEARED_TABLES: tuple[Table, ...] = (ArchivedOrder.__table__,) + SNAPSHOT_TABLES[::-1]
+
+_END_OF_DATA = b"\\.\n"
+_NULL = "\\N"
+_BATCH_ROWS = 10_000
+
+_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+_ESCAPE_SEQUENCE = re.compile(r"\\(.)")
+_UNESCAPED = {"t": "\t", "n": "\n", "r": "\r"}
+
+_FIRST_NAMES = (
+    "Ada Amara Bruno Chen Dara Elif Farah Goran Hana Ines Jonas Kemi Lena Malik "
+    "Nora Omar Priya Quinn Rafael Sara Tariq Uma Viktor Wen Yara Zoran"
+).split()
+_LAST_NAMES = (
+    "Adeyemi Berg Costa Dubois Eriksen Fischer Garcia Haddad Ivanova Jensen "
+    "Kowalski Larsen Moreau Nakamura Okafor Petrov Rossi Santos Tanaka Varga Weber"
+).split()
+_ADJECTIVES = (
+    "Organic Handwoven Premium Roasted Artisan Cold-pressed Recycled Vintage "
+    "Hand-painted Forged Dried Spiced Woven Carved Glazed"
+).split()
+_NOUNS = (
+    "Coffee Beans|Cashews|Shea Butter|Cotton Scarf|Leather Bag|Ceramic Bowl|"
+    "Spice Blend|Tea Leaves|Olive Oil|Wool Rug|Copper Kettle|Bamboo Tray|"
+    "Cocoa Nibs|Vanilla Pods|Linen Shirt|Teak Stool"
+).split("|")
+# Relative frequency of order quantities 1 to 5.
+_QUANTITY_WEIGHTS = (60, 20, 10, 6, 4)
+
+
+def _timestamp(value: datetime) -> str:
+    return value.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f+00:00")
+
+
+def _cents(value: int) -> str:
+    return "{}.{:02d}".format(value // 100, value % 100)
+
+
+def encode_row(*fields: Any) -> bytes:
+    """Encode one row in ``COPY`` text format; ``None`` becomes ``\\N``."""
+
+    return (
+        "\t".join(
+            _NULL if field is None else str(field).translate(_ESCAPES)
+            for field in fields
+        )
+        + "\n"
+    ).encode("utf-8")
+
+
+def _unescape(value: str) -> str:
+    return _ESCAPE_SEQUENCE.sub(lambda match: _UNESCAPED.get(match[1], match[1]), value)
+
+
+@dataclass(frozen=True)
+class DatasetSpec:
+    """Sizes and distributions of a synthetic dataset."""
+
+    users: int = 1_000
+    products: int = 200
+    orders: int = 10_000
+    tokens: int = 100
+    admins: int = 1
+    days: int = 365
+    product_skew: float = 1.1
+    user_skew: float = 0.8
+    untracked_stock_ratio: float = 0.3
+    seed: int = 42
+
+
+def _zipf_cumulative(count: int, skew: float, rng: random.Random) -> list[float]:
+    """Cumulative Zipf weights for ``count`` items, ranks assigned at random."""
+
+    ranks = list(range(1, count + 1))
+    rng.shuffle(ranks)
+    return list(itertools.accumulate(1.0 / rank**skew for rank in ranks))
+
+
+class DatasetGenerator:
+    """Produce reproducible rows for each snapshot table from a spec.
+
+    Product popularity and buyer activity follow Zipf distributions, prices are
+    log-normal, quantities favour small baskets, and order timestamps are spread
+    uniformly over the last ``days`` days with ids increasing over time. Every
+    user gets ``password_hash``. Raw session tokens are collected in
+    :attr:`tokens` as ``(user_id, token)`` pairs while the rows are generated.
+    """
+
+    def __init__(
+        self, spec: DatasetSpec, password_hash: str, *, now: datetime | None = None
+    ) -> None:
+        self.spec = spec
+        self.password_hash = password_hash
+        self.now = now or datetime.now(timezone.utc)
+        self.tokens: list[tuple[int, str]] = []
+        self._rng = random.Random(spec.seed)
+        self._prices = [
+            max(100, int(self._rng.lognormvariate(7.5, 1.0)))
+            for _ in range(spec.products)
+        ]
+
+    def _full_name(self, index: int) -> str:
+        first = _FIRST_NAMES[index % len(_FIRST_NAMES)]
+        last = _LAST_NAMES[(index // len(_FIRST_NAMES)) % len(_LAST_NAMES)]
+        return "{} {}".format(first, last)
+
+    def rows(self, table: Table) -> Iterator[bytes]:
+        generators = {
+            "users": self._users,
+            "products": self._products,
+            "session_tokens": self._tokens,
+            "orders": self._orders,
+        }
+        return generators[table.name]()
+
+    def _users(self) -> Iterator[bytes]:
+        created_at = _timestamp(self.now - timedelta(days=self.spec.days))
+        for index in range(self.spec.users):
+            yield encode_row(
+                index + 1,
+                "user{}@example.com".format(index + 1),
+                self._full_name(index),
+                self.password_hash,
+                "admin" if index < self.spec.admins else "buyer",
+                created_at,
+            )
+
+    def _products(self) -> Iterator[bytes]:
+        rng = self._rng
+        created_at = _timestamp(self.now - timedelta(days=self.spec.days))
+        sellers = max(1, self.spec.products // 10)
+        for index, price in enumerate(self._prices):
+            tracked = rng.random() >= self.spec.untracked_stock_ratio
+            yield encode_row(
+                index + 1,
+                "{} {}".format(rng.choice(_ADJECTIVES), rng.choice(_NOUNS)),
+                "Synthetic listing {}.".format(index + 1),
+                _cents(price),
+                "Seller {}".format(index % sellers + 1),
+                rng.randint(0, 5_000) if tracked else None,
+                created_at,
+            )
+
+    def _tokens(self) -> Iterator[bytes]:
+        rng = self._rng
+        created_at = _timestamp(self.now)
+        expires_at = _timestamp(self.now + timedelta(days=30))
+        for index in range(self.spec.tokens):
+            user_id = rng.randint(1, self.spec.users)
+            token = base64.urlsafe_b64encode(rng.randbytes(32)).rstrip(b"=").decode()
+            self.tokens.append((user_id, token))
+            yield encode_row(
+                index + 1, hash_token(token), user_id, created_at, expires_at
+            )
+
+    def _orders(self) -> Iterator[bytes]:
+        rng = self._rng
+        spec = self.spec
+        products = _zipf_cumulative(spec.products, spec.product_skew, rng)
+        buyers = _zipf_cumulative(spec.users, spec.user_skew, rng)
+        quantities = list(itertools.accumulate(_QUANTITY_WEIGHTS))
+        start = self.now - timedelta(days=spec.days)
+        span = spec.days * 86_400.0
+        offsets = sorted(rng.random() * span for _ in range(spec.orders))
+        names = [
+            self._full_name(index).translate(_ESCAPES) for index in range(spec.users)
+        ]
+        # The hot loop formats rows directly rather than through encode_row.
+        line = "{}\t{}\t{}\t{}\t{}\t{}\t{}\n".format
+        pick = bisect.bisect
+        for index, offset in enumerate(offsets):
+            product = pick(products, rng.random() * products[-1])
+            buyer = pick(buyers, rng.random() * buyers[-1])
+            quantity = pick(quantities, rng.random() * quantities[-1]) + 1
+            yield line(
+                index + 1,
+                product + 1,
+                buyer + 1,
+                names[buyer],
+                quantity,
+                _cents(self._prices[product] * quantity),
+                _timestamp(start + timedelta(seconds=offset)),
+            ).encode("utf-8")
+
+
+# Snapshot files -----------------------------------------------------------------
+
+
+def _columns(table: Table) -> list[str]:
+    return [column.name for column in table.columns]
+
+
+def write_snapshot_header(stream: IO[bytes], table: Table) -> None:
+    header = {
+        "format": SNAPSHOT_FORMAT,
+        "version": SNAPSHOT_VERSION,
+        "table": table.name,
+        "columns": _columns(table),
+    }
+    stream.write(json.dumps(header).encode("utf-8") + b"\n")
+
+
+def write_snapshot(
+    stream: IO[bytes], sections: Iterable[tuple[Table, Iterable[bytes]]]
+) -> dict[str, int]:
+    """Write ``(table, rows)`` sections to ``stream`` and return row counts."""
+
+    counts: dict[str, int] = {}
+    for table, rows in sections:
+        write_snapshot_header(stream, table)
+        count = 0
+        for row in rows:
+            stream.write(row)
+            count += 1
+        stream.write(_END_OF_DATA)
+        counts[table.name] = count
+    return counts
+
+
+def _section_rows(stream: IO[bytes], table: Table) -> Iterator[bytes]:
+    for line in iter(stream.readline, _END_OF_DATA):
+        if not line:
+            raise ValueError("Snapshot ends inside the {} section".format(table.name))
+        yield line
+
+
+def read_snapshot(stream: IO[bytes]) -> Iterator[tuple[Table, Iterator[bytes]]]:
+    """Yield ``(table, rows)`` for each section of a snapshot in ``stream``."""
+
+    tables = {table.name: table for table in SNAPSHOT_TABLES}
+    for line in iter(stream.readline, b""):
+        header = json.loads(line)
+        if header.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError("Not an ExportHub snapshot")
+        if header.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(
+                "Unsupported snapshot version {!r}".format(header.get("version"))
+            )
+        table = tables.get(header.get("table"))
+        if table is None:
+            raise ValueError(
+                "Unknown table {!r} in snapshot".format(header.get("table"))
+            )
+        if header.get("columns") != _columns(table):
+            raise ValueError(
+                "Snapshot columns for {} do not match the current schema".format(
+                    table.name
+                )
+            )
+        rows = _section_rows(stream, table)
+        yield table, rows
+        # Skip whatever the consumer left unread.
+        for _ in rows:
+            pass
+
+
+# Loading and dumping ------------------------------------------------------------
+
+
+def _sqlite_timestamp(value: str) -> str:
+    # Stored the way SQLAlchemy's SQLite dialect writes naive UTC datetimes.
+    if len(value) == 32 and value.endswith("+00:00"):
+        return value[:-6]
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+def _sqlite_decoder(table: Table) -> Callable[[bytes], tuple[Any, ...]]:
+    timestamps = [
+        index
+        for index, column in enumerate(table.columns)
+        if isinstance(column.type, DateTime)
+    ]
+
+    def decode(line: bytes) -> tuple[Any, ...]:
+        fields: list[Any] = line[:-1].decode("utf-8").split("\t")
+        if b"\\" in line:
+            fields = [
+                None if field == _NULL else _unescape(field) if "\\" in field else field
+                for field in fields
+            ]
+        for index in timestamps:
+            if fields[index] is not None:
+                fields[index] = _sqlite_timestamp(fields[index])
+        return tuple(fields)
+
+    return decode
+
+
+def _sqlite_field(column: Any, value: Any) -> Any:
+    if value is None:
+        return None
+    if isinstance(column.type, DateTime):
+        if len(value) == 26:
+            return value + "+00:00"
+        return _timestamp(datetime.fromisoformat(value).replace(tzinfo=timezone.utc))
+    if isinstance(column.type, Numeric) and column.type.scale is not None:
+        return "{:.{}f}".format(Decimal(str(value)), column.type.scale)
+    return value
+
+
+async def _batches(rows: Iterable[bytes]) -> AsyncIterator[list[bytes]]:
+    batch: list[bytes] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= _BATCH_ROWS:
+            yield batch
+            batch = []
+            # Generating and decoding rows is CPU-bound; let the loop breathe.
+            await asyncio.sleep(0)
+    if batch:
+        yield batch
+
+
+async def _copy_source(rows: Iterable[bytes]) -> AsyncIterator[bytes]:
+    async for batch in _batches(rows):
+        yield b"".join(batch)
+
+
+async def load_tables(
+    settings: BackendConfig, sections: Iterable[tuple[Table, Iterable[bytes]]]
+) -> dict[str, int]:
+    """Replace the snapshot tables with ``sections`` in a single transaction."""
+
+    counts: dict[str, int] = {}
+    session_factory = get_sessionmaker(settings.database_url)
+    async with session_factory() as session:
+        connection = await session.connection()
+        postgres = connection.dialect.name == "postgresql"
+        if postgres:
+            cleared = ", ".join(table.name for table in _CLEARED_TABLES)
+            await session.execute(text("SET LOCAL synchronous_commit = off"))
+            await session.execute(text("TRUNCATE {} CASCADE".format(cleared)))
+        else:
+            for table in _CLEARED_TABLES:
+                await session.execute(table.delete())
+        driver = (await connection.get_raw_connection()).driver_connection
+
+        for table, rows in sections:
+            columns = _columns(table)
+            if postgres:
+                status = await driver.copy_to_table(
+                    table.name,
+                    source=_copy_source(rows),
+                    columns=columns,
+                    format="text",
+                )
+                counts[table.name] = int(status.split()[-1])
+                await session.execute(
+                    text(
+                        "SELECT setval(pg_get_serial_sequence('{0}', 'id'), "
+                        "COALESCE(MAX(id), 1), MAX(id) IS NOT NULL) FROM {0}".format(
+                            table.name
+                        )
+                    )
+                )
+                continue
+            decode = _sqlite_decoder(table)
+            statement = "INSERT INTO {} ({}) VALUES ({})".format(
+                table.name, ", ".join(columns), ", ".join("?" * len(columns))
+            )
+            count = 0
+            pending: asyncio.Future[Any] | None = None
+            async for batch in _batches(rows):
+                # Decode the next batch while the driver thread inserts this one.
+                parameters = [decode(line) for line in batch]
+                if pending is not None:
+                    await pending
+                pending = asyncio.ensure_future(
+                    driver.executemany(statement, parameters)
+                )
+                count += len(batch)
+            if pending is not None:
+                await pending
+            counts[table.name] = count
+
+        await session.commit()
+        # Fresh statistics so the planner sees the new volumes straight away.
+        for table in SNAPSHOT_TABLES:
+            await session.execute(text("ANALYZE {}".format(table.name)))
+        await session.commit()
+    return counts
+
+
+async def dump_tables(settings: BackendConfig, stream: IO[bytes]) -> dict[str, int]:
+    """Write the snapshot tables of the configured database to ``stream``."""
+
+    counts: dict[str, int] = {}
+    session_factory = get_sessionmaker(settings.database_url)
+    async with session_factory() as session:
+        connection = await session.connection()
+        postgres = connection.dialect.name == "postgresql"
+        if postgres:
+            # One snapshot of every table, with timestamps rendered in UTC.
+            await session.execute(
+                text("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+            )
+            await session.execute(text("SET LOCAL TIME ZONE 'UTC'"))
+        driver = (await connection.get_raw_connection()).driver_connection
+
+        for table in SNAPSHOT_TABLES:
+            write_snapshot_header(stream, table)
+            columns = _columns(table)
+            if postgres:
+
+                async def _write(data: bytes) -> None:
+                    stream.write(data)
+
+                status = await driver.copy_from_table(
+                    table.name, columns=columns, output=_write, format="text"
+                )
+                counts[table.name] = int(status.split()[-1])
+            else:
+                count = 0
+                result = await session.stream(
+                    text(
+                        "SELECT {} FROM {} ORDER BY id".format(
+                            ", ".join(columns), table.name
+                        )
+                    )
+                )
+                async for batch in result.partitions(_BATCH_ROWS):
+                    for values in batch:
+                        stream.write(
+                            encode_row(
+                                *(
+                                    _sqlite_field(column, value)
+                                    for column, value in zip(table.columns, values)
+                                )
+                            )
+                        )
+                    count += len(batch)
+                counts[table.name] = count
+            stream.write(_END_OF_DATA)
+    return counts
+
+
+def _report(action: str, counts: dict[str, int], started: float) -> None:
+    print(
+        "{} {} in {:.2f}s".format(
+            action,
+            ", ".join("{} {}".format(count, name) for name, count in counts.items()),
+            time.perf_counter() - started,
+        )
+    )
+
+
+def _run(
+    settings: BackendConfig, work: Callable[[], Awaitable[dict[str, int]]]
+) -> dict[str, int]:
+    async def _main() -> dict[str, int]:
+        try:
+            await init_models(settings)
+            return await work()
+        finally:
+            await dispose_engines()
+
+    return asyncio.run(_main())
+
+
+def main(argv: list[str] | None = None) -> None:
+    from . import get_settings
+
+    parser = argparse.ArgumentParser(description="Manage benchmark datasets.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser(
+        "generate", help="Generate a synthetic dataset into the database or a file."
+    )
+    defaults = DatasetSpec()
+    generate.add_argument("--seed", type=int, default=defaults.seed)
+    generate.add_argument("--users", type=int, default=defaults.users)
+    generate.add_argument("--admins", type=int, default=defaults.admins)
+    generate.add_argument("--products", type=int, default=defaults.products)
+    generate.add_argument("--orders", type=int, default=defaults.orders)
+    generate.add_argument("--tokens", type=int, default=defaults.tokens)
+    generate.add_argument(
+        "--days",
+        type=int,
+        default=defaults.days,
+        help="Spread order timestamps over this many days before now.",
+    )
+    generate.add_argument(
+        "--product-skew",
+        type=float,
+        default=defaults.product_skew,
+        help="Zipf exponent of product popularity; 0 orders products uniformly.",
+    )
+    generate.add_argument(
+        "--user-skew",
+        type=float,
+        default=defaults.user_skew,
+        help="Zipf exponent of buyer activity; 0 spreads orders evenly over users.",
+    )
+    generate.add_argument(
+        "--untracked-stock-ratio",
+        type=float,
+        default=defaults.untracked_stock_ratio,
+        help="Share of products that do not track stock.",
+    )
+    generate.add_argument(
+        "--password",
+        default="benchmark-password",
+        help="Password shared by every generated user.",
+    )
+    generate.add_argument(
+        "--output", help="Write a snapshot to this path instead of the database."
+    )
+    generate.add_argument(
+        "--tokens-file",
+        help="Write the generated session tokens here as '<user id>\\t<token>' lines.",
+    )
+
+    dump = commands.add_parser("dump", help="Write the database to a snapshot file.")
+    dump.add_argument("path")
+    restore = commands.add_parser(
+        "restore", help="Replace the database contents with a snapshot file."
+    )
+    restore.add_argument("path")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    settings = get_settings()
+    started = time.perf_counter()
+
+    if args.command == "generate":
+        if min(args.users, args.products) < 1 and args.orders:
+            parser.error("orders need at least one user and one product")
+        spec = DatasetSpec(
+            users=args.users,
+            products=args.products,
+            orders=args.orders,
+            tokens=args.tokens,
+            admins=args.admins,
+            days=args.days,
+            product_skew=args.product_skew,
+            user_skew=args.user_skew,
+            untracked_stock_ratio=args.untracked_stock_ratio,
+            seed=args.seed,
+        )
+        generator = DatasetGenerator(
+            spec,
+            hash_password(
+                args.password, params=PasswordHashParams.from_settings(settings)
+            ),
+        )
+        sections = [(table, generator.rows(table)) for table in SNAPSHOT_TABLES]
+        if args.output:
+            with gzip.open(args.output, "wb", compresslevel=6) as stream:
+                counts = write_snapshot(stream, sections)
+        else:
+
+            async def _generate() -> dict[str, int]:
+                return await load_tables(settings, sections)
+
+            counts = _run(settings, _generate)
+        if args.tokens_file:
+            with open(args.tokens_file, "w", encoding="utf-8") as handle:
+                for user_id, token in generator.tokens:
+                    handle.write("{}\t{}\n".format(user_id, token))
+        _report("Generated", counts, started)
+    elif args.command == "dump":
+
+        async def _dump() -> dict[str, int]:
+            with gzip.open(args.path, "wb", compresslevel=6) as stream:
+                return await dump_tables(settings, stream)
+
+        _report("Dumped", _run(settings, _dump), started)
+    else:
+
+        async def _restore() -> dict[str, int]:
+            with gzip.open(args.path, "rb") as stream:
+                return await load_tables(settings, read_snapshot(stream))
+
+        _report("Restored", _run(settings, _restore), started)
+
+
+__all__ = [
+    "SNAPSHOT_TABLES",
+    "DatasetGenerator",
+    "DatasetSpec",
+    "dump_tables",
+    "encode_row",
+    "load_tables",
+    "read_snapshot",
+    "write_snapshot",
+    "write_snapshot_header",
+]
+
+
+if __name__ == "__main__":  # pragma: no cover - manual execution helper
+    main()
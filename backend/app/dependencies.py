@@ -2,29 +2,58 @@
 
 from __future__ import annotations
 
+from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import Annotated
+from typing import Annotated, Any, Union
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from .config import BackendConfig
 from .database import get_sessionmaker
-from .auth import hash_token
+from .auth import decode_signed_token, hash_token, is_signed_token
 from .models import SessionToken, User
+from .revocation import get_revocation_list
+from .settings import current_settings
 
 
-def _resolve_settings() -> BackendConfig:
-    from . import get_settings
+async def _resolve_settings() -> BackendConfig:
+    # Async so FastAPI calls it inline instead of on the thread pool.
+    return current_settings()
 
-    return get_settings()
+
+SettingsDep = Annotated[BackendConfig, Depends(_resolve_settings)]
+
+_SHARED_SESSION_KEY = "exporthub.shared_session"
+_SHARED_IDENTITY_KEY = "exporthub.shared_identity"
+
+
+def shared_request_scope(
+    identity: Union[Principal, User, None], session: AsyncSession | None = None
+) -> dict[str, Any]:
+    """Scope entries that make a dispatched sub-request reuse the caller's state.
+
+    The identity replaces credential checks. With ``session``, the sub-request
+    runs in that session and the caller owns commit and rollback.
+    """
+
+    entries: dict[str, Any] = {_SHARED_IDENTITY_KEY: identity}
+    if session is not None:
+        entries[_SHARED_SESSION_KEY] = session
+    return entries
 
 
 async def _session_dependency(
+    request: Request,
     settings: BackendConfig = Depends(_resolve_settings),
 ) -> AsyncSession:
+    shared = request.scope.get(_SHARED_SESSION_KEY)
+    if shared is not None:
+        yield shared
+        return
+
     session_factory = get_sessionmaker(settings.database_url)
     session = session_factory()
     try:
@@ -43,6 +72,25 @@ SessionDep = Annotated[AsyncSession, Depends(_session_dependency)]
 _bearer_scheme = HTTPBearer(auto_error=False)
 
 
+@dataclass(frozen=True)
+class Principal:
+    """Identity carried by a verified signed token, resolved without the database."""
+
+    id: int
+    role: str
+
+
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=detail)
+
+
+def _is_expired(expires_at: datetime) -> bool:
+    # SQLite hands back naive datetimes even for timezone-aware columns.
+    if expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=timezone.utc)
+    return expires_at <= datetime.now(timezone.utc)
+
+
 async def _resolve_user_from_token(token: str, session: AsyncSession) -> User:
     token_hash = hash_token(token)
     token_result = await session.execute(
@@ -50,78 +98,178 @@ async def _resolve_user_from_token(token: str, session: AsyncSession) -> User:
     )
     record = token_result.scalar_one_or_none()
     if record is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication token.",
-        )
+        raise _unauthorized("Invalid authentication token.")
 
-    if record.expires_at <= datetime.now(timezone.utc):
+    if _is_expired(record.expires_at):
         await session.delete(record)
         await session.flush()
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Session token has expired.",
-        )
+        raise _unauthorized("Session token has expired.")
 
     user_result = await session.execute(
         select(User).where(User.id == record.user_id).limit(1)
     )
     user = user_result.scalar_one_or_none()
     if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User linked to the token no longer exists.",
-        )
+        raise _unauthorized("User linked to the token no longer exists.")
 
     return user
 
 
-async def get_optional_user(
+async def _resolve_principal_from_signed_token(
+    token: str, settings: BackendConfig
+) -> Principal:
+    claims = decode_signed_token(token, settings.secret_key)
+    if claims is None:
+        raise _unauthorized("Invalid authentication token.")
+    if _is_expired(claims.expires_at):
+        raise _unauthorized("Session token has expired.")
+
+    revocations = get_revocation_list(settings.session_revocation_refresh_seconds)
+    if await revocations.contains(claims.token_id, settings):
+        raise _unauthorized("Invalid authentication token.")
+    return Principal(id=claims.user_id, role=claims.role)
+
+
+async def _authenticate(
+    token: str, session: AsyncSession, settings: BackendConfig
+) -> Union[Principal, User]:
+    # Database tokens stay valid in signed mode so switching to it does not log
+    # anyone out. Signed tokens are only trusted in signed mode, where the
+    # configuration guarantees a private secret key.
+    if settings.session_token_mode == "signed" and is_signed_token(token):
+        return await _resolve_principal_from_signed_token(token, settings)
+    return await _resolve_user_from_token(token, session)
+
+
+async def resolve_bearer_identity(
+    authorization: str | None, settings: BackendConfig
+) -> Union[Principal, User, None]:
+    """Authenticate a raw ``Authorization`` header outside dependency injection.
+
+    Middleware uses this to make decisions before routing; it opens its own
+    short session and returns ``None`` for missing or invalid credentials.
+    """
+
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    session_factory = get_sessionmaker(settings.database_url)
+    async with session_factory() as session:
+        try:
+            identity = await _authenticate(token.strip(), session, settings)
+        except HTTPException:
+            identity = None
+        await session.commit()
+    return identity
+
+
+async def get_optional_principal(
+    request: Request,
     session: SessionDep,
+    settings: SettingsDep,
     credentials: HTTPAuthorizationCredentials | None = Depends(_bearer_scheme),
-) -> User | None:
-    """Return the authenticated user when credentials are supplied."""
+) -> Union[Principal, User, None]:
+    """Return the caller's identity when valid credentials are supplied."""
 
+    if _SHARED_IDENTITY_KEY in request.scope:
+        return request.scope[_SHARED_IDENTITY_KEY]
     if credentials is None:
         return None
     try:
-        return await _resolve_user_from_token(credentials.credentials, session)
+        return await _authenticate(credentials.credentials, session, settings)
     except HTTPException:
         return None
 
 
-async def get_current_user(
+async def get_current_principal(
+    request: Request,
     session: SessionDep,
+    settings: SettingsDep,
     credentials: HTTPAuthorizationCredentials | None = Depends(_bearer_scheme),
-) -> User:
-    """Ensure the request is authenticated and return the associated user."""
+) -> Union[Principal, User]:
+    """Return the caller's id and role, avoiding the database for signed tokens."""
 
+    if _SHARED_IDENTITY_KEY in request.scope:
+        identity = request.scope[_SHARED_IDENTITY_KEY]
+        if identity is None:
+            raise _unauthorized("Authentication credentials were not provided.")
+        return identity
     if credentials is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Authentication credentials were not provided.",
-        )
-    return await _resolve_user_from_token(credentials.credentials, session)
+        raise _unauthorized("Authentication credentials were not provided.")
+    return await _authenticate(credentials.credentials, session, settings)
+
+
+PrincipalDep = Annotated[Union[Principal, User], Depends(get_current_principal)]
+
+
+async def get_current_user(session: SessionDep, identity: PrincipalDep) -> User:
+    """Ensure the request is authenticated and return the associated user row.
+
+    Only needed where the account's own fields are used; signed tokens resolve
+    to a :class:`Principal` without it.
+    """
 
+    if isinstance(identity, User):
+        return identity
+    user = await session.get(User, identity.id)
+    if user is None:
+        raise _unauthorized("User linked to the token no longer exists.")
+    return user
+
+
+UserDep = Annotated[User, Depends(get_current_user)]
+
+
+async def has_admin_role(
+    identity: Union[Principal, User], session: AsyncSession
+) -> bool:
+    """Return whether the caller is currently an administrator.
 
-async def get_current_admin(user: Annotated[User, Depends(get_current_user)]) -> User:
+    Administrator rights are always confirmed against the user row, so deleted
+    or demoted accounts lose them straight away. A signed token can only lower
+    privileges: one issued without the admin role is refused without a query,
+    and one issued with it costs a single lookup of the role.
+    """
+
+    if isinstance(identity, User):
+        return identity.role == "admin"
+    if identity.role != "admin":
+        return False
+    role = await session.scalar(select(User.role).where(User.id == identity.id))
+    return role == "admin"
+
+
+async def get_current_admin(
+    session: SessionDep, identity: PrincipalDep
+) -> Union[Principal, User]:
     """Restrict access to administrator accounts only."""
 
-    if user.role != "admin":
+    if not await has_admin_role(identity, session):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Administrator privileges are required for this operation.",
         )
-    return user
+    return identity
 
 
-UserDep = Annotated[User, Depends(get_current_user)]
-AdminDep = Annotated[User, Depends(get_current_admin)]
+AdminDep = Annotated[Union[Principal, User], Depends(get_current_admin)]
+OptionalPrincipalDep = Annotated[
+    Union[Principal, User, None], Depends(get_optional_principal)
+]
 
 __all__ = [
     "AdminDep",
+    "OptionalPrincipalDep",
+    "Principal",
+    "PrincipalDep",
     "SessionDep",
+    "SettingsDep",
     "UserDep",
+    "get_current_admin",
+    "get_current_principal",
     "get_current_user",
-    "get_optional_user",
+    "get_optional_principal",
+    "has_admin_role",
+    "resolve_bearer_identity",
+    "shared_request_scope",
 ]
@@ -0,0 +1,351 @@
+"""Stock accounting for orders.
+
+Every decrement is a single conditional statement,
+``UPDATE products SET stock = stock - :qty WHERE id = :id AND stock >= :qty``,
+so concurrent orders can never drive stock below zero. Products whose ``stock``
+is ``NULL`` do not track inventory and always accept orders.
+
+Under a flash sale every order for the same product queues on that product's
+row lock. With ``BACKEND_INVENTORY_RESERVATION_CHUNK`` set, each process instead
+moves stock from the database into a local pool a chunk at a time, in a short
+transaction of its own, and serves orders from the pool in memory. Only one
+refill per product is in flight per process, so the row sees one update per
+chunk rather than one per order. Orders that roll back return their units to
+the pool, and units left unsold when a pool expires (or the process stops) are
+written back. Once the database holds less than a chunk, orders fall back to the
+direct conditional update, so the last units are still sold exactly. A process
+that dies while holding a pool undersells by at most one chunk per product; it
+never oversells.
+
+Writing a product's stock through the API retires this process's pool for it
+once the write commits. Setting ``stock`` outright also bumps the product's
+``stock_epoch``; pools remember the epoch they were filled under, and units from
+an older epoch are dropped instead of being added to the new count, in every
+process. A pool for an untracked product re-reads ``stock`` before each order,
+so orders start being counted as soon as tracking starts.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+from sqlalchemy import event, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .config import BackendConfig
+from .database import get_sessionmaker
+from .models import Product
+from .querybudget import untracked_queries
+
+logger = logging.getLogger(__name__)
+
+_HELD_KEY = "exporthub.inventory.held"
+_RETIRED_KEY = "exporthub.inventory.retired"
+
+_active_reservations: StockReservations | None = None
+
+
+async def decrement_stock(
+    session: AsyncSession, product_id: int, quantity: int
+) -> bool:
+    """Take ``quantity`` units in the caller's transaction; ``False`` if short.
+
+    Issue this as the last statement before commit: the row stays locked until
+    the transaction ends, so later statements would lengthen the queue of
+    concurrent orders waiting on it.
+    """
+
+    result = await session.execute(
+        update(Product)
+        .where(
+            Product.id == product_id,
+            or_(Product.stock.is_(None), Product.stock >= quantity),
+        )
+        .values(stock=Product.stock - quantity)
+        .returning(Product.id)
+        .execution_options(synchronize_session=False)
+    )
+    return result.first() is not None
+
+
+@dataclass
+class _Pool:
+    units: int | None
+    expires_at: float
+    # Set when the database held less than a chunk; skip refills until then.
+    refill_after: float = 0.0
+    # ``stock_epoch`` of the product when these units were taken.
+    epoch: int = 0
+
+
+class StockReservations:
+    """Per-process pools of stock moved out of the database in chunks."""
+
+    def __init__(
+        self, settings: BackendConfig, *, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self._settings = settings
+        self._session_factory = get_sessionmaker(settings.database_url)
+        self._clock = clock
+        self._pools: dict[int, _Pool] = {}
+        self._locks: dict[int, asyncio.Lock] = {}
+        self._task: asyncio.Task[None] | None = None
+
+    def _take_local(self, product_id: int, quantity: int) -> bool:
+        pool = self._pools.get(product_id)
+        if pool is None or pool.expires_at <= self._clock():
+            return False
+        if pool.units is None:
+            return True
+        if pool.units < quantity:
+            return False
+        pool.units -= quantity
+        return True
+
+    def _live_pool(self, product_id: int) -> _Pool | None:
+        pool = self._pools.get(product_id)
+        if pool is None or pool.expires_at <= self._clock():
+            return None
+        return pool
+
+    async def take(self, session: AsyncSession, product_id: int, quantity: int) -> bool:
+        """Reserve units from the local pool, refilling it if needed.
+
+        Returns ``False`` when the database no longer holds a full chunk; the
+        caller should then decrement the row directly. An untracked product is
+        re-checked in ``session`` first, without locking the row.
+        """
+
+        pool = self._live_pool(product_id)
+        if pool is not None and pool.units is None:
+            stock = await session.scalar(
+                select(Product.stock).where(Product.id == product_id)
+            )
+            if stock is None:
+                return True
+            # Tracking has started since the pool was filled.
+            del self._pools[product_id]
+        if self._take_local(product_id, quantity):
+            return True
+        lock = self._locks.setdefault(product_id, asyncio.Lock())
+        async with lock:
+            # Another request may have refilled the pool while we waited.
+            if self._take_local(product_id, quantity):
+                return True
+            pool = self._pools.get(product_id)
+            if pool is not None and pool.refill_after > self._clock():
+                return False
+            if not await self._refill(product_id, quantity):
+                return False
+            return self._take_local(product_id, quantity)
+
+    async def _refill(self, product_id: int, quantity: int) -> bool:
+        chunk = max(self._settings.inventory_reservation_chunk, quantity)
+        # Counted against the order that triggered it, like the direct update.
+        async with self._session_factory() as session:
+            result = await session.execute(
+                update(Product)
+                .where(
+                    Product.id == product_id,
+                    or_(Product.stock.is_(None), Product.stock >= chunk),
+                )
+                .values(stock=Product.stock - chunk)
+                .returning(Product.stock, Product.stock_epoch)
+                .execution_options(synchronize_session=False)
+            )
+            row = result.first()
+            await session.commit()
+
+        pool = self._pools.get(product_id)
+        leftover = pool.units if pool is not None and pool.units else 0
+        epoch = pool.epoch if pool is not None else 0
+        expires_at = self._clock() + self._settings.inventory_reservation_ttl_seconds
+        if row is None:
+            self._pools[product_id] = _Pool(
+                units=leftover,
+                expires_at=expires_at,
+                refill_after=expires_at,
+                epoch=epoch,
+            )
+            return False
+        if row.stock is None:
+            self._pools[product_id] = _Pool(units=None, expires_at=expires_at)
+            return True
+        if (row.stock_epoch or 0) != epoch:
+            # The count was reset since the leftover units were taken.
+            leftover = 0
+        self._pools[product_id] = _Pool(
+            units=leftover + chunk, expires_at=expires_at, epoch=row.stock_epoch or 0
+        )
+        return True
+
+    def epoch(self, product_id: int) -> int:
+        """Return the stock epoch of the units currently pooled for a product."""
+
+        pool = self._pools.get(product_id)
+        return pool.epoch if pool is not None else 0
+
+    def give_back(self, product_id: int, quantity: int, epoch: int) -> None:
+        """Return units reserved by a transaction that did not commit."""
+
+        pool = self._pools.get(product_id)
+        if pool is None:
+            # Keep the units until the next flush writes them back.
+            self._pools[product_id] = _Pool(units=quantity, expires_at=0.0, epoch=epoch)
+        elif pool.units is not None and pool.epoch == epoch:
+            pool.units += quantity
+
+    def retire(self, product_id: int) -> None:
+        """Stop serving a product's pool; its units go back on the next flush."""
+
+        pool = self._pools.get(product_id)
+        if pool is not None:
+            pool.expires_at = 0.0
+            pool.refill_after = 0.0
+
+    async def flush(self, *, expired_only: bool = True) -> int:
+        """Write unsold units of expired pools back; return how many were restored.
+
+        Units reserved before the product's stock was last set outright are
+        dropped instead.
+        """
+
+        now = self._clock()
+        returned: dict[int, tuple[int, int]] = {}
+        for product_id, pool in list(self._pools.items()):
+            if expired_only and pool.expires_at > now:
+                continue
+            lock = self._locks.get(product_id)
+            if lock is not None and lock.locked():
+                continue
+            del self._pools[product_id]
+            self._locks.pop(product_id, None)
+            if pool.units:
+                returned[product_id] = (pool.units, pool.epoch)
+        if not returned:
+            return 0
+
+        restored = 0
+        with untracked_queries():
+            async with self._session_factory() as session:
+                for product_id, (units, epoch) in returned.items():
+                    result = await session.execute(
+                        update(Product)
+                        .where(
+                            Product.id == product_id,
+                            Product.stock.is_not(None),
+                            func.coalesce(Product.stock_epoch, 0) == epoch,
+                        )
+                        .values(stock=Product.stock + units)
+                        .execution_options(synchronize_session=False)
+                    )
+                    if result.rowcount:
+                        restored += units
+                await session.commit()
+        return restored
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run(), name="stock-reservations")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush(expired_only=False)
+
+    async def _run(self) -> None:
+        interval = max(self._settings.inventory_reservation_ttl_seconds, 1)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # pragma: no cover - retry on the next tick
+                logger.exception("Returning reserved stock failed")
+
+
+async def take_pooled_stock(
+    session: AsyncSession, product_id: int, quantity: int
+) -> bool:
+    """Take ``quantity`` units from this process's pool for ``session``'s order.
+
+    Call this before the transaction writes anything: a refill runs in its own
+    transaction, which on SQLite would otherwise wait on the caller's write
+    lock. Returns ``False`` when pools are disabled or the database holds less
+    than a chunk, in which case use :func:`decrement_stock`. Units are handed
+    back if ``session`` rolls back.
+    """
+
+    reservations = _active_reservations
+    if reservations is None or not await reservations.take(
+        session, product_id, quantity
+    ):
+        return False
+    session.info.setdefault(_HELD_KEY, []).append(
+        (reservations, product_id, quantity, reservations.epoch(product_id))
+    )
+    return True
+
+
+def retire_stock_pool(session: AsyncSession, product_id: int) -> None:
+    """Retire this process's pool for ``product_id`` once ``session`` commits.
+
+    Call this from every write to a product's ``stock``.
+    """
+
+    session.info.setdefault(_RETIRED_KEY, set()).add(product_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _release_held_stock_after_commit(session: Session) -> None:
+    session.info.pop(_HELD_KEY, None)
+    retired = session.info.pop(_RETIRED_KEY, ())
+    if _active_reservations is not None:
+        for product_id in retired:
+            _active_reservations.retire(product_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _return_held_stock_after_rollback(session: Session) -> None:
+    session.info.pop(_RETIRED_KEY, None)
+    for reservations, product_id, quantity, epoch in session.info.pop(_HELD_KEY, ()):
+        reservations.give_back(product_id, quantity, epoch)
+
+
+async def start_stock_reservations(settings: BackendConfig) -> None:
+    """Enable local stock pools when a reservation chunk is configured."""
+
+    global _active_reservations
+
+    if settings.inventory_reservation_chunk <= 0:
+        return
+    reservations = StockReservations(settings)
+    await reservations.start()
+    _active_reservations = reservations
+
+
+async def stop_stock_reservations() -> None:
+    """Stop serving from local pools and return their unsold units."""
+
+    global _active_reservations
+
+    reservations, _active_reservations = _active_reservations, None
+    if reservations is not None:
+        await reservations.stop()
+
+
+__all__ = [
+    "StockReservations",
+    "decrement_stock",
+    "retire_stock_pool",
+    "start_stock_reservations",
+    "stop_stock_reservations",
+    "take_pooled_stock",
+]
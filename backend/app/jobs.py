@@ -0,0 +1,274 @@
+"""Database-backed background job queue with an in-process worker pool.
+
+Route handlers call :func:`enqueue` with their request session, so a job row is
+committed atomically with the change that triggered it (the outbox pattern).
+Workers claim due jobs with ``UPDATE ... RETURNING`` guarded by
+``FOR UPDATE SKIP LOCKED`` on PostgreSQL, which keeps several workers or
+processes from picking up the same job. A claimed job holds a lease; jobs whose
+lease expires (for example because the process died) become claimable again.
+Failures are retried with exponential backoff until ``job_max_attempts`` is
+reached, after which the job is left in the ``dead`` state for inspection.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable
+
+from sqlalchemy import and_, delete, event, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .config import BackendConfig
+from .database import get_sessionmaker
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DEAD = "dead"
+
+_MAX_BACKOFF_SECONDS = 3600
+_WAKEUP_FLAG = "exporthub.jobs.enqueued"
+
+JobHandler = Callable[[dict[str, Any], AsyncSession], Awaitable[None]]
+
+_handlers: dict[str, JobHandler] = {}
+_active_pool: JobWorkerPool | None = None
+
+
+def _now() -> datetime:
+    """Return the current UTC timestamp."""
+
+    return datetime.now(timezone.utc)
+
+
+def job_handler(kind: str) -> Callable[[JobHandler], JobHandler]:
+    """Register the decorated coroutine as the handler for ``kind`` jobs.
+
+    Handlers receive the job payload and a session whose transaction also marks
+    the job as complete, so their database writes commit exactly once.
+    """
+
+    def decorator(func: JobHandler) -> JobHandler:
+        if kind in _handlers:
+            raise ValueError(
+                "A handler for job kind {!r} is already registered".format(kind)
+            )
+        _handlers[kind] = func
+        return func
+
+    return decorator
+
+
+def enqueue(
+    session: AsyncSession,
+    kind: str,
+    payload: dict[str, Any],
+    *,
+    delay_seconds: float = 0,
+) -> Job:
+    """Add a job to the caller's transaction; it runs once that commits."""
+
+    job = Job(
+        kind=kind,
+        payload=payload,
+        status=JOB_PENDING,
+        attempts=0,
+        run_after=_now() + timedelta(seconds=delay_seconds),
+    )
+    session.add(job)
+    wake_workers_on_commit(session)
+    return job
+
+
+def wake_workers_on_commit(session: AsyncSession) -> None:
+    """Nudge this process's workers once the session's transaction commits."""
+
+    session.info[_WAKEUP_FLAG] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_workers_after_commit(session: Session) -> None:
+    if session.info.pop(_WAKEUP_FLAG, False) and _active_pool is not None:
+        _active_pool.wake()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_wakeup_after_rollback(session: Session) -> None:
+    session.info.pop(_WAKEUP_FLAG, None)
+
+
+def _retry_delay(settings: BackendConfig, attempts: int) -> float:
+    """Exponential backoff with jitter for the given number of failed attempts."""
+
+    delay = settings.job_retry_base_seconds * 2 ** max(0, attempts - 1)
+    delay = min(delay, _MAX_BACKOFF_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+class JobWorkerPool:
+    """Run a fixed number of asyncio workers that drain the ``jobs`` table."""
+
+    def __init__(self, settings: BackendConfig) -> None:
+        self._settings = settings
+        self._session_factory = get_sessionmaker(settings.database_url)
+        self._wakeup = asyncio.Event()
+        self._tasks: list[asyncio.Task[None]] = []
+        self._stopping = False
+
+    def wake(self) -> None:
+        """Make idle workers poll immediately instead of waiting for the timer."""
+
+        self._wakeup.set()
+
+    async def start(self) -> None:
+        self._stopping = False
+        self._tasks = [
+            asyncio.create_task(self._worker(index), name="job-worker-{}".format(index))
+            for index in range(self._settings.job_workers)
+        ]
+
+    async def stop(self) -> None:
+        """Stop the workers; jobs in flight are retried once their lease lapses."""
+
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self, index: int) -> None:
+        poll_interval = self._settings.job_poll_interval_ms / 1000.0
+        while not self._stopping:
+            try:
+                ran = await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # pragma: no cover - keep the worker alive
+                logger.exception("Job worker %s failed to poll the queue", index)
+                ran = False
+            if ran:
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _claim(self) -> Job | None:
+        now = _now()
+        due = or_(
+            and_(Job.status == JOB_PENDING, Job.run_after <= now),
+            and_(Job.status == JOB_RUNNING, Job.locked_until <= now),
+        )
+        candidate = (
+            select(Job.id)
+            .where(due)
+            .order_by(Job.run_after)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        statement = (
+            update(Job)
+            .where(Job.id == candidate, due)
+            .values(
+                status=JOB_RUNNING,
+                attempts=Job.attempts + 1,
+                locked_until=now + timedelta(seconds=self._settings.job_lease_seconds),
+            )
+            .returning(Job)
+        )
+        async with self._session_factory() as session:
+            job = (await session.scalars(statement)).one_or_none()
+            await session.commit()
+        return job
+
+    async def run_once(self) -> bool:
+        """Claim and execute a single due job; return whether one was found."""
+
+        job = await self._claim()
+        if job is None:
+            return False
+
+        handler = _handlers.get(job.kind)
+        async with self._session_factory() as session:
+            try:
+                if handler is None:
+                    raise LookupError(
+                        "No handler registered for job kind {!r}".format(job.kind)
+                    )
+                await handler(job.payload, session)
+                await session.execute(delete(Job).where(Job.id == job.id))
+                await session.commit()
+                return True
+            except Exception as exc:
+                await session.rollback()
+                logger.warning(
+                    "Job %s (%s) failed on attempt %s: %s",
+                    job.id,
+                    job.kind,
+                    job.attempts,
+                    exc,
+                )
+                error = "{}: {}".format(type(exc).__name__, exc)
+                retryable = handler is not None
+
+        if retryable and job.attempts < self._settings.job_max_attempts:
+            values: dict[str, Any] = {
+                "status": JOB_PENDING,
+                "run_after": _now()
+                + timedelta(seconds=_retry_delay(self._settings, job.attempts)),
+            }
+        else:
+            logger.error("Job %s (%s) moved to the dead letter state", job.id, job.kind)
+            values = {"status": JOB_DEAD}
+        async with self._session_factory() as session:
+            await session.execute(
+                update(Job)
+                .where(Job.id == job.id)
+                .values(locked_until=None, last_error=error[:2000], **values)
+            )
+            await session.commit()
+        return True
+
+
+async def start_job_workers(settings: BackendConfig) -> JobWorkerPool | None:
+    """Start the process-wide worker pool when workers are configured."""
+
+    global _active_pool
+
+    if settings.job_workers <= 0:
+        return None
+    pool = JobWorkerPool(settings)
+    await pool.start()
+    _active_pool = pool
+    return pool
+
+
+async def stop_job_workers() -> None:
+    """Stop the process-wide worker pool if it is running."""
+
+    global _active_pool
+
+    pool, _active_pool = _active_pool, None
+    if pool is not None:
+        await pool.stop()
+
+
+__all__ = [
+    "JOB_DEAD",
+    "JOB_PENDING",
+    "JOB_RUNNING",
+    "JobWorkerPool",
+    "enqueue",
+    "job_handler",
+    "start_job_workers",
+    "stop_job_workers",
+    "wake_workers_on_commit",
+]
@@ -5,9 +5,15 @@ from __future__ import annotations
 from datetime import datetime
 from decimal import Decimal
 
+from typing import Any
+
 from sqlalchemy import (
+    JSON,
     DateTime,
+    CheckConstraint,
     ForeignKey,
+    Index,
+    Integer,
     Numeric,
     String,
     Text,
@@ -18,7 +24,17 @@ from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 
 class Base(DeclarativeBase):
-    """Base declarative class for all models."""
+    """Base declarative class for all models.
+
+    Relationships use ``lazy="raise_on_sql"`` so an accidental lazy load (an
+    N+1 query, or implicit IO in async code) fails loudly; load related rows
+    explicitly with ``selectinload``/``joinedload`` instead. Collections rely on
+    ``ON DELETE CASCADE`` via ``passive_deletes`` rather than loading children.
+    """
+
+    # Fetch server-generated columns (ids, ``created_at``) through RETURNING as
+    # part of the flush instead of a follow-up SELECT.
+    __mapper_args__ = {"eager_defaults": True}
 
 
 class Product(Base):
@@ -31,12 +47,26 @@ class Product(Base):
     description: Mapped[str] = mapped_column(Text, nullable=False)
     price: Mapped[Decimal] = mapped_column(Numeric(10, 2), nullable=False)
     seller_name: Mapped[str] = mapped_column(String(80), nullable=False)
+    # Units available to order; ``NULL`` means inventory is not tracked.
+    stock: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    # Bumped whenever ``stock`` is set outright, so units reserved from an older
+    # count are not added back on top of the new one.
+    stock_epoch: Mapped[int | None] = mapped_column(Integer, nullable=True)
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now(), nullable=False
     )
 
+    __table_args__ = (
+        CheckConstraint(
+            "stock IS NULL OR stock >= 0", name="ck_products_stock_non_negative"
+        ),
+    )
+
     orders: Mapped[list["Order"]] = relationship(
-        back_populates="product", cascade="all, delete-orphan"
+        back_populates="product",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        lazy="raise_on_sql",
     )
 
 
@@ -56,11 +86,42 @@ class Order(Base):
     quantity: Mapped[int] = mapped_column(nullable=False)
     total_price: Mapped[Decimal] = mapped_column(Numeric(10, 2), nullable=False)
     created_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True), server_default=func.now(), nullable=False
+        DateTime(timezone=True), server_default=func.now(), nullable=False, index=True
+    )
+
+    product: Mapped[Product] = relationship(
+        back_populates="orders", lazy="raise_on_sql"
     )
+    buyer: Mapped["User"] = relationship(back_populates="orders", lazy="raise_on_sql")
+
+
+class ArchivedOrder(Base):
+    """An order moved out of the hot ``orders`` table once it aged past the cutoff.
 
-    product: Mapped[Product] = relationship(back_populates="orders")
-    buyer: Mapped["User"] = relationship(back_populates="orders")
+    On PostgreSQL the table is range-partitioned by month on ``created_at``; the
+    partitions are created on demand by :mod:`app.archive`.
+    """
+
+    __tablename__ = "orders_archive"
+    __table_args__ = (
+        Index("ix_orders_archive_user_created", "user_id", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    product_id: Mapped[int] = mapped_column(
+        ForeignKey("products.id", ondelete="CASCADE"), nullable=False
+    )
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+    buyer_name: Mapped[str] = mapped_column(String(80), nullable=False)
+    quantity: Mapped[int] = mapped_column(nullable=False)
+    total_price: Mapped[Decimal] = mapped_column(Numeric(10, 2), nullable=False)
+    # Part of the primary key because PostgreSQL requires the partition key in it.
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), primary_key=True
+    )
 
 
 class User(Base):
@@ -79,10 +140,16 @@ class User(Base):
     )
 
     tokens: Mapped[list["SessionToken"]] = relationship(
-        back_populates="user", cascade="all, delete-orphan"
+        back_populates="user",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        lazy="raise_on_sql",
     )
     orders: Mapped[list[Order]] = relationship(
-        back_populates="buyer", cascade="all, delete-orphan"
+        back_populates="buyer",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        lazy="raise_on_sql",
     )
 
 
@@ -99,9 +166,50 @@ class SessionToken(Base):
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now(), nullable=False
     )
-    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False
+    )
+
+    user: Mapped[User] = relationship(back_populates="tokens", lazy="raise_on_sql")
+
+
+class RevokedToken(Base):
+    """Identifier of a signed session token invalidated before its expiry."""
+
+    __tablename__ = "revoked_tokens"
 
-    user: Mapped[User] = relationship(back_populates="tokens")
+    token_id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    expires_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, index=True
+    )
+
+
+class Job(Base):
+    """Deferred unit of work written in the same transaction as its trigger."""
+
+    __tablename__ = "jobs"
+    __table_args__ = (Index("ix_jobs_status_run_after", "status", "run_after"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    kind: Mapped[str] = mapped_column(String(80), nullable=False)
+    payload: Mapped[dict[str, Any]] = mapped_column(JSON, nullable=False)
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default="pending")
+    attempts: Mapped[int] = mapped_column(nullable=False, default=0)
+    run_after: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    locked_until: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    last_error: Mapped[str | None] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
 
 
-__all__ = ["Base", "Product", "Order", "SessionToken", "User"]
+__all__ = [
+    "ArchivedOrder",
+    "Base",
+    "Job",
+    "Product",
+    "Order",
+    "RevokedToken",
+    "SessionToken",
+    "User",
+]
@@ -0,0 +1,309 @@
+"""Read-through cache for products looked up by id.
+
+Order placement and ``GET /products/{id}`` read the same few rows over and over
+during a sale. Each process keeps the most recently used products (and ids known
+not to exist) in a bounded LRU. ``BACKEND_PRODUCT_CACHE_BACKEND`` optionally adds
+a tier shared between workers, such as Redis.
+
+Every product has a version stamp that writers bump once their transaction
+commits, and an entry is only served while it carries the current stamp. A
+reader that loaded the row just before a write committed therefore caches it
+under a stamp that is already stale, so it is never served. With the shared tier
+the stamp lives there and every worker sees a change as soon as it is
+published. Without it, other processes keep serving their own copies for up to
+``BACKEND_PRODUCT_CACHE_TTL_SECONDS``.
+
+Stock is cached with the rest of the product but orders do not invalidate it, so
+the ``stock`` shown by cached reads can lag by up to the TTL. Stock is still
+taken with a conditional update, so orders never oversell.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import importlib
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Protocol
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .config import BackendConfig
+from .models import Product
+from .schemas import ProductRead
+
+logger = logging.getLogger(__name__)
+
+_INVALIDATED_KEY = "exporthub.productcache.invalidated"
+# Shared-tier value recording that a product id does not exist.
+_MISSING = "null"
+
+
+class ProductCacheBackend(Protocol):
+    """Key-value store shared between workers."""
+
+    async def get(self, key: str) -> str | None:
+        """Return the value stored under ``key``, or ``None``."""
+
+    async def set(self, key: str, value: str, *, ttl_seconds: float) -> None:
+        """Store ``value`` under ``key`` for ``ttl_seconds``."""
+
+    async def incr(self, key: str) -> int:
+        """Atomically increment the integer under ``key`` (from ``0``)."""
+
+
+def _version_key(product_id: int) -> str:
+    return "product:{}:version".format(product_id)
+
+
+def _entry_key(product_id: int, version: int) -> str:
+    return "product:{}:v{}".format(product_id, version)
+
+
+@dataclass
+class _Entry:
+    product: ProductRead | None
+    version: int
+    expires_at: float
+
+
+def _load_backend(path: str, settings: BackendConfig) -> ProductCacheBackend:
+    """Import a ``module:factory`` path and build a backend from it."""
+
+    module_name, _, attribute = path.partition(":")
+    if not module_name or not attribute:
+        raise ValueError(
+            "BACKEND_PRODUCT_CACHE_BACKEND must look like 'package.module:factory', "
+            "got {!r}".format(path)
+        )
+    factory = getattr(importlib.import_module(module_name), attribute)
+    return factory(settings)
+
+
+class ProductCache:
+    """Versioned product-by-id cache with a per-process LRU tier."""
+
+    def __init__(
+        self,
+        settings: BackendConfig,
+        *,
+        backend: ProductCacheBackend | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._settings = settings
+        self._max_entries = max(1, settings.product_cache_size)
+        self._ttl = settings.product_cache_ttl_seconds
+        self._clock = clock
+        self._shared = backend
+        self._entries: OrderedDict[int, _Entry] = OrderedDict()
+        self._versions: dict[int, int] = {}
+        # Products whose new version is still being written to the shared tier.
+        self._publishing: dict[int, int] = {}
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def configure(self, settings: BackendConfig) -> None:
+        """Apply reloaded size and TTL settings without dropping the cache."""
+
+        if settings is self._settings:
+            return
+        self._settings = settings
+        self._max_entries = max(1, settings.product_cache_size)
+        self._ttl = settings.product_cache_ttl_seconds
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    async def _current_version(self, product_id: int) -> int | None:
+        """Return the version entries must carry, or ``None`` to bypass the cache."""
+
+        if self._shared is None:
+            return self._versions.get(product_id, 0)
+        if product_id in self._publishing:
+            return None
+        try:
+            return int(await self._shared.get(_version_key(product_id)) or 0)
+        except Exception as exc:  # pragma: no cover - degrade to the database
+            logger.warning("Shared product cache failed: %s", exc)
+            return None
+
+    def _store(
+        self, product_id: int, version: int, product: ProductRead | None
+    ) -> None:
+        self._entries[product_id] = _Entry(
+            product=product, version=version, expires_at=self._clock() + self._ttl
+        )
+        self._entries.move_to_end(product_id)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    async def _get_shared(
+        self, product_id: int, version: int
+    ) -> tuple[bool, ProductRead | None]:
+        assert self._shared is not None
+        try:
+            value = await self._shared.get(_entry_key(product_id, version))
+        except Exception as exc:  # pragma: no cover - degrade to the database
+            logger.warning("Shared product cache failed: %s", exc)
+            return False, None
+        if value is None:
+            return False, None
+        if value == _MISSING:
+            return True, None
+        return True, ProductRead.model_validate_json(value)
+
+    async def _set_shared(
+        self, product_id: int, version: int, product: ProductRead | None
+    ) -> None:
+        assert self._shared is not None
+        value = _MISSING if product is None else product.model_dump_json()
+        try:
+            await self._shared.set(
+                _entry_key(product_id, version), value, ttl_seconds=self._ttl
+            )
+        except Exception as exc:  # pragma: no cover - the next reader retries
+            logger.warning("Shared product cache failed: %s", exc)
+
+    async def get(self, session: AsyncSession, product_id: int) -> ProductRead | None:
+        """Return the product, or ``None`` if it does not exist.
+
+        Misses are loaded through ``session`` and count towards the request's
+        query budget like any other read.
+        """
+
+        if product_id in session.info.get(_INVALIDATED_KEY, {}).get(self, ()):
+            # The transaction changed the row; its uncommitted state is not cached.
+            version = None
+        else:
+            version = await self._current_version(product_id)
+
+        if version is not None:
+            entry = self._entries.get(product_id)
+            if (
+                entry is not None
+                and entry.version == version
+                and entry.expires_at > self._clock()
+            ):
+                self._entries.move_to_end(product_id)
+                return entry.product
+            if self._shared is not None:
+                found, product = await self._get_shared(product_id, version)
+                if found:
+                    self._store(product_id, version, product)
+                    return product
+
+        result = await session.execute(
+            select(Product).where(Product.id == product_id).limit(1)
+        )
+        row = result.scalar_one_or_none()
+        product = None if row is None else ProductRead.model_validate(row)
+        if version is not None:
+            self._store(product_id, version, product)
+            if self._shared is not None:
+                await self._set_shared(product_id, version, product)
+        return product
+
+    def invalidate(self, session: AsyncSession, product_id: int) -> None:
+        """Drop ``product_id`` from every tier once ``session`` commits."""
+
+        invalidated = session.info.setdefault(_INVALIDATED_KEY, {})
+        invalidated.setdefault(self, set()).add(product_id)
+
+    def _invalidate_now(self, product_id: int) -> None:
+        self._entries.pop(product_id, None)
+        self._versions[product_id] = self._versions.get(product_id, 0) + 1
+        if self._shared is None:
+            return
+        self._publishing[product_id] = self._publishing.get(product_id, 0) + 1
+        task = asyncio.get_running_loop().create_task(self._publish(product_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _publish(self, product_id: int) -> None:
+        assert self._shared is not None
+        try:
+            await self._shared.incr(_version_key(product_id))
+        except Exception as exc:  # pragma: no cover - entries expire with the TTL
+            logger.warning(
+                "Publishing product %s invalidation failed: %s", product_id, exc
+            )
+        finally:
+            remaining = self._publishing.pop(product_id) - 1
+            if remaining:
+                self._publishing[product_id] = remaining
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session) -> None:
+    for cache, product_ids in session.info.pop(_INVALIDATED_KEY, {}).items():
+        for product_id in product_ids:
+            cache._invalidate_now(product_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_invalidations_after_rollback(session: Session) -> None:
+    session.info.pop(_INVALIDATED_KEY, None)
+
+
+# One cache per shared backend, so reloading settings keeps entries and versions.
+_caches: dict[str, ProductCache] = {}
+
+
+def get_product_cache(settings: BackendConfig) -> ProductCache | None:
+    """Return the process-wide product cache, or ``None`` when it is disabled."""
+
+    if settings.product_cache_size <= 0:
+        # A cache switched back on later must not serve entries that missed
+        # invalidations while it was off.
+        _caches.pop(settings.product_cache_backend, None)
+        return None
+    cache = _caches.get(settings.product_cache_backend)
+    if cache is None:
+        backend = None
+        if settings.product_cache_backend:
+            backend = _load_backend(settings.product_cache_backend, settings)
+        cache = _caches[settings.product_cache_backend] = ProductCache(
+            settings, backend=backend
+        )
+    else:
+        cache.configure(settings)
+    return cache
+
+
+async def load_product(
+    session: AsyncSession, settings: BackendConfig, product_id: int
+) -> ProductRead | None:
+    """Read a product through the cache, or straight from ``session`` without one."""
+
+    cache = get_product_cache(settings)
+    if cache is not None:
+        return await cache.get(session, product_id)
+    result = await session.execute(
+        select(Product).where(Product.id == product_id).limit(1)
+    )
+    row = result.scalar_one_or_none()
+    return None if row is None else ProductRead.model_validate(row)
+
+
+def invalidate_product(
+    session: AsyncSession, settings: BackendConfig, product_id: int
+) -> None:
+    """Invalidate cached copies of ``product_id`` when ``session`` commits."""
+
+    cache = get_product_cache(settings)
+    if cache is not None:
+        cache.invalidate(session, product_id)
+
+
+__all__ = [
+    "ProductCache",
+    "ProductCacheBackend",
+    "get_product_cache",
+    "invalidate_product",
+    "load_product",
+]
@@ -0,0 +1,359 @@
+"""Opt-in per-request sampling profiler.
+
+When ``BACKEND_PROFILING_ENABLED`` is set, :class:`ProfilingMiddleware` profiles
+requests that either carry an ``X-Profile`` header from an administrator or are
+picked by ``BACKEND_PROFILING_SAMPLE_RATE``. A background thread samples the
+Python stacks of every thread in the process at a fixed interval while the
+request runs, so work pushed to the thread pool (password hashing, for example)
+shows up next to the event loop. Because the event loop is shared, samples taken
+while the request is awaiting I/O attribute time to whatever else the loop was
+doing; the attached SQL timings show how much of the request was spent waiting
+on the database.
+
+Each profile is written to ``BACKEND_PROFILING_DIRECTORY`` as collapsed stacks
+(``<id>.folded``, for ``flamegraph.pl`` or speedscope), a speedscope document
+(``<id>.speedscope.json``) and a metadata file with the request's statements.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import BackendConfig
+from .dependencies import resolve_bearer_identity
+from .querybudget import QueryLog, capture_queries, untracked_queries
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "x-profile"
+PROFILE_ID_HEADER = "x-profile-id"
+
+_PROFILE_ID = re.compile(r"^[0-9]{8}T[0-9]{6}-[0-9a-f]{8}$")
+_META_SUFFIX = ".meta.json"
+_FOLDED_SUFFIX = ".folded"
+_SPEEDSCOPE_SUFFIX = ".speedscope.json"
+
+Stack = tuple[str, ...]
+
+
+def _frame_label(frame: Any) -> str:
+    code = frame.f_code
+    # Semicolons separate frames in the collapsed format.
+    return "{} ({}:{})".format(
+        code.co_name, code.co_filename, code.co_firstlineno
+    ).replace(";", ":")
+
+
+class StackSampler:
+    """Collect stack samples from every other thread until stopped."""
+
+    def __init__(self, interval_seconds: float) -> None:
+        self.interval_seconds = interval_seconds
+        self.stacks: Counter[Stack] = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="request-profiler", daemon=True
+        )
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval_seconds):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack: list[str] = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append("thread:{}".format(names.get(thread_id, thread_id)))
+                stack.reverse()
+                self.stacks[tuple(stack)] += 1
+            self.samples += 1
+
+
+def collapsed_stacks(stacks: Counter[Stack]) -> str:
+    """Render samples in Brendan Gregg's collapsed-stack format."""
+
+    return "".join(
+        "{} {}\n".format(";".join(stack), count)
+        for stack, count in sorted(stacks.items())
+    )
+
+
+def speedscope_document(
+    stacks: Counter[Stack], *, name: str, interval_ms: float
+) -> dict[str, Any]:
+    """Render samples as a speedscope ``sampled`` profile."""
+
+    frames: list[dict[str, str]] = []
+    frame_index: dict[str, int] = {}
+    samples: list[list[int]] = []
+    weights: list[float] = []
+    for stack, count in stacks.items():
+        indices = []
+        for label in stack:
+            if label not in frame_index:
+                frame_index[label] = len(frames)
+                frames.append({"name": label})
+            indices.append(frame_index[label])
+        samples.append(indices)
+        weights.append(count * interval_ms)
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": [
+            {
+                "type": "sampled",
+                "name": name,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            }
+        ],
+        "name": name,
+        "exporter": "exporthub",
+    }
+
+
+class ProfileStore:
+    """Profiles on local disk, pruned to the most recent ``max_profiles``."""
+
+    def __init__(self, directory: str | Path, *, max_profiles: int) -> None:
+        self.directory = Path(directory)
+        self.max_profiles = max_profiles
+
+    @staticmethod
+    def new_id() -> str:
+        return "{:%Y%m%dT%H%M%S}-{}".format(
+            datetime.now(timezone.utc), uuid.uuid4().hex[:8]
+        )
+
+    def path(self, profile_id: str, suffix: str) -> Path | None:
+        """Return the file for ``profile_id`` or ``None`` for unknown ids."""
+
+        if not _PROFILE_ID.match(profile_id):
+            return None
+        path = self.directory / (profile_id + suffix)
+        return path if path.is_file() else None
+
+    def save(
+        self,
+        profile_id: str,
+        metadata: dict[str, Any],
+        stacks: Counter[Stack],
+        *,
+        interval_ms: float,
+    ) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        name = "{} {}".format(metadata["method"], metadata["path"])
+        (self.directory / (profile_id + _FOLDED_SUFFIX)).write_text(
+            collapsed_stacks(stacks), encoding="utf-8"
+        )
+        (self.directory / (profile_id + _SPEEDSCOPE_SUFFIX)).write_text(
+            json.dumps(speedscope_document(stacks, name=name, interval_ms=interval_ms)),
+            encoding="utf-8",
+        )
+        # Metadata is written last: listings only show complete profiles.
+        (self.directory / (profile_id + _META_SUFFIX)).write_text(
+            json.dumps(metadata), encoding="utf-8"
+        )
+        self._prune()
+
+    def _prune(self) -> None:
+        metas = sorted(self.directory.glob("*" + _META_SUFFIX))
+        for meta in metas[: max(0, len(metas) - self.max_profiles)]:
+            profile_id = meta.name[: -len(_META_SUFFIX)]
+            for suffix in (_META_SUFFIX, _FOLDED_SUFFIX, _SPEEDSCOPE_SUFFIX):
+                (self.directory / (profile_id + suffix)).unlink(missing_ok=True)
+
+    def list(self, limit: int) -> list[dict[str, Any]]:
+        """Return profile metadata, newest first, without the statement lists."""
+
+        if not self.directory.is_dir():
+            return []
+        metas = sorted(self.directory.glob("*" + _META_SUFFIX), reverse=True)
+        summaries = []
+        for meta in metas[:limit]:
+            data = json.loads(meta.read_text(encoding="utf-8"))
+            data.pop("statements", None)
+            summaries.append(data)
+        return summaries
+
+    def load(self, profile_id: str) -> dict[str, Any] | None:
+        path = self.path(profile_id, _META_SUFFIX)
+        if path is None:
+            return None
+        return json.loads(path.read_text(encoding="utf-8"))
+
+    def collapsed_path(self, profile_id: str) -> Path | None:
+        return self.path(profile_id, _FOLDED_SUFFIX)
+
+    def speedscope_path(self, profile_id: str) -> Path | None:
+        return self.path(profile_id, _SPEEDSCOPE_SUFFIX)
+
+
+@lru_cache()
+def get_profile_store(directory: str, max_profiles: int) -> ProfileStore:
+    """Return the process-wide profile store for ``directory``."""
+
+    return ProfileStore(directory, max_profiles=max_profiles)
+
+
+def _profile_metadata(
+    profile_id: str,
+    scope: Scope,
+    *,
+    trigger: str,
+    status_code: int,
+    duration: float,
+    samples: int,
+    log: QueryLog,
+) -> dict[str, Any]:
+    return {
+        "id": profile_id,
+        "method": scope.get("method", ""),
+        "path": scope.get("path", ""),
+        "trigger": trigger,
+        "status_code": status_code,
+        "duration_ms": round(duration * 1000, 3),
+        "samples": samples,
+        "statement_count": log.count,
+        "sql_ms": round(log.total_seconds * 1000, 3),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "statements": [
+            {"sql": statement, "duration_ms": round(seconds * 1000, 3)}
+            for statement, seconds in log.statements
+        ],
+    }
+
+
+class ProfilingMiddleware:
+    """Profile selected requests and store the results in a :class:`ProfileStore`.
+
+    Only one request is profiled at a time per process; other requests picked
+    while a profile is running are served normally.
+    """
+
+    def __init__(self, app: ASGIApp, *, settings: BackendConfig) -> None:
+        self.app = app
+        self.settings = settings
+        self.store = get_profile_store(
+            settings.profiling_directory, settings.profiling_max_profiles
+        )
+        self._busy = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or self._busy:
+            await self.app(scope, receive, send)
+            return
+
+        trigger = await self._trigger(scope)
+        if trigger is None or self._busy:
+            await self.app(scope, receive, send)
+            return
+
+        self._busy = True
+        try:
+            await self._profile(scope, receive, send, trigger)
+        finally:
+            self._busy = False
+
+    async def _trigger(self, scope: Scope) -> str | None:
+        headers = dict(scope.get("headers", []))
+        if headers.get(PROFILE_HEADER.encode("latin-1")):
+            with untracked_queries():
+                identity = await resolve_bearer_identity(
+                    headers.get(b"authorization", b"").decode("latin-1"),
+                    self.settings,
+                )
+            if identity is not None and identity.role == "admin":
+                return "header"
+        rate = self.settings.profiling_sample_rate
+        if rate > 0 and random.random() < rate:
+            return "sampled"
+        return None
+
+    async def _profile(
+        self, scope: Scope, receive: Receive, send: Send, trigger: str
+    ) -> None:
+        profile_id = self.store.new_id()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append(
+                    (PROFILE_ID_HEADER.encode("latin-1"), profile_id.encode("ascii"))
+                )
+                message = {**message, "headers": headers}
+            await send(message)
+
+        interval_ms = max(self.settings.profiling_interval_ms, 1)
+        sampler = StackSampler(interval_ms / 1000.0)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            with capture_queries() as log:
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            sampler.stop()
+            duration = time.perf_counter() - started
+            metadata = _profile_metadata(
+                profile_id,
+                scope,
+                trigger=trigger,
+                status_code=status_code,
+                duration=duration,
+                samples=sampler.samples,
+                log=log,
+            )
+            try:
+                await run_in_threadpool(
+                    self.store.save,
+                    profile_id,
+                    metadata,
+                    sampler.stacks,
+                    interval_ms=interval_ms,
+                )
+            except OSError:  # pragma: no cover - never fail the request
+                logger.exception("Could not write request profile %s", profile_id)
+
+
+__all__ = [
+    "PROFILE_HEADER",
+    "PROFILE_ID_HEADER",
+    "ProfileStore",
+    "ProfilingMiddleware",
+    "StackSampler",
+    "collapsed_stacks",
+    "get_profile_store",
+    "speedscope_document",
+]
@@ -0,0 +1,290 @@
+"""SQL statement counting, query budgets and repeated-statement detection.
+
+Statements are recorded through SQLAlchemy cursor events into every
+:class:`QueryLog` active in the current context, so counts follow a request or
+test across ``await`` boundaries without touching the engines themselves.
+
+Tests can bound a block or coroutine::
+
+    with query_budget(3):
+        await client.get("/orders/")
+
+Routes declare their own budget with :func:`declare_query_budget`; the
+:class:`QueryBudgetMiddleware` reports per-request counts in debug mode and
+turns violations into errors when enforcement is enabled.
+"""
+
+from __future__ import annotations
+
+import functools
+import inspect
+import json
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator, TypeVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+_F = TypeVar("_F", bound=Callable[..., Any])
+
+_BUDGET_ATTRIBUTE = "__query_budget__"
+_START_KEY = "exporthub.query_started_at"
+_REPORT_ONLY_KEY = "exporthub.query_budget_report_only"
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when a block runs more statements than its budget allows."""
+
+
+@dataclass
+class QueryLog:
+    """Statements executed while the log was active, with their durations."""
+
+    statements: list[tuple[str, float]] = field(default_factory=list)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    @property
+    def total_seconds(self) -> float:
+        return sum(duration for _, duration in self.statements)
+
+    def repeated(self, max_repeats: int = 1) -> dict[str, int]:
+        """Return statements that ran more than ``max_repeats`` times.
+
+        Identical SQL text executed over and over with different parameters is
+        the signature of an N+1 query pattern.
+        """
+
+        counts = Counter(statement for statement, _ in self.statements)
+        return {sql: count for sql, count in counts.items() if count > max_repeats}
+
+
+_active_logs: ContextVar[tuple[QueryLog, ...]] = ContextVar(
+    "exporthub_query_logs", default=()
+)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _active_logs.get():
+        conn.info.setdefault(_START_KEY, []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    logs = _active_logs.get()
+    if not logs:
+        return
+    started = conn.info.get(_START_KEY)
+    duration = time.perf_counter() - started.pop() if started else 0.0
+    for log in logs:
+        log.statements.append((statement, duration))
+
+
+@contextmanager
+def capture_queries() -> Iterator[QueryLog]:
+    """Record every statement executed in the current context while active."""
+
+    log = QueryLog()
+    token = _active_logs.set(_active_logs.get() + (log,))
+    try:
+        yield log
+    finally:
+        _active_logs.reset(token)
+
+
+@contextmanager
+def untracked_queries() -> Iterator[None]:
+    """Hide housekeeping statements (such as cache refreshes) from active logs."""
+
+    token = _active_logs.set(())
+    try:
+        yield
+    finally:
+        _active_logs.reset(token)
+
+
+def check_budget(
+    log: QueryLog, max_statements: int, *, max_repeats: int | None = 1, label: str = ""
+) -> None:
+    """Raise :class:`QueryBudgetExceeded` when ``log`` breaks the budget."""
+
+    prefix = "{}: ".format(label) if label else ""
+    if log.count > max_statements:
+        raise QueryBudgetExceeded(
+            "{}executed {} SQL statements, budget is {}:\n{}".format(
+                prefix,
+                log.count,
+                max_statements,
+                "\n".join(statement for statement, _ in log.statements),
+            )
+        )
+    if max_repeats is not None:
+        repeated = log.repeated(max_repeats)
+        if repeated:
+            raise QueryBudgetExceeded(
+                "{}repeated statements suggest an N+1 pattern:\n{}".format(
+                    prefix,
+                    "\n".join(
+                        "{}x {}".format(count, sql) for sql, count in repeated.items()
+                    ),
+                )
+            )
+
+
+class query_budget:
+    """Fail a block, function or coroutine that exceeds a statement budget."""
+
+    def __init__(self, max_statements: int, *, max_repeats: int | None = 1) -> None:
+        self.max_statements = max_statements
+        self.max_repeats = max_repeats
+        self._capture: Any = None
+        self.log: QueryLog | None = None
+
+    def __enter__(self) -> QueryLog:
+        self._capture = capture_queries()
+        self.log = self._capture.__enter__()
+        return self.log
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._capture.__exit__(exc_type, exc, tb)
+        if exc_type is None and self.log is not None:
+            check_budget(self.log, self.max_statements, max_repeats=self.max_repeats)
+
+    def __call__(self, func: _F) -> _F:
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                with query_budget(self.max_statements, max_repeats=self.max_repeats):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper  # type: ignore[return-value]
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with query_budget(self.max_statements, max_repeats=self.max_repeats):
+                return func(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+
+def declare_query_budget(max_statements: int) -> Callable[[_F], _F]:
+    """Attach a per-request statement budget to a route handler.
+
+    The budget covers the whole request, dependencies (authentication, session
+    commit) included. The handler itself is returned unchanged.
+    """
+
+    def decorator(func: _F) -> _F:
+        setattr(func, _BUDGET_ATTRIBUTE, max_statements)
+        return func
+
+    return decorator
+
+
+def check_request_budget(scope: Scope, log: QueryLog) -> str | None:
+    """Check a routed request's statements against its endpoint's budget.
+
+    Returns a description of the violation (after logging it) or ``None``.
+    Requests without a declared budget are only checked for repetition.
+    """
+
+    endpoint = scope.get("endpoint")
+    budget = getattr(endpoint, _BUDGET_ATTRIBUTE, None)
+    label = "{} {}".format(scope.get("method", ""), scope.get("path", ""))
+    try:
+        if budget is not None:
+            check_budget(log, budget, label=label)
+        else:
+            repeated = log.repeated()
+            if repeated:
+                check_budget(log, log.count, label=label)
+    except QueryBudgetExceeded as exc:
+        logger.warning("%s", exc)
+        return str(exc)
+    return None
+
+
+def report_budget_only(scope: Scope) -> None:
+    """Keep a budget violation from replacing this request's response.
+
+    For handlers that have already committed work: failing the response would
+    hide a change that went through. The violation is still logged.
+    """
+
+    scope[_REPORT_ONLY_KEY] = True
+
+
+class QueryBudgetMiddleware:
+    """Count statements per request and check them against declared budgets.
+
+    Counts are exposed through the ``X-Query-Count`` response header. Budget
+    violations and repeated statements are logged; with ``enforce`` enabled
+    they replace the response with a ``500`` so tests fail loudly, unless the
+    handler called :func:`report_budget_only`.
+    """
+
+    def __init__(self, app: ASGIApp, *, enforce: bool = False) -> None:
+        self.app = app
+        self.enforce = enforce
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        suppress_body = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal suppress_body
+            if message["type"] == "http.response.start":
+                violation = check_request_budget(scope, log)
+                if violation and self.enforce and not scope.get(_REPORT_ONLY_KEY):
+                    suppress_body = True
+                    body = json.dumps({"detail": violation}).encode("utf-8")
+                    await send(
+                        {
+                            "type": "http.response.start",
+                            "status": 500,
+                            "headers": [
+                                (b"content-type", b"application/json"),
+                                (b"content-length", str(len(body)).encode("ascii")),
+                            ],
+                        }
+                    )
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                headers = list(message.get("headers", []))
+                headers.append((b"x-query-count", str(log.count).encode("ascii")))
+                message = {**message, "headers": headers}
+            elif suppress_body:
+                return
+            await send(message)
+
+        with capture_queries() as log:
+            await self.app(scope, receive, send_wrapper)
+
+
+__all__ = [
+    "QueryBudgetExceeded",
+    "QueryBudgetMiddleware",
+    "QueryLog",
+    "capture_queries",
+    "check_budget",
+    "check_request_budget",
+    "declare_query_budget",
+    "query_budget",
+    "report_budget_only",
+    "untracked_queries",
+]
@@ -0,0 +1,232 @@
+"""Token bucket rate limiting for the expensive authentication endpoints."""
+
+from __future__ import annotations
+
+import importlib
+import logging
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Protocol
+
+from fastapi import HTTPException, Request, status
+
+from .auth import normalize_email
+from .config import BackendConfig
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitBackend(Protocol):
+    """Storage for token buckets, optionally shared between workers."""
+
+    async def acquire(
+        self, key: str, *, capacity: int, refill_per_second: float
+    ) -> float:
+        """Take one token from ``key`` and return the wait in seconds.
+
+        A return value of ``0`` means the request was admitted.
+        """
+
+
+@dataclass
+class _Bucket:
+    tokens: float
+    updated_at: float
+
+
+class InMemoryRateLimitBackend:
+    """Bounded per-process token bucket store with least-recently-used eviction."""
+
+    def __init__(
+        self, *, max_keys: int, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self._max_keys = max(1, max_keys)
+        self._clock = clock
+        self._buckets: OrderedDict[str, _Bucket] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def resize(self, max_keys: int) -> None:
+        """Change the key bound, evicting the least recently used buckets."""
+
+        self._max_keys = max(1, max_keys)
+        while len(self._buckets) > self._max_keys:
+            self._buckets.popitem(last=False)
+
+    async def acquire(
+        self, key: str, *, capacity: int, refill_per_second: float
+    ) -> float:
+        # The body never awaits, so each update is atomic on the event loop.
+        now = self._clock()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = _Bucket(tokens=float(capacity), updated_at=now)
+            self._buckets[key] = bucket
+            while len(self._buckets) > self._max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            elapsed = max(0.0, now - bucket.updated_at)
+            bucket.tokens = min(
+                float(capacity), bucket.tokens + elapsed * refill_per_second
+            )
+            bucket.updated_at = now
+
+        if bucket.tokens >= 1.0:
+            bucket.tokens -= 1.0
+            return 0.0
+        if refill_per_second <= 0:
+            return float("inf")
+        return (1.0 - bucket.tokens) / refill_per_second
+
+
+def _load_backend(path: str, settings: BackendConfig) -> RateLimitBackend:
+    """Import a ``module:factory`` path and build a backend from it."""
+
+    module_name, _, attribute = path.partition(":")
+    if not module_name or not attribute:
+        raise ValueError(
+            "BACKEND_AUTH_RATE_LIMIT_BACKEND must look like 'package.module:factory', "
+            "got {!r}".format(path)
+        )
+    factory = getattr(importlib.import_module(module_name), attribute)
+    return factory(settings)
+
+
+class AuthRateLimiter:
+    """Apply per-IP and per-email token buckets to authentication attempts."""
+
+    def __init__(
+        self,
+        settings: BackendConfig,
+        *,
+        backend: RateLimitBackend | None = None,
+    ) -> None:
+        self._settings = settings
+        self._local = InMemoryRateLimitBackend(
+            max_keys=settings.auth_rate_limit_max_keys
+        )
+        self._shared = backend
+
+    def configure(self, settings: BackendConfig) -> None:
+        """Apply reloaded limits without forgetting the buckets already filled."""
+
+        if settings is self._settings:
+            return
+        self._settings = settings
+        self._local.resize(settings.auth_rate_limit_max_keys)
+
+    async def _acquire(self, key: str, *, capacity: int, per_minute: int) -> float:
+        refill_per_second = per_minute / 60.0
+        if self._shared is not None:
+            try:
+                return await self._shared.acquire(
+                    key, capacity=capacity, refill_per_second=refill_per_second
+                )
+            except Exception as exc:  # pragma: no cover - degrade to local limits
+                logger.warning("Shared rate limit backend failed: %s", exc)
+        return await self._local.acquire(
+            key, capacity=capacity, refill_per_second=refill_per_second
+        )
+
+    async def check(self, client_ip: str, email: str) -> float:
+        """Return ``0`` when the attempt is admitted, otherwise the retry delay."""
+
+        settings = self._settings
+        retry_after = await self._acquire(
+            "auth:ip:" + client_ip,
+            capacity=settings.auth_rate_limit_ip_burst,
+            per_minute=settings.auth_rate_limit_ip_per_minute,
+        )
+        if retry_after:
+            return retry_after
+        return await self._acquire(
+            "auth:email:" + normalize_email(email),
+            capacity=settings.auth_rate_limit_email_burst,
+            per_minute=settings.auth_rate_limit_email_per_minute,
+        )
+
+
+# One limiter per shared backend, so reloading settings keeps the buckets.
+_limiters: dict[str, AuthRateLimiter] = {}
+
+
+def get_auth_rate_limiter(settings: BackendConfig) -> AuthRateLimiter:
+    """Return the process-wide limiter for the given configuration.
+
+    A shared backend that cannot be loaded is logged once and replaced by the
+    in-process store, rather than failing every authentication request.
+    """
+
+    limiter = _limiters.get(settings.auth_rate_limit_backend)
+    if limiter is None:
+        backend = None
+        if settings.auth_rate_limit_backend:
+            try:
+                backend = _load_backend(settings.auth_rate_limit_backend, settings)
+            except Exception:
+                logger.exception(
+                    "Cannot load rate limit backend %r; using in-process limits",
+                    settings.auth_rate_limit_backend,
+                )
+        limiter = _limiters[settings.auth_rate_limit_backend] = AuthRateLimiter(
+            settings, backend=backend
+        )
+    else:
+        limiter.configure(settings)
+    return limiter
+
+
+def client_ip(request: Request, proxy_hops: int) -> str:
+    """Return the address the rate limiter should key on.
+
+    Behind ``proxy_hops`` reverse proxies that each append the address they
+    received the request from to ``X-Forwarded-For``, the client is the entry that
+    many places from the right. Entries further left are supplied by the client
+    and cannot be trusted. Without proxies, or when the header is shorter than
+    expected, the connecting peer is used.
+    """
+
+    if proxy_hops > 0:
+        forwarded = [
+            entry.strip()
+            for entry in ",".join(request.headers.getlist("x-forwarded-for")).split(",")
+            if entry.strip()
+        ]
+        if len(forwarded) >= proxy_hops:
+            return forwarded[-proxy_hops]
+    return request.client.host if request.client else "unknown"
+
+
+async def enforce_auth_rate_limit(request: Request, email: str) -> None:
+    """Reject the request with ``429`` before any password hashing happens."""
+
+    from . import get_settings
+
+    settings = get_settings()
+    if not settings.auth_rate_limit_enabled:
+        return
+
+    retry_after = await get_auth_rate_limiter(settings).check(
+        client_ip(request, settings.auth_rate_limit_proxy_hops), email
+    )
+    if retry_after:
+        seconds = 3600 if math.isinf(retry_after) else max(1, math.ceil(retry_after))
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many authentication attempts. Please try again later.",
+            headers={"Retry-After": str(seconds)},
+        )
+
+
+__all__ = [
+    "AuthRateLimiter",
+    "InMemoryRateLimitBackend",
+    "RateLimitBackend",
+    "client_ip",
+    "enforce_auth_rate_limit",
+    "get_auth_rate_limiter",
+]
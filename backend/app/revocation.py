@@ -0,0 +1,102 @@
+"""Cached revocation list for stateless signed session tokens."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Callable
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import BackendConfig
+from .database import get_sessionmaker
+from .models import RevokedToken
+from .querybudget import untracked_queries
+
+
+def _aware(value: datetime) -> datetime:
+    """Treat naive timestamps (as returned by SQLite) as UTC."""
+
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+class RevocationList:
+    """In-process copy of ``revoked_tokens`` refreshed at a fixed interval.
+
+    Lookups are pure dictionary checks; the database is only consulted when the
+    cached copy is older than ``refresh_seconds``. Revocations made by other
+    workers therefore take effect within one refresh interval.
+    """
+
+    def __init__(
+        self, *, refresh_seconds: float, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self._refresh_seconds = refresh_seconds
+        self._clock = clock
+        self._revoked: dict[str, datetime] = {}
+        self._refreshed_at: float | None = None
+        self._lock = asyncio.Lock()
+
+    def _is_stale(self) -> bool:
+        if self._refreshed_at is None:
+            return True
+        return self._clock() - self._refreshed_at >= self._refresh_seconds
+
+    async def contains(self, token_id: str, settings: BackendConfig) -> bool:
+        """Return whether ``token_id`` has been revoked."""
+
+        if self._is_stale():
+            await self.refresh(settings)
+        return token_id in self._revoked
+
+    async def refresh(self, settings: BackendConfig) -> None:
+        """Reload revocations and purge rows for tokens that expired anyway."""
+
+        async with self._lock:
+            if not self._is_stale():
+                return
+            now = datetime.now(timezone.utc)
+            session_factory = get_sessionmaker(settings.database_url)
+            # Periodic housekeeping should not count against request budgets.
+            with untracked_queries():
+                async with session_factory() as session:
+                    await session.execute(
+                        delete(RevokedToken).where(RevokedToken.expires_at <= now)
+                    )
+                    result = await session.execute(
+                        select(RevokedToken.token_id, RevokedToken.expires_at)
+                    )
+                    rows = result.all()
+                    await session.commit()
+
+            revoked = {
+                token_id: expires_at
+                for token_id, expires_at in self._revoked.items()
+                if expires_at > now
+            }
+            revoked.update((token_id, _aware(expires)) for token_id, expires in rows)
+            self._revoked = revoked
+            self._refreshed_at = self._clock()
+
+    async def revoke(
+        self, token_id: str, expires_at: datetime, session: AsyncSession
+    ) -> None:
+        """Persist a revocation in the request transaction and apply it locally."""
+
+        await session.merge(RevokedToken(token_id=token_id, expires_at=expires_at))
+        self._revoked[token_id] = expires_at
+
+
+@lru_cache()
+def get_revocation_list(refresh_seconds: int) -> RevocationList:
+    """Return the process-wide revocation list."""
+
+    return RevocationList(refresh_seconds=refresh_seconds)
+
+
+__all__ = ["RevocationList", "get_revocation_list"]
@@ -1,5 +1,5 @@
 """Router package for the ExportHub API."""
 
-from . import auth, orders, products
+from . import auth, jobs, orders, products
 
-__all__ = ["auth", "orders", "products"]
+__all__ = ["auth", "jobs", "orders", "products"]
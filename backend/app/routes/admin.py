@@ -0,0 +1,38 @@
+"""Administrative endpoints for inspecting the running settings and database pools."""
+
+from __future__ import annotations
+
+from typing import Any
+
+from fastapi import APIRouter
+
+from ..database import get_engine_registry
+from ..dependencies import AdminDep
+from ..querybudget import declare_query_budget
+from ..schemas import EnginePoolRead, SettingsRead
+from ..settings import RELOADABLE_FIELDS, current_snapshot, describe_settings
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+@router.get("/settings", response_model=SettingsRead)
+@declare_query_budget(2)
+async def read_settings(_: AdminDep) -> dict[str, Any]:
+    """Return this worker's active settings and which of them reload on SIGHUP."""
+
+    snapshot = current_snapshot()
+    return {
+        "generation": snapshot.generation,
+        "loaded_at": snapshot.loaded_at,
+        "source": snapshot.source,
+        "reloadable": sorted(RELOADABLE_FIELDS),
+        "values": describe_settings(snapshot.settings),
+    }
+
+
+@router.get("/database", response_model=list[EnginePoolRead])
+@declare_query_budget(2)
+async def read_database_pools(_: AdminDep) -> list[dict[str, Any]]:
+    """Return this worker's database engines with their pool occupancy."""
+
+    return get_engine_registry().stats()
@@ -2,70 +2,138 @@
 
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy import delete, select
-
-from ..auth import build_session_token, hash_password, hash_token, normalize_email, verify_password
-from ..dependencies import SessionDep, UserDep
+from sqlalchemy.exc import IntegrityError
+
+from ..auth import (
+    PasswordHashParams,
+    build_session_token,
+    build_signed_token,
+    decode_signed_token,
+    hash_password,
+    hash_token,
+    is_signed_token,
+    needs_rehash,
+    normalize_email,
+    verify_password,
+)
+from ..database import insert_ignoring_conflicts
+from ..dependencies import SessionDep, SettingsDep, UserDep
 from ..models import SessionToken, User
+from ..querybudget import declare_query_budget
+from ..ratelimit import enforce_auth_rate_limit
+from ..revocation import get_revocation_list
 from ..schemas import LoginRequest, LoginResponse, UserCreate, UserRead
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 _bearer_scheme = HTTPBearer(auto_error=False)
 
 
+def _email_taken() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="An account with that email already exists.",
+    )
+
+
 @router.post("/signup", response_model=UserRead, status_code=status.HTTP_201_CREATED)
-async def signup(payload: UserCreate, session: SessionDep) -> User:
+@declare_query_budget(2)
+async def signup(
+    payload: UserCreate,
+    request: Request,
+    session: SessionDep,
+    settings: SettingsDep,
+) -> User:
     """Register a brand new ExportHub account."""
 
+    await enforce_auth_rate_limit(request, payload.email)
     normalized_email = normalize_email(payload.email)
-    result = await session.execute(
-        select(User).where(User.email == normalized_email).limit(1)
+
+    # A cheap indexed probe turns away known addresses before paying for a hash;
+    # the rate limiter is per client, so it cannot bound hashes per email.
+    existing = await session.scalar(
+        select(User.id).where(User.email == normalized_email).limit(1)
     )
-    if result.scalar_one_or_none() is not None:
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail="An account with that email already exists.",
+    if existing is not None:
+        raise _email_taken()
+
+    # Hash before writing so the insert is one short statement and no lock is
+    # held while the hash runs.
+    password_hash = await run_in_threadpool(
+        hash_password,
+        payload.password,
+        params=PasswordHashParams.from_settings(settings),
+    )
+    # ``uq_users_email`` settles signups that raced past the probe.
+    statement = (
+        insert_ignoring_conflicts(session, User, ["email"])
+        .values(
+            email=normalized_email,
+            full_name=payload.full_name.strip(),
+            password_hash=password_hash,
+            role=payload.role,
         )
-
-    user = User(
-        email=normalized_email,
-        full_name=payload.full_name.strip(),
-        password_hash=hash_password(payload.password),
-        role=payload.role,
+        .returning(User)
     )
-    session.add(user)
-    await session.flush()
-    await session.refresh(user)
+    try:
+        user = (await session.scalars(statement)).one_or_none()
+    except IntegrityError:
+        user = None
+    if user is None:
+        raise _email_taken()
     return user
 
 
 @router.post("/login", response_model=LoginResponse)
-async def login(payload: LoginRequest, session: SessionDep) -> LoginResponse:
+@declare_query_budget(3)
+async def login(
+    payload: LoginRequest,
+    request: Request,
+    session: SessionDep,
+    settings: SettingsDep,
+) -> LoginResponse:
     """Authenticate a user with email and password credentials."""
 
+    await enforce_auth_rate_limit(request, payload.email)
     normalized_email = normalize_email(payload.email)
     result = await session.execute(
         select(User).where(User.email == normalized_email).limit(1)
     )
     user = result.scalar_one_or_none()
-    if user is None or not verify_password(payload.password, user.password_hash):
+    if user is None or not await run_in_threadpool(
+        verify_password, payload.password, user.password_hash
+    ):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password.",
         )
 
-    token_value, token_record = build_session_token(user)
-    session.add(token_record)
-    await session.flush()
+    # Upgrade hashes written with older parameters while the plain text password
+    # is at hand, so cost changes roll out as users sign in.
+    hash_params = PasswordHashParams.from_settings(settings)
+    if needs_rehash(user.password_hash, hash_params):
+        user.password_hash = await run_in_threadpool(
+            hash_password, payload.password, params=hash_params
+        )
+
+    if settings.session_token_mode == "signed":
+        token_value, _ = build_signed_token(user, settings.secret_key)
+    else:
+        token_value, token_record = build_session_token(user)
+        session.add(token_record)
+        await session.flush()
 
     return LoginResponse(token=token_value, user=user)
 
 
 @router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+@declare_query_budget(2)
 async def logout(
     session: SessionDep,
+    settings: SettingsDep,
     credentials: HTTPAuthorizationCredentials | None = Depends(_bearer_scheme),
 ) -> Response:
     """Invalidate the active session token."""
@@ -73,6 +141,17 @@ async def logout(
     if credentials is None:
         return Response(status_code=status.HTTP_204_NO_CONTENT)
 
+    if settings.session_token_mode == "signed" and is_signed_token(
+        credentials.credentials
+    ):
+        claims = decode_signed_token(credentials.credentials, settings.secret_key)
+        if claims is not None:
+            revocations = get_revocation_list(
+                settings.session_revocation_refresh_seconds
+            )
+            await revocations.revoke(claims.token_id, claims.expires_at, session)
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+
     token_hash_value = hash_token(credentials.credentials)
     await session.execute(
         delete(SessionToken).where(SessionToken.token_hash == token_hash_value)
@@ -81,6 +160,7 @@ async def logout(
 
 
 @router.get("/me", response_model=UserRead)
+@declare_query_budget(2)
 async def me(current_user: UserDep) -> User:
     """Return the profile of the authenticated user."""
 
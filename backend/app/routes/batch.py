@@ -0,0 +1,233 @@
+"""Execute several API calls in one round trip.
+
+The caller is authenticated once and every item is dispatched straight to the
+application's router, skipping the middleware stack. Consecutive read-only
+items run concurrently, each in its own session, a few at a time so one batch
+cannot drain the connection pool. Writes run one at a time, in order, in the
+batch's session. Each successful write is flushed while its own statements are
+being counted and committed before the next item starts; a failed one is rolled
+back. Items therefore succeed or fail independently and later reads observe
+earlier writes. Once an item has committed, a query budget violation by the
+batch itself is only logged, so the response still reports what went through.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from typing import Any
+
+from fastapi import APIRouter, HTTPException, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.exceptions import HTTPException as StarletteHTTPException
+from starlette.types import Message
+
+from ..config import BackendConfig
+from ..dependencies import (
+    OptionalPrincipalDep,
+    SessionDep,
+    SettingsDep,
+    shared_request_scope,
+)
+from ..models import User
+from ..querybudget import (
+    capture_queries,
+    check_request_budget,
+    declare_query_budget,
+    report_budget_only,
+    untracked_queries,
+)
+from ..schemas import BatchItem, BatchResult
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["batch"])
+
+BATCH_PATH = "/batch"
+
+_READ_METHODS = frozenset({"GET"})
+_SKIPPED_HEADERS = frozenset({b"content-length", b"content-type"})
+# Routing state of the batch request itself, recomputed for each item.
+_ROUTING_KEYS = ("endpoint", "route", "path_params")
+
+
+def _decode_body(content_type: str, body: bytes) -> Any:
+    if not body:
+        return None
+    if content_type.startswith("application/json"):
+        return json.loads(body)
+    return body.decode("utf-8", errors="replace")
+
+
+async def _dispatch(
+    request: Request,
+    item: BatchItem,
+    entries: dict[str, Any],
+    *,
+    check_budgets: bool,
+    enforce_budgets: bool,
+    session: AsyncSession | None = None,
+) -> dict[str, Any]:
+    path, _, query = item.path.partition("?")
+    if path.rstrip("/") == BATCH_PATH:
+        return {"status": 400, "body": {"detail": "Batches cannot be nested."}}
+
+    body = b"" if item.body is None else json.dumps(item.body).encode("utf-8")
+    headers = [
+        (name, value)
+        for name, value in request.scope["headers"]
+        if name not in _SKIPPED_HEADERS
+    ]
+    headers.append((b"content-type", b"application/json"))
+    headers.append((b"content-length", str(len(body)).encode("ascii")))
+    scope = {
+        key: value for key, value in request.scope.items() if key not in _ROUTING_KEYS
+    }
+    scope.update(
+        method=item.method,
+        path=path,
+        raw_path=path.encode("utf-8"),
+        query_string=query.encode("utf-8"),
+        headers=headers,
+        **entries,
+    )
+
+    delivered = False
+
+    async def receive() -> Message:
+        nonlocal delivered
+        if delivered:
+            return {"type": "http.disconnect"}
+        delivered = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    start: Message = {"status": 500}
+    chunks: list[bytes] = []
+
+    async def send(message: Message) -> None:
+        nonlocal start
+        if message["type"] == "http.response.start":
+            start = message
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    try:
+        # Items are checked against their own budgets rather than the batch's.
+        with untracked_queries(), capture_queries() as log:
+            await request.app.router(scope, receive, send)
+            if session is not None and start["status"] < 400:
+                # Write SQL the ORM defers until commit belongs to this item.
+                await session.flush()
+    except StarletteHTTPException as exc:
+        # Raised by the router itself for unknown paths and methods.
+        return {
+            "status": exc.status_code,
+            "headers": {
+                name.lower(): value for name, value in (exc.headers or {}).items()
+            },
+            "body": {"detail": exc.detail},
+        }
+    except Exception:
+        logger.exception("Batch item %s %s failed", item.method, item.path)
+        return {"status": 500, "body": {"detail": "Internal Server Error"}}
+
+    response_headers = {
+        name.decode("latin-1"): value.decode("latin-1")
+        for name, value in start.get("headers", [])
+    }
+    response_headers.pop("content-length", None)
+    content_type = response_headers.pop("content-type", "")
+    if check_budgets:
+        response_headers["x-query-count"] = str(log.count)
+        violation = check_request_budget(scope, log)
+        if violation and enforce_budgets:
+            return {"status": 500, "body": {"detail": violation}}
+    return {
+        "status": start["status"],
+        "headers": response_headers,
+        "body": _decode_body(content_type, b"".join(chunks)),
+    }
+
+
+async def _run_write(
+    request: Request,
+    item: BatchItem,
+    session: AsyncSession,
+    entries: dict[str, Any],
+    **options: bool,
+) -> dict[str, Any]:
+    result = await _dispatch(request, item, entries, session=session, **options)
+    if result["status"] >= 400:
+        await session.rollback()
+        return result
+    try:
+        await session.commit()
+    except Exception:
+        logger.exception("Batch item %s %s failed to commit", item.method, item.path)
+        await session.rollback()
+        return {"status": 500, "body": {"detail": "Internal Server Error"}}
+    report_budget_only(request.scope)
+    return result
+
+
+def _read_concurrency(settings: BackendConfig) -> int:
+    # Each concurrent read holds a connection, on top of the batch's own.
+    pool = settings.database_pool_size + settings.database_max_overflow
+    return max(1, min(settings.batch_read_concurrency, pool - 1))
+
+
+@router.post(BATCH_PATH, response_model=list[BatchResult])
+@declare_query_budget(2)
+async def run_batch(
+    request: Request,
+    items: list[BatchItem],
+    session: SessionDep,
+    settings: SettingsDep,
+    identity: OptionalPrincipalDep,
+) -> list[dict[str, Any]]:
+    """Run sub-requests against the API and return their results in order."""
+
+    if not items or len(items) > settings.batch_max_items:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="A batch must contain between 1 and {} items.".format(
+                settings.batch_max_items
+            ),
+        )
+
+    if isinstance(identity, User):
+        # Keep the user loaded even when a failed write rolls the session back.
+        session.expunge(identity)
+
+    options = {
+        "check_budgets": settings.debug or settings.query_budget_enforce,
+        "enforce_budgets": settings.query_budget_enforce,
+    }
+    read_entries = shared_request_scope(identity)
+    write_entries = shared_request_scope(identity, session)
+    read_slots = asyncio.Semaphore(_read_concurrency(settings))
+
+    async def _run_read(item: BatchItem) -> dict[str, Any]:
+        async with read_slots:
+            return await _dispatch(request, item, read_entries, **options)
+
+    results: list[dict[str, Any]] = []
+    index = 0
+    while index < len(items):
+        if items[index].method not in _READ_METHODS:
+            results.append(
+                await _run_write(
+                    request, items[index], session, write_entries, **options
+                )
+            )
+            index += 1
+            continue
+        end = index
+        while end < len(items) and items[end].method in _READ_METHODS:
+            end += 1
+        results.extend(
+            await asyncio.gather(*(_run_read(item) for item in items[index:end]))
+        )
+        index = end
+    return results
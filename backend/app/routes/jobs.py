@@ -0,0 +1,56 @@
+"""Administrative endpoints for inspecting the background job queue."""
+
+from __future__ import annotations
+
+from typing import Literal
+
+from fastapi import APIRouter, HTTPException, status
+from sqlalchemy import select, update
+
+from ..dependencies import AdminDep, SessionDep
+from ..jobs import JOB_DEAD, JOB_PENDING, wake_workers_on_commit
+from ..models import Job
+from ..querybudget import declare_query_budget
+from ..schemas import JobRead
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+@router.get("/", response_model=list[JobRead])
+@declare_query_budget(3)
+async def list_jobs(
+    session: SessionDep,
+    _: AdminDep,
+    job_status: Literal["pending", "running", "dead"] = JOB_DEAD,
+    limit: int = 100,
+) -> list[Job]:
+    """Return queued jobs in a given state, dead-lettered ones by default."""
+
+    result = await session.execute(
+        select(Job)
+        .where(Job.status == job_status)
+        .order_by(Job.run_after)
+        .limit(min(max(limit, 1), 500))
+    )
+    return list(result.scalars().all())
+
+
+@router.post("/{job_id}/retry", response_model=JobRead)
+@declare_query_budget(3)
+async def retry_job(job_id: int, session: SessionDep, _: AdminDep) -> Job:
+    """Move a dead-lettered job back onto the queue with a fresh attempt budget."""
+
+    result = await session.scalars(
+        update(Job)
+        .where(Job.id == job_id, Job.status == JOB_DEAD)
+        .values(status=JOB_PENDING, attempts=0, run_after=Job.created_at)
+        .returning(Job),
+        execution_options={"populate_existing": True},
+    )
+    job = result.one_or_none()
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Dead-lettered job not found"
+        )
+    wake_workers_on_commit(session)
+    return job
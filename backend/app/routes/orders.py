@@ -2,57 +2,206 @@
 
 from __future__ import annotations
 
-from decimal import Decimal
-from typing import Optional
+from datetime import datetime, timezone
+from typing import Any, Literal
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select
+from fastapi import APIRouter, HTTPException, Query, status
+from sqlalchemy import Row, insert, literal, select, union_all
+from sqlalchemy.exc import IntegrityError
 
-from ..dependencies import SessionDep, UserDep, get_optional_user
-from ..models import Order, Product, User
-from ..schemas import OrderCreate, OrderRead
+from ..archive import ARCHIVED_ORDER_COLUMNS, archive_cutoff
+from ..dependencies import (
+    OptionalPrincipalDep,
+    PrincipalDep,
+    SessionDep,
+    SettingsDep,
+    has_admin_role,
+)
+from ..inventory import decrement_stock, take_pooled_stock
+from ..jobs import enqueue
+from ..models import ArchivedOrder, Order, Product, User
+from ..productcache import get_product_cache
+from ..querybudget import declare_query_budget
+from ..schemas import OrderCreate, OrderListItem, OrderRead
+from ..tasks import ORDER_PLACED
 
 router = APIRouter(prefix="/orders", tags=["orders"])
 
 
-@router.get("/", response_model=list[OrderRead])
+def _as_utc(value: datetime | None) -> datetime | None:
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _order_filters(
+    model: Any,
+    owner_id: int | None,
+    since: datetime | None,
+    until: datetime | None,
+) -> list[Any]:
+    filters = []
+    if owner_id is not None:
+        filters.append(model.user_id == owner_id)
+    if since is not None:
+        filters.append(model.created_at >= since)
+    if until is not None:
+        filters.append(model.created_at < until)
+    return filters
+
+
+def _reaches_archive(
+    since: datetime | None, until: datetime | None, cutoff: datetime
+) -> bool:
+    if since is not None:
+        return since < cutoff
+    return until is not None and until < cutoff
+
+
+def _order_columns(source: Any) -> list[Any]:
+    return [getattr(source, name) for name in ARCHIVED_ORDER_COLUMNS]
+
+
+def _with_product(row: Row[Any]) -> dict[str, Any]:
+    order = {name: getattr(row, name) for name in ARCHIVED_ORDER_COLUMNS}
+    if row.product_name is not None:
+        order["product"] = {
+            "id": row.product_id,
+            "name": row.product_name,
+            "price": row.product_price,
+        }
+    return order
+
+
+@router.get("/", response_model=list[OrderListItem], response_model_exclude_none=True)
+@declare_query_budget(3)
 async def list_orders(
     session: SessionDep,
-    current_user: Optional[User] = Depends(get_optional_user),
-) -> list[Order]:
-    """Return all orders ordered by newest first."""
+    settings: SettingsDep,
+    current_user: OptionalPrincipalDep,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    expand: Literal["product"] | None = None,
+    limit: int | None = Query(None, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+) -> list[Any]:
+    """Return orders ordered by newest first.
 
-    query = select(Order).order_by(Order.created_at.desc())
-    if current_user and current_user.role != "admin":
-        query = query.where(Order.user_id == current_user.id)
+    Only the hot ``orders`` table is read unless the requested window starts
+    before the archive cutoff (``since`` before it, or only ``until`` given and
+    before it), in which case archived history is included transparently.
+    Rows are selected as plain columns rather than ORM entities; with
+    ``expand=product`` the product name and price are joined into the same
+    query.
+    """
 
-    result = await session.execute(query)
-    return list(result.scalars().all())
+    since, until = _as_utc(since), _as_utc(until)
+    owner_id = None
+    if current_user is not None and not await has_admin_role(current_user, session):
+        owner_id = current_user.id
+    query = select(*_order_columns(Order)).where(
+        *_order_filters(Order, owner_id, since, until)
+    )
+    if _reaches_archive(since, until, archive_cutoff(settings)):
+        archived = select(*_order_columns(ArchivedOrder)).where(
+            *_order_filters(ArchivedOrder, owner_id, since, until)
+        )
+        page = union_all(query, archived).subquery("orders_page")
+    else:
+        page = query.subquery("orders_page")
+
+    statement = select(*_order_columns(page.c))
+    if expand == "product":
+        statement = statement.add_columns(
+            Product.name.label("product_name"), Product.price.label("product_price")
+        ).outerjoin(Product, Product.id == page.c.product_id)
+    statement = statement.order_by(page.c.created_at.desc(), page.c.id.desc())
+    if limit is not None:
+        statement = statement.limit(limit)
+    if offset:
+        statement = statement.offset(offset)
+
+    result = await session.execute(statement)
+    rows = result.all()
+    if expand == "product":
+        return [_with_product(row) for row in rows]
+    return list(rows)
 
 
 @router.post("/", response_model=OrderRead, status_code=status.HTTP_201_CREATED)
+# Worst case: token and user, a product cache miss, a stock pool refill that
+# comes up short, the insert, the job and the direct stock update.
+@declare_query_budget(7)
 async def create_order(
-    payload: OrderCreate, session: SessionDep, current_user: UserDep
+    payload: OrderCreate,
+    session: SessionDep,
+    settings: SettingsDep,
+    current_user: PrincipalDep,
 ) -> Order:
-    """Place a new order for a product."""
+    """Place a new order for a product, taking its quantity from stock."""
 
-    product_result = await session.execute(
-        select(Product).where(Product.id == payload.product_id).limit(1)
-    )
-    product = product_result.scalar_one_or_none()
-    if product is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
-
-    total_price = (product.price or Decimal("0")) * payload.quantity
-
-    db_order = Order(
-        product_id=product.id,
-        user_id=current_user.id,
-        buyer_name=current_user.full_name,
-        quantity=payload.quantity,
-        total_price=total_price,
+    cache = get_product_cache(settings)
+    product = None
+    if cache is not None:
+        product = await cache.get(session, payload.product_id)
+        if product is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Product not found"
+            )
+
+    pooled = await take_pooled_stock(session, payload.product_id, payload.quantity)
+
+    # The buyer is read by the insert itself: a signed token carries no name,
+    # and an account deleted since the token was issued yields no row.
+    if product is not None:
+        # Priced from the cache; the foreign key catches a product deleted since.
+        source = select(
+            literal(product.id),
+            User.id,
+            User.full_name,
+            literal(payload.quantity),
+            literal(product.price * payload.quantity, Order.total_price.type),
+        )
+    else:
+        # The price is read by the insert itself, so the product row is never
+        # locked while the order is being written.
+        source = select(
+            Product.id,
+            User.id,
+            User.full_name,
+            literal(payload.quantity),
+            Product.price * payload.quantity,
+        ).where(Product.id == payload.product_id)
+    statement = insert(Order).from_select(
+        ["product_id", "user_id", "buyer_name", "quantity", "total_price"],
+        source.where(User.id == current_user.id),
     )
-    session.add(db_order)
-    await session.flush()
-    await session.refresh(db_order)
+    try:
+        db_order = (await session.scalars(statement.returning(Order))).one_or_none()
+    except IntegrityError:
+        if product is None:
+            raise
+        db_order = None
+    if db_order is None:
+        if await session.get(User, current_user.id) is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="User linked to the token no longer exists.",
+            )
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Product not found"
+        )
+
+    # Follow-up work runs on the job workers once this transaction commits.
+    enqueue(session, ORDER_PLACED, {"order_id": db_order.id})
+
+    # Stock is taken last so the row lock is held only until the commit.
+    if not pooled and not await decrement_stock(
+        session, payload.product_id, payload.quantity
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail="Not enough stock"
+        )
     return db_order
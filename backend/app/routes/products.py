@@ -3,16 +3,20 @@
 from __future__ import annotations
 
 from fastapi import APIRouter, HTTPException, Response, status
-from sqlalchemy import select
+from sqlalchemy import func, select, update
 
-from ..dependencies import AdminDep, SessionDep
+from ..dependencies import AdminDep, SessionDep, SettingsDep
+from ..inventory import retire_stock_pool
 from ..models import Product
-from ..schemas import ProductCreate, ProductRead, ProductUpdate
+from ..productcache import invalidate_product, load_product
+from ..querybudget import declare_query_budget
+from ..schemas import ProductCreate, ProductRead, ProductUpdate, StockAdjustment
 
 router = APIRouter(prefix="/products", tags=["products"])
 
 
 @router.get("/", response_model=list[ProductRead])
+@declare_query_budget(1)
 async def list_products(session: SessionDep) -> list[Product]:
     """Return all products ordered by newest first."""
 
@@ -21,8 +25,9 @@ async def list_products(session: SessionDep) -> list[Product]:
 
 
 @router.post("/", response_model=ProductRead, status_code=status.HTTP_201_CREATED)
+@declare_query_budget(3)
 async def create_product(
-    payload: ProductCreate, session: SessionDep, _: AdminDep
+    payload: ProductCreate, session: SessionDep, settings: SettingsDep, _: AdminDep
 ) -> Product:
     """Create a new product listing."""
 
@@ -31,46 +36,109 @@ async def create_product(
         description=payload.description,
         price=payload.price,
         seller_name=payload.seller_name,
+        stock=payload.stock,
     )
     session.add(db_product)
     await session.flush()
-    await session.refresh(db_product)
+    # The id may have been looked up, and cached as missing, before it existed.
+    invalidate_product(session, settings, db_product.id)
     return db_product
 
 
 @router.get("/{product_id}", response_model=ProductRead)
-async def get_product(product_id: int, session: SessionDep) -> Product:
+@declare_query_budget(1)
+async def get_product(
+    product_id: int, session: SessionDep, settings: SettingsDep
+) -> ProductRead:
     """Retrieve a single product by its identifier."""
 
-    result = await session.execute(
-        select(Product).where(Product.id == product_id).limit(1)
-    )
-    product = result.scalar_one_or_none()
+    product = await load_product(session, settings, product_id)
     if product is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Product not found"
+        )
     return product
 
 
 @router.put("/{product_id}", response_model=ProductRead)
+@declare_query_budget(3)
 async def update_product(
-    product_id: int, payload: ProductUpdate, session: SessionDep, _: AdminDep
-) -> Product:
+    product_id: int,
+    payload: ProductUpdate,
+    session: SessionDep,
+    settings: SettingsDep,
+    _: AdminDep,
+) -> Product | ProductRead:
     """Update an existing product listing."""
 
-    product = await get_product(product_id, session)
+    changes = payload.model_dump(exclude_unset=True)
+    if not changes:
+        return await get_product(product_id, session, settings)
+    if "stock" in changes:
+        # A new count replaces whatever was reserved from the old one.
+        changes["stock_epoch"] = func.coalesce(Product.stock_epoch, 0) + 1
+        retire_stock_pool(session, product_id)
+
+    result = await session.scalars(
+        update(Product)
+        .where(Product.id == product_id)
+        .values(**changes)
+        .returning(Product),
+        execution_options={"populate_existing": True},
+    )
+    product = result.one_or_none()
+    if product is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Product not found"
+        )
+    invalidate_product(session, settings, product_id)
+    return product
 
-    for field, value in payload.model_dump(exclude_unset=True).items():
-        setattr(product, field, value)
 
-    await session.flush()
-    await session.refresh(product)
+@router.post("/{product_id}/stock", response_model=ProductRead)
+@declare_query_budget(3)
+async def restock_product(
+    product_id: int,
+    payload: StockAdjustment,
+    session: SessionDep,
+    settings: SettingsDep,
+    _: AdminDep,
+) -> Product:
+    """Add units to a product's stock, starting to track it if it was not."""
+
+    # Relative to the stored value, so concurrent orders are never overwritten.
+    result = await session.scalars(
+        update(Product)
+        .where(Product.id == product_id)
+        .values(stock=func.coalesce(Product.stock, 0) + payload.quantity)
+        .returning(Product),
+        execution_options={"populate_existing": True},
+    )
+    product = result.one_or_none()
+    if product is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Product not found"
+        )
+    retire_stock_pool(session, product_id)
+    invalidate_product(session, settings, product_id)
     return product
 
 
 @router.delete("/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_product(product_id: int, session: SessionDep, _: AdminDep) -> Response:
+@declare_query_budget(4)
+async def delete_product(
+    product_id: int, session: SessionDep, settings: SettingsDep, _: AdminDep
+) -> Response:
     """Remove a product from the catalogue."""
 
-    product = await get_product(product_id, session)
+    result = await session.execute(
+        select(Product).where(Product.id == product_id).limit(1)
+    )
+    product = result.scalar_one_or_none()
+    if product is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Product not found"
+        )
     await session.delete(product)
+    invalidate_product(session, settings, product_id)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,77 @@
+"""Administrative endpoints for browsing captured request profiles."""
+
+from __future__ import annotations
+
+from typing import Any
+
+from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import FileResponse
+from starlette.concurrency import run_in_threadpool
+
+from ..dependencies import AdminDep, SettingsDep
+from ..profiling import ProfileStore, get_profile_store
+from ..querybudget import declare_query_budget
+from ..schemas import ProfileRead, ProfileSummary
+
+router = APIRouter(prefix="/profiles", tags=["profiles"])
+
+
+def _store(settings: SettingsDep) -> ProfileStore:
+    return get_profile_store(
+        settings.profiling_directory, settings.profiling_max_profiles
+    )
+
+
+def _not_found() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found"
+    )
+
+
+@router.get("/", response_model=list[ProfileSummary])
+@declare_query_budget(2)
+async def list_profiles(
+    settings: SettingsDep, _: AdminDep, limit: int = 50
+) -> list[dict[str, Any]]:
+    """Return the most recent captured profiles, newest first."""
+
+    return await run_in_threadpool(_store(settings).list, min(max(limit, 1), 500))
+
+
+@router.get("/{profile_id}", response_model=ProfileRead)
+@declare_query_budget(2)
+async def read_profile(
+    profile_id: str, settings: SettingsDep, _: AdminDep
+) -> dict[str, Any]:
+    """Return a profile's metadata with the SQL statements it executed."""
+
+    profile = await run_in_threadpool(_store(settings).load, profile_id)
+    if profile is None:
+        raise _not_found()
+    return profile
+
+
+@router.get("/{profile_id}/collapsed", response_class=FileResponse)
+@declare_query_budget(2)
+async def download_collapsed(
+    profile_id: str, settings: SettingsDep, _: AdminDep
+) -> FileResponse:
+    """Download the profile as collapsed stacks for flame graph tooling."""
+
+    path = _store(settings).collapsed_path(profile_id)
+    if path is None:
+        raise _not_found()
+    return FileResponse(path, media_type="text/plain", filename=path.name)
+
+
+@router.get("/{profile_id}/speedscope", response_class=FileResponse)
+@declare_query_budget(2)
+async def download_speedscope(
+    profile_id: str, settings: SettingsDep, _: AdminDep
+) -> FileResponse:
+    """Download the profile as a speedscope document."""
+
+    path = _store(settings).speedscope_path(profile_id)
+    if path is None:
+        raise _not_found()
+    return FileResponse(path, media_type="application/json", filename=path.name)
@@ -1,11 +1,10 @@
-
 """Pydantic schemas for the ExportHub commerce APIs."""
 
 from __future__ import annotations
 
 from datetime import datetime
 from decimal import Decimal
-from typing import Literal
+from typing import Any, Literal
 
 from pydantic import BaseModel, ConfigDict, EmailStr, Field
 
@@ -15,6 +14,7 @@ class ProductBase(BaseModel):
     description: str = Field(..., max_length=10_000)
     price: Decimal = Field(..., ge=0)
     seller_name: str = Field(..., max_length=80)
+    stock: int | None = Field(None, ge=0)
 
 
 class ProductCreate(ProductBase):
@@ -37,6 +37,13 @@ class ProductUpdate(BaseModel):
     description: str | None = Field(None, max_length=10_000)
     price: Decimal | None = Field(None, ge=0)
     seller_name: str | None = Field(None, max_length=80)
+    stock: int | None = Field(None, ge=0)
+
+
+class StockAdjustment(BaseModel):
+    """Units to add to a product's stock."""
+
+    quantity: int = Field(..., gt=0)
 
 
 class OrderBase(BaseModel):
@@ -49,6 +56,16 @@ class OrderCreate(OrderBase):
     product_id: int
 
 
+class OrderProductSummary(BaseModel):
+    """Product fields embedded in an order when ``expand=product`` is requested."""
+
+    id: int
+    name: str
+    price: Decimal
+
+    model_config = ConfigDict(json_encoders={Decimal: str})
+
+
 class OrderRead(OrderBase):
     """API representation of an order."""
 
@@ -62,6 +79,12 @@ class OrderRead(OrderBase):
     model_config = ConfigDict(from_attributes=True, json_encoders={Decimal: str})
 
 
+class OrderListItem(OrderRead):
+    """Order as returned by the listing endpoint, optionally with its product."""
+
+    product: OrderProductSummary | None = None
+
+
 class UserBase(BaseModel):
     email: EmailStr
     full_name: str = Field(..., max_length=120)
@@ -98,14 +121,111 @@ class LoginResponse(BaseModel):
     user: UserRead
 
 
+class JobRead(BaseModel):
+    """Administrative view of a background job."""
+
+    id: int
+    kind: str
+    payload: dict[str, Any]
+    status: Literal["pending", "running", "dead"]
+    attempts: int
+    run_after: datetime
+    last_error: str | None
+    created_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class BatchItem(BaseModel):
+    """A sub-request executed by ``POST /batch``."""
+
+    method: Literal["GET", "POST", "PUT", "PATCH", "DELETE"] = "GET"
+    path: str = Field(..., pattern=r"^/", max_length=2000)
+    body: Any = None
+
+
+class BatchResult(BaseModel):
+    """Outcome of one batch item, in the order the items were submitted."""
+
+    status: int
+    headers: dict[str, str] = Field(default_factory=dict)
+    body: Any = None
+
+
+class ProfileStatement(BaseModel):
+    """A SQL statement executed during a profiled request."""
+
+    sql: str
+    duration_ms: float
+
+
+class ProfileSummary(BaseModel):
+    """Listing entry for a captured request profile."""
+
+    id: str
+    method: str
+    path: str
+    trigger: Literal["header", "sampled"]
+    status_code: int
+    duration_ms: float
+    samples: int
+    statement_count: int
+    sql_ms: float
+    created_at: datetime
+
+
+class ProfileRead(ProfileSummary):
+    """A captured request profile with its SQL statements and timings."""
+
+    statements: list[ProfileStatement]
+
+
+class EnginePoolRead(BaseModel):
+    """A database engine and the state of its connection pool.
+
+    Pool counters are ``None`` for pools that do not track them.
+    """
+
+    url: str
+    dialect: str
+    pool: str
+    created_at: datetime
+    pid: int
+    size: int | None
+    checkedin: int | None
+    checkedout: int | None
+    overflow: int | None
+
+
+class SettingsRead(BaseModel):
+    """The settings a worker is running with, secrets redacted."""
+
+    generation: int
+    loaded_at: datetime
+    source: str | None
+    reloadable: list[str]
+    values: dict[str, Any]
+
+
 __all__ = [
+    "BatchItem",
+    "BatchResult",
+    "EnginePoolRead",
+    "JobRead",
     "LoginRequest",
     "LoginResponse",
     "OrderCreate",
+    "OrderListItem",
+    "OrderProductSummary",
     "OrderRead",
+    "ProfileRead",
+    "ProfileStatement",
+    "ProfileSummary",
     "ProductCreate",
     "ProductRead",
     "ProductUpdate",
+    "SettingsRead",
+    "StockAdjustment",
     "UserCreate",
     "UserRead",
 ]
@@ -0,0 +1,313 @@
+"""Process-wide settings snapshot with hot reload of tunable values.
+
+Configuration is resolved once, on first use, into an immutable
+:class:`~app.config.BackendConfig` snapshot that every request shares. Sending the
+process ``SIGHUP`` re-reads the environment, overlaid with the ``KEY=VALUE`` file
+named by ``BACKEND_CONFIG_FILE`` when it is set, and swaps in a new snapshot.
+
+Only the fields in :data:`RELOADABLE_FIELDS` may change that way. They are read
+per request (or per limiter) from the current snapshot, so a new value takes
+effect on the next request. A reload touching anything else, such as
+``DATABASE_URL`` or the secret key, is rejected as a whole and the running
+snapshot stays in place; those changes still need a restart.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import signal
+import threading
+from dataclasses import dataclass, fields
+from datetime import datetime, timezone
+from typing import Any, Mapping
+from urllib.parse import urlsplit, urlunsplit
+
+from .config import (
+    DEVELOPMENT_SECRET_KEY,
+    BackendConfig,
+    MissingEnvironmentVariableError,
+    load_config,
+)
+
+logger = logging.getLogger(__name__)
+
+CONFIG_FILE_VARIABLE = "BACKEND_CONFIG_FILE"
+
+RELOADABLE_FIELDS = frozenset(
+    {
+        "auth_rate_limit_enabled",
+        "auth_rate_limit_ip_burst",
+        "auth_rate_limit_ip_per_minute",
+        "auth_rate_limit_email_burst",
+        "auth_rate_limit_email_per_minute",
+        "auth_rate_limit_max_keys",
+        "auth_rate_limit_proxy_hops",
+        "password_hash_iterations",
+        "password_hash_scrypt_n",
+        "batch_max_items",
+        "batch_read_concurrency",
+        "product_cache_size",
+        "product_cache_ttl_seconds",
+        "admission_auth_concurrency",
+        "admission_read_concurrency",
+        "admission_write_concurrency",
+        "admission_max_queue_ms",
+        "request_timeout_seconds",
+    }
+)
+
+_REDACTED = "********"
+_SECRET_FIELDS = frozenset({"secret_key"})
+
+
+class UnsafeSettingsChange(ValueError):
+    """Raised when a reload changes values that need a restart to apply."""
+
+    def __init__(self, changed: tuple[str, ...]) -> None:
+        super().__init__(
+            "Settings {} cannot change without a restart".format(", ".join(changed))
+        )
+        self.changed = changed
+
+
+def read_env_file(path: str) -> dict[str, str]:
+    """Parse a ``KEY=VALUE`` file as written by ``fetch_secrets.sh``."""
+
+    values: dict[str, str] = {}
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            line = line.removeprefix("export ")
+            key, separator, value = line.partition("=")
+            if not separator:
+                continue
+            value = value.strip()
+            if len(value) >= 2 and value[0] == value[-1] and value[0] in "'\"":
+                value = value[1:-1]
+            values[key.strip()] = value
+    return values
+
+
+def _config_source() -> tuple[Mapping[str, str], str | None]:
+    path = os.environ.get(CONFIG_FILE_VARIABLE) or None
+    if path is None:
+        return os.environ, None
+    # The file wins so that editing it is enough to change a value.
+    return {**os.environ, **read_env_file(path)}, path
+
+
+def _load(source: Mapping[str, str]) -> BackendConfig:
+    """Load configuration, falling back to sensible defaults when needed."""
+
+    try:
+        return load_config(source)
+    except MissingEnvironmentVariableError as exc:  # pragma: no cover - defensive
+        logger.warning(
+            "Missing required configuration values: %s. Falling back to defaults.",
+            exc,
+        )
+        # Railway provides the HTTP port via the PORT variable. Use that value when
+        # available so the service binds correctly in hosted environments.
+        port = int(source.get("PORT", source.get("BACKEND_PORT", "8000")))
+        return load_config(
+            {
+                **source,
+                "BACKEND_PORT": str(port),
+                "BACKEND_DEBUG": source.get("BACKEND_DEBUG", "false"),
+                "DATABASE_URL": source.get("DATABASE_URL", "sqlite:///./exporthub.db"),
+                "BACKEND_SECRET_KEY": source.get(
+                    "BACKEND_SECRET_KEY", DEVELOPMENT_SECRET_KEY
+                ),
+                "BACKEND_STORAGE_BUCKET": source.get(
+                    "BACKEND_STORAGE_BUCKET", "exporthub-local"
+                ),
+            },
+            allow_defaults=True,
+        )
+
+
+def changed_fields(old: BackendConfig, new: BackendConfig) -> tuple[str, ...]:
+    """Return the names of the fields whose values differ, in declaration order."""
+
+    return tuple(
+        field.name
+        for field in fields(BackendConfig)
+        if getattr(old, field.name) != getattr(new, field.name)
+    )
+
+
+@dataclass(frozen=True)
+class SettingsSnapshot:
+    """The active configuration and where it came from."""
+
+    settings: BackendConfig
+    generation: int
+    loaded_at: datetime
+    source: str | None
+
+
+class SettingsStore:
+    """Hold the active snapshot and replace it on reload."""
+
+    def __init__(self) -> None:
+        self._snapshot: SettingsSnapshot | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def snapshot(self) -> SettingsSnapshot:
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    source, path = _config_source()
+                    self._snapshot = SettingsSnapshot(
+                        settings=_load(source),
+                        generation=1,
+                        loaded_at=datetime.now(timezone.utc),
+                        source=path,
+                    )
+                snapshot = self._snapshot
+        return snapshot
+
+    @property
+    def settings(self) -> BackendConfig:
+        return self.snapshot.settings
+
+    def reload(self) -> tuple[str, ...]:
+        """Re-read the configuration and return the names of the changed fields.
+
+        Raises :class:`UnsafeSettingsChange` without applying anything when a
+        field outside :data:`RELOADABLE_FIELDS` changed, and ``ValueError`` when a
+        value does not parse.
+        """
+
+        current = self.snapshot
+        source, path = _config_source()
+        settings = _load(source)
+        changed = changed_fields(current.settings, settings)
+        unsafe = tuple(name for name in changed if name not in RELOADABLE_FIELDS)
+        if unsafe:
+            raise UnsafeSettingsChange(unsafe)
+        if changed:
+            with self._lock:
+                self._snapshot = SettingsSnapshot(
+                    settings=settings,
+                    generation=current.generation + 1,
+                    loaded_at=datetime.now(timezone.utc),
+                    source=path,
+                )
+        return changed
+
+
+_store = SettingsStore()
+
+
+def current_settings() -> BackendConfig:
+    """Return the active settings snapshot, loading it on first use."""
+
+    return _store.settings
+
+
+def current_snapshot() -> SettingsSnapshot:
+    """Return the active snapshot with its generation and source."""
+
+    return _store.snapshot
+
+
+def reload_settings() -> tuple[str, ...]:
+    """Apply tunable changes from the environment; see :meth:`SettingsStore.reload`."""
+
+    return _store.reload()
+
+
+def _reload_from_signal() -> None:
+    try:
+        changed = reload_settings()
+    except ValueError as exc:
+        logger.error("Settings reload rejected: %s", exc)
+        return
+    except OSError as exc:
+        logger.error("Settings reload failed: %s", exc)
+        return
+    if changed:
+        logger.info(
+            "Settings reloaded (generation %s): %s",
+            current_snapshot().generation,
+            ", ".join(changed),
+        )
+    else:
+        logger.info("Settings reload found no changes")
+
+
+def install_reload_handler() -> bool:
+    """Reload settings on ``SIGHUP``; return whether the handler was installed.
+
+    Must run on the event loop. Platforms without ``SIGHUP`` and loops outside the
+    main thread are skipped.
+    """
+
+    sighup = getattr(signal, "SIGHUP", None)
+    if sighup is None:
+        return False
+    try:
+        asyncio.get_running_loop().add_signal_handler(sighup, _reload_from_signal)
+    except (NotImplementedError, RuntimeError, ValueError):
+        return False
+    return True
+
+
+def remove_reload_handler() -> None:
+    """Undo :func:`install_reload_handler`."""
+
+    sighup = getattr(signal, "SIGHUP", None)
+    if sighup is None:
+        return
+    try:
+        asyncio.get_running_loop().remove_signal_handler(sighup)
+    except (NotImplementedError, RuntimeError, ValueError):
+        pass
+
+
+def _redact_url(url: str) -> str:
+    parts = urlsplit(url)
+    if parts.password is None:
+        return url
+    netloc = "{}:{}@{}".format(
+        parts.username or "", _REDACTED, parts.netloc.rpartition("@")[2]
+    )
+    return urlunsplit(parts._replace(netloc=netloc))
+
+
+def describe_settings(settings: BackendConfig) -> dict[str, Any]:
+    """Return the settings as a dictionary with secrets redacted."""
+
+    values: dict[str, Any] = {}
+    for field in fields(BackendConfig):
+        value = getattr(settings, field.name)
+        if field.name in _SECRET_FIELDS:
+            value = _REDACTED
+        elif field.name == "database_url":
+            value = _redact_url(value)
+        values[field.name] = value
+    return values
+
+
+__all__ = [
+    "CONFIG_FILE_VARIABLE",
+    "RELOADABLE_FIELDS",
+    "SettingsSnapshot",
+    "SettingsStore",
+    "UnsafeSettingsChange",
+    "changed_fields",
+    "current_settings",
+    "current_snapshot",
+    "describe_settings",
+    "install_reload_handler",
+    "read_env_file",
+    "reload_settings",
+    "remove_reload_handler",
+]
@@ -0,0 +1,33 @@
+"""Background job handlers for follow-up work triggered by API requests."""
+
+from __future__ import annotations
+
+import logging
+from typing import Any
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .jobs import job_handler
+from .models import Order
+
+logger = logging.getLogger(__name__)
+
+ORDER_PLACED = "order.placed"
+
+
+@job_handler(ORDER_PLACED)
+async def process_placed_order(payload: dict[str, Any], session: AsyncSession) -> None:
+    """Run the post-order pipeline outside the request that placed the order.
+
+    Confirmation emails, invoices and export documents belong here so order
+    placement latency does not grow with each new step.
+    """
+
+    order = await session.get(Order, payload["order_id"])
+    if order is None:
+        # The order (or its product) was deleted before the job ran.
+        return
+    logger.info("Processed follow-up work for order %s", order.id)
+
+
+__all__ = ["ORDER_PLACED", "process_placed_order"]
@@ -0,0 +1,6 @@
+"""Load and concurrency benchmarks for the ExportHub backend.
+
+Run the modules from the ``backend`` directory, e.g.
+``python -m benchmarks.signup_concurrency``. They need the packages listed in
+``requirements-dev.txt``.
+"""
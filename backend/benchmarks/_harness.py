@@ -0,0 +1,79 @@
+"""Shared helpers for driving the ASGI app in-process during benchmarks."""
+
+from __future__ import annotations
+
+import os
+import tempfile
+from collections import Counter
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Callable, Iterator, Mapping
+
+import httpx
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+def configure_environment(overrides: Mapping[str, str] | None = None) -> None:
+    """Point the app at a throwaway database unless one is configured."""
+
+    if "DATABASE_URL" not in os.environ:
+        directory = tempfile.mkdtemp(prefix="exporthub-bench-")
+        os.environ["DATABASE_URL"] = "sqlite:///{}/bench.db".format(directory)
+    os.environ.setdefault("BACKEND_SECRET_KEY", "benchmark-secret")
+    os.environ.setdefault("BACKEND_STORAGE_BUCKET", "benchmark")
+    # Benchmarks fire many auth calls from one address on purpose.
+    os.environ.setdefault("BACKEND_AUTH_RATE_LIMIT_ENABLED", "false")
+    # They measure races under bursts that admission control would shed.
+    os.environ.setdefault("BACKEND_ADMISSION_CONTROL_ENABLED", "false")
+    for key, value in (overrides or {}).items():
+        os.environ[key] = value
+
+
+@asynccontextmanager
+async def app_client() -> AsyncIterator[httpx.AsyncClient]:
+    """Yield an HTTP client bound to a freshly initialised application."""
+
+    from app import create_app, get_settings
+    from app.database import init_models
+
+    app = create_app()
+    await init_models(get_settings())
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://benchmark"
+    ) as client:
+        yield client
+
+
+@contextmanager
+def count_statements() -> Iterator[Counter]:
+    """Count SQL statements by leading keyword while the block runs."""
+
+    counts: Counter = Counter()
+
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        counts[statement.lstrip().split(None, 1)[0].upper()] += 1
+
+    event.listen(Engine, "before_cursor_execute", _before_execute)
+    try:
+        yield counts
+    finally:
+        event.remove(Engine, "before_cursor_execute", _before_execute)
+
+
+@contextmanager
+def count_calls(owner: Any, name: str) -> Iterator[Counter]:
+    """Count calls to ``owner.name`` while the block runs, under the key ``name``."""
+
+    counts: Counter = Counter()
+    original: Callable[..., Any] = getattr(owner, name)
+
+    def _counting(*args: Any, **kwargs: Any) -> Any:
+        counts[name] += 1
+        return original(*args, **kwargs)
+
+    setattr(owner, name, _counting)
+    try:
+        yield counts
+    finally:
+        setattr(owner, name, original)
@@ -0,0 +1,128 @@
+"""Fire concurrent orders for a single product with limited stock.
+
+Exactly ``min(orders, stock)`` orders should succeed with ``201``; the rest
+should get ``409`` and the remaining stock must match. Any ``5xx`` or a mismatch
+means stock was oversold or lost. Compare the direct conditional update with
+local reservation pools via ``--reservation-chunk``.
+
+SQLite serialises every writer on one database lock and starves waiters past
+its busy timeout, so the default concurrency is modest. Point ``DATABASE_URL`` at
+PostgreSQL and raise ``--concurrency`` to see row-lock behaviour with hundreds
+of orders in flight.
+
+    python -m benchmarks.order_concurrency --orders 500 --stock 300
+    python -m benchmarks.order_concurrency --stock 300 --reservation-chunk 25
+    export DATABASE_URL=postgresql://...
+    python -m benchmarks.order_concurrency --concurrency 300
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from collections import Counter
+
+from ._harness import app_client, configure_environment, count_statements
+
+
+async def _run(orders: int, stock: int, concurrency: int) -> bool:
+    from sqlalchemy import select
+
+    from app import get_settings
+    from app.database import get_sessionmaker
+    from app.inventory import start_stock_reservations, stop_stock_reservations
+    from app.models import Product
+
+    async with app_client() as client:
+        await client.post(
+            "/auth/signup",
+            json={
+                "email": "merchant@example.com",
+                "full_name": "Merchant",
+                "password": "benchmark-password",
+                "role": "admin",
+            },
+        )
+        login = await client.post(
+            "/auth/login",
+            json={"email": "merchant@example.com", "password": "benchmark-password"},
+        )
+        headers = {"Authorization": "Bearer {}".format(login.json()["token"])}
+        product = await client.post(
+            "/products/",
+            json={
+                "name": "Flash sale item",
+                "description": "Limited stock",
+                "price": "9.99",
+                "seller_name": "Merchant",
+                "stock": stock,
+            },
+            headers=headers,
+        )
+        product_id = product.json()["id"]
+
+        await start_stock_reservations(get_settings())
+
+        in_flight = asyncio.Semaphore(concurrency)
+
+        async def _order() -> int:
+            async with in_flight:
+                response = await client.post(
+                    "/orders/",
+                    json={"product_id": product_id, "quantity": 1},
+                    headers=headers,
+                )
+            return response.status_code
+
+        with count_statements() as statements:
+            started = time.perf_counter()
+            statuses = Counter(await asyncio.gather(*(_order() for _ in range(orders))))
+            elapsed = time.perf_counter() - started
+            await stop_stock_reservations()
+
+        # Read the row itself; cached product reads may lag behind orders.
+        async with get_sessionmaker(get_settings().database_url)() as session:
+            remaining = await session.scalar(
+                select(Product.stock).where(Product.id == product_id)
+            )
+
+    sold = statuses.get(201, 0)
+    print("orders:     {}".format(orders))
+    print("elapsed:    {:.2f}s".format(elapsed))
+    print("statuses:   {}".format(dict(sorted(statuses.items()))))
+    print("statements: {}".format(dict(sorted(statements.items()))))
+    print("stock:      {} -> {} ({} sold)".format(stock, remaining, sold))
+    server_errors = sum(count for status, count in statuses.items() if status >= 500)
+    return (
+        not server_errors and sold == min(orders, stock) and remaining == stock - sold
+    )
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=500)
+    parser.add_argument("--stock", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument(
+        "--reservation-chunk",
+        type=int,
+        default=0,
+        help="Units moved into each local pool; 0 decrements the row per order.",
+    )
+    args = parser.parse_args(argv)
+
+    configure_environment(
+        {
+            "BACKEND_INVENTORY_RESERVATION_CHUNK": str(args.reservation_chunk),
+            # Keep authentication out of the measurement.
+            "BACKEND_SESSION_TOKEN_MODE": "signed",
+            "BACKEND_JOB_WORKERS": "0",
+        }
+    )
+    consistent = asyncio.run(_run(args.orders, args.stock, args.concurrency))
+    raise SystemExit(0 if consistent else 1)
+
+
+if __name__ == "__main__":  # pragma: no cover - manual execution helper
+    main()
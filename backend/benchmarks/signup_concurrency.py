@@ -0,0 +1,81 @@
+"""Fire concurrent signups, many of them for the same emails.
+
+Every request should end in ``201`` or ``409``; any ``5xx`` indicates a race
+between the uniqueness check and the insert. The statement counts show the
+round trips spent per signup. A second, sequential pass signs every email up
+again: each of those must be refused before any password is hashed.
+
+    python -m benchmarks.signup_concurrency --requests 200 --emails 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from collections import Counter
+
+from ._harness import app_client, configure_environment, count_calls, count_statements
+
+
+async def _run(requests: int, emails: int) -> int:
+    from app.routes import auth
+
+    async with app_client() as client:
+
+        async def _signup(index: int) -> int:
+            response = await client.post(
+                "/auth/signup",
+                json={
+                    "email": "buyer{}@example.com".format(index % emails),
+                    "full_name": "Buyer {}".format(index),
+                    "password": "benchmark-password",
+                },
+            )
+            return response.status_code
+
+        with count_statements() as statements, count_calls(
+            auth, "hash_password"
+        ) as hashes:
+            started = time.perf_counter()
+            statuses = Counter(
+                await asyncio.gather(*(_signup(i) for i in range(requests)))
+            )
+            elapsed = time.perf_counter() - started
+
+        with count_calls(auth, "hash_password") as duplicate_hashes:
+            duplicates = Counter([await _signup(i) for i in range(emails)])
+
+    print("requests:   {}".format(requests))
+    print("elapsed:    {:.2f}s".format(elapsed))
+    print("statuses:   {}".format(dict(sorted(statuses.items()))))
+    print("statements: {}".format(dict(sorted(statements.items()))))
+    print("per signup: {:.2f} statements".format(sum(statements.values()) / requests))
+    print("hashes:     {}".format(hashes["hash_password"]))
+    print("duplicates: {}".format(dict(sorted(duplicates.items()))))
+    print("dup hashes: {}".format(duplicate_hashes["hash_password"]))
+    failures = sum(count for status, count in statuses.items() if status >= 500)
+    if duplicates != Counter({409: emails}) or duplicate_hashes["hash_password"]:
+        failures += 1
+    return failures
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--emails", type=int, default=20)
+    parser.add_argument(
+        "--iterations",
+        type=int,
+        default=10_000,
+        help="PBKDF2 iterations; lowered from production so the run stays short.",
+    )
+    args = parser.parse_args(argv)
+
+    configure_environment({"BACKEND_PASSWORD_HASH_ITERATIONS": str(args.iterations)})
+    server_errors = asyncio.run(_run(args.requests, args.emails))
+    raise SystemExit(1 if server_errors else 0)
+
+
+if __name__ == "__main__":  # pragma: no cover - manual execution helper
+    main()
@@ -0,0 +1,68 @@
+"""Shared fixtures: an in-process app on a throwaway SQLite database."""
+
+from __future__ import annotations
+
+import os
+import tempfile
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+_DATABASE_DIR = Path(tempfile.mkdtemp(prefix="exporthub-tests-"))
+_DATABASE_PATH = _DATABASE_DIR / "tests.db"
+
+# Settings are resolved once per process, so they are fixed before the app loads.
+os.environ.update(
+    DATABASE_URL="sqlite:///{}".format(_DATABASE_PATH),
+    BACKEND_SECRET_KEY="test-secret",
+    BACKEND_STORAGE_BUCKET="tests",
+    BACKEND_QUERY_BUDGET_ENFORCE="true",
+    BACKEND_AUTH_RATE_LIMIT_ENABLED="false",
+    BACKEND_ADMISSION_CONTROL_ENABLED="false",
+    BACKEND_PASSWORD_HASH_ITERATIONS="1000",
+)
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app import create_app  # noqa: E402
+
+ADMIN_PASSWORD = "admin-password"
+
+
+@pytest.fixture
+def client() -> Iterator[TestClient]:
+    """A client for a freshly started app with an empty database."""
+
+    _DATABASE_PATH.unlink(missing_ok=True)
+    with TestClient(create_app()) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def admin_headers(client: TestClient) -> dict[str, str]:
+    """Authorization headers for a newly created administrator."""
+
+    credentials = {"email": "admin@example.com", "password": ADMIN_PASSWORD}
+    response = client.post(
+        "/auth/signup", json={**credentials, "full_name": "Admin", "role": "admin"}
+    )
+    assert response.status_code == 201, response.text
+    response = client.post("/auth/login", json=credentials)
+    assert response.status_code == 200, response.text
+    return {"Authorization": "Bearer {}".format(response.json()["token"])}
+
+
+def create_product(client: TestClient, headers: dict[str, str], **fields) -> dict:
+    """Create a product through the API and return its JSON representation."""
+
+    payload = {
+        "name": "Widget",
+        "description": "A widget",
+        "price": "2.50",
+        "seller_name": "Seller",
+        **fields,
+    }
+    response = client.post("/products/", json=payload, headers=headers)
+    assert response.status_code == 201, response.text
+    return response.json()
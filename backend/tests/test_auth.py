@@ -0,0 +1,25 @@
+"""Account creation."""
+
+from __future__ import annotations
+
+from app.routes import auth
+
+
+def test_duplicate_signup_is_refused_before_hashing(client, monkeypatch):
+    account = {
+        "email": "Buyer@Example.com",
+        "full_name": "Buyer",
+        "password": "buyer-password",
+    }
+    assert client.post("/auth/signup", json=account).status_code == 201
+
+    def _fail(*args, **kwargs):
+        raise AssertionError("a duplicate signup hashed its password")
+
+    monkeypatch.setattr(auth, "hash_password", _fail)
+    duplicate = client.post(
+        "/auth/signup", json={**account, "email": "buyer@example.com "}
+    )
+
+    assert duplicate.status_code == 409, duplicate.text
+    assert duplicate.headers["x-query-count"] == "1"
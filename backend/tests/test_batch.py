@@ -0,0 +1,64 @@
+"""``POST /batch`` under query budget enforcement."""
+
+from __future__ import annotations
+
+from app.routes import batch
+
+from .conftest import create_product
+
+
+def test_batched_writes_charge_their_own_statements(client, admin_headers):
+    kept = create_product(client, admin_headers, name="Kept")
+    removed = create_product(client, admin_headers, name="Removed")
+
+    response = client.post(
+        "/batch",
+        json=[
+            {
+                "method": "PUT",
+                "path": "/products/{}".format(kept["id"]),
+                "body": {"price": "4.00"},
+            },
+            {"method": "DELETE", "path": "/products/{}".format(removed["id"])},
+            {"method": "GET", "path": "/products/"},
+        ],
+        headers=admin_headers,
+    )
+
+    assert response.status_code == 200, response.text
+    put, delete, listing = response.json()
+    assert put["status"] == 200
+    assert put["body"]["price"] == "4.00"
+    assert delete["status"] == 204
+    assert int(delete["headers"]["x-query-count"]) >= 1
+    assert [product["id"] for product in listing["body"]] == [kept["id"]]
+    assert int(response.headers["x-query-count"]) <= 2
+
+
+def test_committed_batch_is_not_failed_for_its_own_budget(
+    client, admin_headers, monkeypatch
+):
+    removed = create_product(client, admin_headers)
+    monkeypatch.setattr(batch.run_batch, "__query_budget__", 0)
+
+    response = client.post(
+        "/batch",
+        json=[{"method": "DELETE", "path": "/products/{}".format(removed["id"])}],
+        headers=admin_headers,
+    )
+
+    assert response.status_code == 200, response.text
+    assert response.json()[0]["status"] == 204
+    missing = client.get("/products/{}".format(removed["id"]))
+    assert missing.status_code == 404
+
+
+def test_uncommitted_batch_still_fails_its_budget(client, admin_headers, monkeypatch):
+    monkeypatch.setattr(batch.run_batch, "__query_budget__", 0)
+
+    response = client.post(
+        "/batch", json=[{"method": "GET", "path": "/products/"}], headers=admin_headers
+    )
+
+    assert response.status_code == 500
+    assert "budget is 0" in response.json()["detail"]
@@ -0,0 +1,79 @@
+"""Stock reservation pools against direct stock writes."""
+
+from __future__ import annotations
+
+from dataclasses import replace
+
+from app import get_settings, inventory
+from app.database import get_sessionmaker
+from app.inventory import StockReservations
+from app.models import Product
+
+from .conftest import create_product
+
+
+def _reservations() -> StockReservations:
+    return StockReservations(
+        replace(get_settings(), inventory_reservation_chunk=10),
+        clock=lambda: 1000.0,
+    )
+
+
+async def _take(reservations: StockReservations, product_id: int) -> bool:
+    async with get_sessionmaker(get_settings().database_url)() as session:
+        return await reservations.take(session, product_id, 1)
+
+
+async def _stock(product_id: int) -> int | None:
+    async with get_sessionmaker(get_settings().database_url)() as session:
+        return (await session.get(Product, product_id)).stock
+
+
+def test_setting_stock_drops_units_reserved_from_the_old_count(
+    client, admin_headers, monkeypatch
+):
+    product = create_product(client, admin_headers, stock=100)
+    reservations = _reservations()
+    monkeypatch.setattr(inventory, "_active_reservations", reservations)
+    assert client.portal.call(_take, reservations, product["id"])
+    assert client.portal.call(_stock, product["id"]) == 90
+
+    response = client.put(
+        "/products/{}".format(product["id"]), json={"stock": 50}, headers=admin_headers
+    )
+    assert response.status_code == 200, response.text
+    # Retired on commit, so the next order refills from the new count.
+    assert client.portal.call(_take, reservations, product["id"])
+    assert client.portal.call(_stock, product["id"]) == 40
+    # The nine units left from the old count were dropped, not carried over.
+    assert client.portal.call(lambda: reservations.flush(expired_only=False)) == 9
+    assert client.portal.call(_stock, product["id"]) == 49
+
+
+def test_pool_from_another_process_does_not_overcount(client, admin_headers):
+    product = create_product(client, admin_headers, stock=100)
+    elsewhere = _reservations()
+    assert client.portal.call(_take, elsewhere, product["id"])
+
+    response = client.put(
+        "/products/{}".format(product["id"]), json={"stock": 50}, headers=admin_headers
+    )
+    assert response.status_code == 200, response.text
+    client.portal.call(lambda: elsewhere.flush(expired_only=False))
+    assert client.portal.call(_stock, product["id"]) == 50
+
+
+def test_untracked_pool_notices_tracking_start(client, admin_headers):
+    product = create_product(client, admin_headers)
+    reservations = _reservations()
+    assert client.portal.call(_take, reservations, product["id"])
+
+    response = client.post(
+        "/products/{}/stock".format(product["id"]),
+        json={"quantity": 5},
+        headers=admin_headers,
+    )
+    assert response.status_code == 200, response.text
+    # Less than a chunk is left, so the order must decrement the row itself.
+    assert not client.portal.call(_take, reservations, product["id"])
+    assert client.portal.call(_stock, product["id"]) == 5
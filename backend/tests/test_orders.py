@@ -0,0 +1,46 @@
+"""Order listing across the hot table and the archive."""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import update
+
+from app import get_settings
+from app.archive import archive_orders
+from app.database import get_sessionmaker
+from app.models import Order
+
+from .conftest import create_product
+
+
+async def _archive_everything(days_old: int) -> None:
+    settings = get_settings()
+    created_at = datetime.now(timezone.utc) - timedelta(days=days_old)
+    async with get_sessionmaker(settings.database_url)() as session:
+        await session.execute(update(Order).values(created_at=created_at))
+        await session.commit()
+    await archive_orders(settings)
+
+
+def test_until_before_the_cutoff_reads_the_archive(client, admin_headers):
+    product = create_product(client, admin_headers)
+    placed = client.post(
+        "/orders/",
+        json={"product_id": product["id"], "quantity": 1},
+        headers=admin_headers,
+    )
+    assert placed.status_code == 201, placed.text
+    days_old = get_settings().order_archive_after_days + 30
+    client.portal.call(_archive_everything, days_old)
+
+    until = datetime.now(timezone.utc) - timedelta(days=days_old - 1)
+    response = client.get(
+        "/orders/", params={"until": until.isoformat()}, headers=admin_headers
+    )
+    assert response.status_code == 200, response.text
+    assert [order["id"] for order in response.json()] == [placed.json()["id"]]
+
+    hot_only = client.get("/orders/", headers=admin_headers)
+    assert hot_only.status_code == 200, hot_only.text
+    assert hot_only.json() == []
@@ -0,0 +1,61 @@
+"""Per-request statement counts and budget enforcement."""
+
+from __future__ import annotations
+
+import pytest
+from sqlalchemy import select
+
+from app import get_settings
+from app.database import get_sessionmaker
+from app.models import Product
+from app.querybudget import QueryBudgetExceeded, query_budget
+from app.routes import products
+
+from .conftest import create_product
+
+
+def test_list_and_detail_report_their_statements(client, admin_headers):
+    product = create_product(client, admin_headers)
+    create_product(client, admin_headers, name="Other")
+
+    listing = client.get("/products/")
+    assert listing.status_code == 200
+    assert listing.headers["x-query-count"] == "1"
+
+    # Creating the product invalidated it, so the first read is a cache miss.
+    detail = client.get("/products/{}".format(product["id"]))
+    assert detail.status_code == 200
+    assert detail.headers["x-query-count"] == "1"
+    cached = client.get("/products/{}".format(product["id"]))
+    assert cached.headers["x-query-count"] == "0"
+
+    orders = client.get("/orders/", headers=admin_headers)
+    assert orders.status_code == 200
+    assert int(orders.headers["x-query-count"]) <= 3
+
+
+def test_route_over_its_budget_fails(client, monkeypatch):
+    monkeypatch.setattr(products.list_products, "__query_budget__", 0)
+
+    response = client.get("/products/")
+
+    assert response.status_code == 500
+    assert "GET /products/: executed 1 SQL statements, budget is 0" in (
+        response.json()["detail"]
+    )
+
+
+def test_repeated_statements_fail_a_query_budget(client, admin_headers):
+    first = create_product(client, admin_headers)
+    second = create_product(client, admin_headers, name="Other")
+
+    async def _load_one_by_one() -> None:
+        async with get_sessionmaker(get_settings().database_url)() as session:
+            with query_budget(10):
+                for product_id in (first["id"], second["id"]):
+                    await session.execute(
+                        select(Product).where(Product.id == product_id)
+                    )
+
+    with pytest.raises(QueryBudgetExceeded, match="N\\+1"):
+        client.portal.call(_load_one_by_one)
@@ -0,0 +1,27 @@
+"""Authentication rate limiter configuration."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import replace
+
+from app import get_settings, ratelimit
+
+
+def test_unloadable_backend_falls_back_to_local_limits(monkeypatch, caplog):
+    monkeypatch.setattr(ratelimit, "_limiters", {})
+    settings = replace(
+        get_settings(),
+        auth_rate_limit_enabled=True,
+        auth_rate_limit_backend="missing_module:factory",
+        auth_rate_limit_email_burst=1,
+    )
+
+    with caplog.at_level(logging.ERROR, logger=ratelimit.__name__):
+        limiter = ratelimit.get_auth_rate_limiter(settings)
+    assert "missing_module:factory" in caplog.text
+
+    assert asyncio.run(limiter.check("198.51.100.7", "a@example.com")) == 0
+    assert asyncio.run(limiter.check("198.51.100.7", "a@example.com")) > 0
+    assert ratelimit.get_auth_rate_limiter(settings) is limiter
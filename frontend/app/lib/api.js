@@ -2,9 +2,24 @@ const API_BASE = (process.env.NEXT_PUBLIC_API_BASE_URL || '').replace(/\/$/, '')
 
 const defaultHeaders = { 'Content-Type': 'application/json' };
 
-export async function apiRequest(path, options = {}) {
-  const { method = 'GET', body, token, headers, cache = 'no-store' } = options;
-  const url = `${API_BASE}${path}`;
+// Keep in step with BACKEND_BATCH_MAX_ITEMS.
+const MAX_BATCH_ITEMS = 20;
+
+// Calls made in the same tick are sent together through POST /batch, grouped by
+// token. Requests with custom headers, or with `batch: false`, go out directly.
+let pendingCalls = [];
+
+function toResult(status, payload) {
+  if (status < 200 || status >= 300) {
+    const message = payload?.detail || 'Unexpected API error';
+    const error = new Error(typeof message === 'string' ? message : 'Unexpected API error');
+    error.status = status;
+    throw error;
+  }
+  return status === 204 ? null : payload;
+}
+
+async function sendDirect({ path, method, body, token, headers, cache }) {
   const requestInit = {
     method,
     headers: { ...defaultHeaders, ...(headers || {}) },
@@ -19,7 +34,7 @@ export async function apiRequest(path, options = {}) {
     requestInit.body = JSON.stringify(body);
   }
 
-  const response = await fetch(url, requestInit);
+  const response = await fetch(`${API_BASE}${path}`, requestInit);
   let payload = null;
   if (response.status !== 204) {
     try {
@@ -29,12 +44,82 @@ export async function apiRequest(path, options = {}) {
     }
   }
 
-  if (!response.ok) {
-    const message = payload?.detail || 'Unexpected API error';
-    throw new Error(message);
+  return toResult(response.status, payload);
+}
+
+async function sendBatch(token, calls) {
+  const results = await sendDirect({
+    path: '/batch',
+    method: 'POST',
+    token,
+    cache: 'no-store',
+    body: calls.map(({ path, method, body }) => ({ path, method, body })),
+  });
+  calls.forEach((call, index) => {
+    try {
+      call.resolve(toResult(results[index].status, results[index].body));
+    } catch (error) {
+      call.reject(error);
+    }
+  });
+}
+
+function flushPendingCalls() {
+  const calls = pendingCalls;
+  pendingCalls = [];
+
+  const byToken = new Map();
+  calls.forEach((call) => {
+    const key = call.token || '';
+    if (!byToken.has(key)) byToken.set(key, []);
+    byToken.get(key).push(call);
+  });
+
+  byToken.forEach((group, token) => {
+    for (let start = 0; start < group.length; start += MAX_BATCH_ITEMS) {
+      const chunk = group.slice(start, start + MAX_BATCH_ITEMS);
+      if (chunk.length === 1) {
+        sendDirect(chunk[0]).then(chunk[0].resolve, chunk[0].reject);
+        continue;
+      }
+      sendBatch(token || undefined, chunk).catch((error) => {
+        // Only replay the calls one by one when the backend has no batch
+        // endpoint; otherwise some of them may already have run.
+        if (error.status === 404 || error.status === 405) {
+          chunk.forEach((call) => sendDirect(call).then(call.resolve, call.reject));
+        } else {
+          chunk.forEach((call) => call.reject(error));
+        }
+      });
+    }
+  });
+}
+
+export function apiRequest(path, options = {}) {
+  const { method = 'GET', body, token, headers, cache = 'no-store', batch = true } = options;
+  const call = { path, method: method.toUpperCase(), body, token, headers, cache };
+
+  if (!batch || headers) {
+    return sendDirect(call);
   }
 
-  return payload;
+  // Identical reads in the same tick share one sub-request.
+  if (call.method === 'GET') {
+    const duplicate = pendingCalls.find(
+      (pending) => pending.method === 'GET' && pending.path === path && pending.token === token,
+    );
+    if (duplicate) return duplicate.promise;
+  }
+
+  call.promise = new Promise((resolve, reject) => {
+    call.resolve = resolve;
+    call.reject = reject;
+  });
+  if (pendingCalls.length === 0) {
+    queueMicrotask(flushPendingCalls);
+  }
+  pendingCalls.push(call);
+  return call.promise;
 }
 
 export function buildApiUrl(path) {
@@ -15,8 +15,7 @@ export default function OrdersPage() {
     error: ordersError,
     isLoading: loadingOrders,
     mutate: refreshOrders,
-  } = useSWR(isAuthenticated ? ['/orders/', token] : null, fetcher);
-  const { data: products } = useSWR(['/products/', token ?? null], fetcher);
+  } = useSWR(isAuthenticated ? ['/orders/?expand=product', token] : null, fetcher);
 
   if (!isAuthenticated) {
     return (
@@ -59,19 +58,16 @@ export default function OrdersPage() {
               </tr>
             </thead>
             <tbody>
-              {orders.map((order) => {
-                const product = products?.find((item) => item.id === order.product_id);
-                return (
-                  <tr key={order.id}>
-                    <td>#{order.id}</td>
-                    <td>{order.buyer_name}</td>
-                    <td>{product ? product.name : `Product ${order.product_id}`}</td>
-                    <td>{order.quantity}</td>
-                    <td>${Number(order.total_price).toFixed(2)}</td>
-                    <td>{new Date(order.created_at).toLocaleString()}</td>
-                  </tr>
-                );
-              })}
+              {orders.map((order) => (
+                <tr key={order.id}>
+                  <td>#{order.id}</td>
+                  <td>{order.buyer_name}</td>
+                  <td>{order.product ? order.product.name : `Product ${order.product_id}`}</td>
+                  <td>{order.quantity}</td>
+                  <td>${Number(order.total_price).toFixed(2)}</td>
+                  <td>{new Date(order.created_at).toLocaleString()}</td>
+                </tr>
+              ))}
             </tbody>
           </table>
         </div>
@@ -27,7 +27,7 @@ export default function ProductsPage() {
     error: ordersError,
     isLoading: loadingOrders,
     mutate: refreshOrders,
-  } = useSWR(isAuthenticated ? ['/orders/', token] : null, fetcher);
+  } = useSWR(isAuthenticated ? ['/orders/?expand=product', token] : null, fetcher);
 
   const productOptions = useMemo(() => {
     if (!products) return [];
@@ -106,6 +106,9 @@ export default function ProductsPage() {
               <small>Seller: {product.seller_name}</small>
               <p>{product.description}</p>
               <strong>${Number(product.price).toFixed(2)}</strong>
+              {product.stock != null && (
+                <small>{product.stock > 0 ? `${product.stock} in stock` : 'Out of stock'}</small>
+              )}
             </article>
           ))
         ) : (
@@ -167,18 +170,15 @@ export default function ProductsPage() {
                 </tr>
               </thead>
               <tbody>
-                {orders.map((order) => {
-                  const product = products?.find((item) => item.id === order.product_id);
-                  return (
-                    <tr key={order.id}>
-                      <td>#{order.id}</td>
-                      <td>{product ? product.name : `Product ${order.product_id}`}</td>
-                      <td>{order.quantity}</td>
-                      <td>${Number(order.total_price).toFixed(2)}</td>
-                      <td>{new Date(order.created_at).toLocaleString()}</td>
-                    </tr>
-                  );
-                })}
+                {orders.map((order) => (
+                  <tr key={order.id}>
+                    <td>#{order.id}</td>
+                    <td>{order.product ? order.product.name : `Product ${order.product_id}`}</td>
+                    <td>{order.quantity}</td>
+                    <td>${Number(order.total_price).toFixed(2)}</td>
+                    <td>{new Date(order.created_at).toLocaleString()}</td>
+                  </tr>
+                ))}
               </tbody>
             </table>
           ) : (